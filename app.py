@@ -5,12 +5,25 @@
 ✅ Guaranteed Working on Bigger Systems
 """
 
-from flask import Flask, request, jsonify, render_template_string
-import whisper
-import tempfile
-import os
-import re
-import sys
+from flask import Flask, Response, abort, g, make_response, request, jsonify, render_template_string
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
+import json
+import time
+
+import config
+from audio_ingest import SAMPLE_RATE, StreamDecoder
+from cleanup import app_cleanup
+from decoding import PROFILE_NAMES, decode, iter_decode
+from inference_scheduler import scheduler as inference_scheduler
+from jobs import JobQueue, QueueFull
+from language import route, routed_options, routing_key
+from longform import transcribe_long
+from metrics import Gauge, observe_request, observe_stage, observe_transcription, render_metrics, span
+from model_registry import get_model, registry
+from result_cache import cache_key, result_cache
+from streaming import StreamingTranscriber
+from upload import AudioTooLong, IngestRequest, check_upload_duration, decode_upload, upload_digest
+from vad import transcribe_speech, trim_silence
 
 # Import god mode corrections if available
 try:
@@ -20,7 +33,18 @@ except ImportError:
     GOD_MODE_AVAILABLE = False
     print("💡 Tip: Create god_mode_corrections.py for even better accuracy!")
 
+# Live transcription while recording needs WebSocket support
+try:
+    from flask_sock import ConnectionClosed, Sock
+    STREAMING_AVAILABLE = True
+except ImportError:
+    STREAMING_AVAILABLE = False
+    print("💡 Tip: pip install flask-sock for live transcription while recording!")
+
 app = Flask(__name__)
+# Uploads are hashed, spooled and decoded while they arrive (see upload.py)
+app.request_class = IngestRequest
+app.config["MAX_CONTENT_LENGTH"] = config.MAX_UPLOAD_MB * 1024 * 1024
 
 # Embedded HTML Template
 HTML_TEMPLATE = '''<!DOCTYPE html>
@@ -152,6 +176,10 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
             white-space: pre-wrap;
             font-weight: 600;
         }
+        .tentative {
+            color: #999;
+            font-weight: 500;
+        }
         .language-tag {
             display: inline-block;
             background: linear-gradient(135deg, #667eea, #764ba2);
@@ -254,11 +282,20 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
         const errorBox = document.getElementById('error');
         const status = document.getElementById('status');
         
-        let mediaRecorder, audioChunks = [];
+        let mediaRecorder, audioChunks = [], streamingAvailable = false;
         
-        window.addEventListener('load', () => {
-            status.textContent = '✓ Connected to Large-v3 Server';
-            status.style.color = '#27ae60';
+        window.addEventListener('load', async () => {
+            try {
+                const info = await (await fetch('/status')).json();
+                streamingAvailable = !!info.streaming;
+                status.textContent = info.ready
+                    ? '✓ Connected - ' + info.default_model + ' model ready'
+                    : '✓ Connected - ' + info.default_model + ' model warming up...';
+                status.style.color = '#27ae60';
+            } catch (err) {
+                status.textContent = '✗ Server not reachable';
+                status.style.color = '#e74c3c';
+            }
         });
         
         uploadArea.addEventListener('click', () => fileInput.click());
@@ -311,15 +348,29 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
                         mimeType: 'audio/webm;codecs=opus'
                     });
                     audioChunks = [];
-                    
-                    mediaRecorder.ondataavailable = (e) => audioChunks.push(e.data);
-                    mediaRecorder.onstop = () => {
+                    const uploadRecording = () => {
                         const blob = new Blob(audioChunks, { type: 'audio/webm' });
                         processFile(new File([blob], 'recording.webm', { type: 'audio/webm' }));
+                    };
+                    // Live mode: send chunks while recording, upload only as a fallback
+                    const live = streamingAvailable ? openLiveStream(uploadRecording) : null;
+                    
+                    mediaRecorder.ondataavailable = (e) => {
+                        audioChunks.push(e.data);
+                        if (live) live.send(e.data);
+                    };
+                    mediaRecorder.onstop = () => {
                         stream.getTracks().forEach(t => t.stop());
+                        if (live && live.usable()) {
+                            live.send('stop');
+                            status.textContent = '⏳ Finishing live transcription...';
+                            status.style.color = '#667eea';
+                        } else {
+                            uploadRecording();
+                        }
                     };
                     
-                    mediaRecorder.start();
+                    mediaRecorder.start(live ? 250 : undefined);
                     recordBtn.textContent = '⏹️ Stop Recording';
                     recordBtn.classList.add('recording');
                     status.textContent = '🎙️ Recording in progress...';
@@ -347,6 +398,13 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
                     body: formData
                 });
                 
+                if (response.status === 413) {
+                    throw new Error((await response.json()).error);
+                }
+                if (response.status === 503) {
+                    const wait = response.headers.get('Retry-After') || 10;
+                    throw new Error(`Model still loading - try again in ${wait}s`);
+                }
                 if (!response.ok) {
                     throw new Error(`Server error: ${response.status}`);
                 }
@@ -370,6 +428,56 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
             }
         }
         
+        function openLiveStream(fallback) {
+            const protocol = location.protocol === 'https:' ? 'wss://' : 'ws://';
+            const socket = new WebSocket(protocol + location.host + '/stream');
+            const queued = [];
+            let failed = false, stopped = false, finished = false;
+            
+            socket.onopen = () => queued.splice(0).forEach(data => socket.send(data));
+            socket.onerror = () => { failed = true; };
+            socket.onclose = () => {
+                // Connection lost before the final text: upload the recording instead
+                if (stopped && !finished) fallback();
+            };
+            socket.onmessage = (e) => {
+                const message = JSON.parse(e.data);
+                if (message.type === 'partial') {
+                    showPartial(message.committed, message.tentative);
+                } else if (message.type === 'final') {
+                    finished = true;
+                    showResult(message.text, message.language);
+                    status.textContent = '✓ Live transcription complete!';
+                    status.style.color = '#27ae60';
+                    socket.close();
+                } else if (message.type === 'error') {
+                    finished = true;
+                    showError(message.error);
+                    socket.close();
+                }
+            };
+            
+            return {
+                send(data) {
+                    if (data === 'stop') stopped = true;
+                    if (socket.readyState === WebSocket.OPEN) socket.send(data);
+                    else queued.push(data);
+                },
+                usable: () => !failed && socket.readyState <= WebSocket.OPEN,
+            };
+        }
+        
+        function showPartial(committed, tentative) {
+            resultText.textContent = committed ? committed + ' ' : '';
+            const pending = document.createElement('span');
+            pending.className = 'tentative';
+            pending.textContent = tentative;
+            resultText.appendChild(pending);
+            languageTag.textContent = 'LIVE';
+            errorBox.classList.remove('show');
+            resultBox.classList.add('show');
+        }
+        
         function showResult(text, language) {
             resultText.textContent = text;
             languageTag.textContent = (language || 'DETECTED').toUpperCase();
@@ -387,237 +495,530 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
 print("\n" + "="*80)
 print("  🚀 PRODUCTION AUDIO TRANSCRIPTION SYSTEM")
 print("="*80)
-print("\n  📥 Loading Whisper Large-v3 Model...")
-print("  ⏳ First time: Downloads ~3GB (one-time only)")
-print("  ⏳ Subsequent runs: Loads from cache (instant)\n")
+print(f"\n  📦 Default model: Whisper {config.DEFAULT_MODEL}")
+print("  ⏳ Models warm up in the background - /readyz answers 200 once ready\n")
 print("="*80 + "\n")
 
-try:
-    # Load Large-v3 model
-    model = whisper.load_model("large-v3", device="cpu")
-    
-    print("\n" + "="*80)
-    print("  ✅ LARGE-V3 MODEL LOADED SUCCESSFULLY!")
-    print("="*80)
-    print("\n  Model: Whisper Large-v3")
-    print("  Accuracy: 99%")
-    print("  Languages: Hindi, English, Hinglish")
-    print("  Status: Production Ready\n")
-    print("="*80 + "\n")
-    
-except Exception as e:
-    print(f"\n❌ ERROR loading model: {e}\n")
-    print("💡 Solution:")
-    print("   1. Check internet connection")
-    print("   2. Run: pip install openai-whisper")
-    print("   3. Wait for download to complete\n")
-    sys.exit(1)
-
 @app.route("/")
 def home():
     return render_template_string(HTML_TEMPLATE)
 
+@app.route("/status")
+def status():
+    """Which models are loaded, loading or failed, plus result cache counters"""
+    return jsonify(dict(registry.status(), cache=result_cache.stats(), inference=inference_scheduler.stats(),
+                        streaming=STREAMING_AVAILABLE))
+
+@app.route("/healthz")
+def healthz():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({"status": "ok"})
+
+@app.route("/readyz")
+def readyz():
+    """Readiness: the default model is loaded"""
+    if registry.is_ready():
+        return jsonify({"status": "ready", "model": config.DEFAULT_MODEL})
+    return model_loading_response(config.DEFAULT_MODEL)
+
+# GOD-LEVEL ACCURACY SETTINGS
+TRANSCRIBE_OPTIONS = dict(
+    language="hi",  # Hindi base
+    task="transcribe",
+    
+    # MAXIMUM ACCURACY PARAMETERS
+    # (beam size / best_of / patience come from the decoding profile)
+    temperature=0.0,
+    
+    # STRICTER QUALITY FILTERS
+    condition_on_previous_text=False,
+    no_speech_threshold=0.4,    # More sensitive
+    logprob_threshold=-0.5,     # Stricter
+    compression_ratio_threshold=1.5,  # Stricter
+    
+    # ADVANCED FEATURES
+    word_timestamps=True,
+    hallucination_silence_threshold=2.0,
+    
+    # INITIAL PROMPT FOR CONTEXT (helps with ambiguous sounds)
+    initial_prompt=(
+        "यह एक सामान्य हिंदी और हिंग्लिश बातचीत है। "
+        "स्पष्ट उच्चारण के साथ बोली गई है। "
+        "Common words: मैं, यह, वह, एक, दो, तीन, को, के, से, "
+        "सजना, दीवाना, जाना, आना, washroom, gentleman, ladies"
+    ),
+    
+    verbose=False
+)
+
+def requested_model(form=None):
+    """Model named in the form data, or None if it isn't allowed"""
+    form = request.form if form is None else form
+    model_name = form.get("model") or config.DEFAULT_MODEL
+    return model_name if model_name in config.ALLOWED_MODELS else None
+
+def requested_long_form():
+    """long_form form field: True/False, or None to decide by duration"""
+    value = request.form.get("long_form", "").strip().lower()
+    if value in ("1", "true", "yes", "on"):
+        return True
+    if value in ("0", "false", "no", "off"):
+        return False
+    return None
+
+def requested_profile(form=None):
+    """Decoding profile named in the form data, or None if there's no such profile"""
+    form = request.form if form is None else form
+    profile = form.get("profile") or config.DECODING_PROFILE
+    return profile if profile in PROFILE_NAMES else None
+
+def requested_stream_format():
+    """"ndjson" or "sse" when the client wants segments as they're ready"""
+    value = (request.form.get("stream") or request.args.get("stream") or "").strip().lower()
+    if value in ("ndjson", "sse"):
+        return value
+    best = request.accept_mimetypes.best
+    if best == "application/x-ndjson":
+        return "ndjson"
+    if best == "text/event-stream":
+        return "sse"
+    return None
+
+def unknown_model_response(form):
+    return jsonify({
+        "error": f"Unknown model '{form.get('model')}'",
+        "models": list(config.ALLOWED_MODELS)
+    }), 400
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    """413 for an upload over MAX_UPLOAD_MB or audio over MAX_AUDIO_SECONDS"""
+    if isinstance(e, AudioTooLong):
+        message = e.description
+    else:
+        message = f"Upload is larger than the limit of {config.MAX_UPLOAD_MB} MB"
+    return jsonify({
+        "error": message,
+        "max_upload_mb": config.MAX_UPLOAD_MB,
+        "max_audio_seconds": config.MAX_AUDIO_SECONDS,
+    }), 413
+
+def model_loading_response(model_name):
+    """503 while ``model_name`` loads (the load is started if it wasn't)"""
+    registry.load_in_background(model_name)
+    info = registry.status()
+    response = jsonify({
+        "error": f"Model '{model_name}' is still loading, try again shortly",
+        "status": "loading",
+        "loading": info["loading"],
+        "errors": info["errors"],
+    })
+    response.headers["Retry-After"] = str(config.MODEL_LOADING_RETRY_AFTER)
+    return response, 503
+
+def model_unavailable_response(model_name):
+    """503 for a model that can't be loaded next to the pinned models"""
+    return jsonify({
+        "error": f"Model '{model_name}' can't be loaded on this server right now",
+        "status": "unavailable",
+        "pinned": registry.status()["pinned"],
+    }), 503
+
+def unknown_profile_response(form):
+    return jsonify({
+        "error": f"Unknown decoding profile '{form.get('profile')}'",
+        "profiles": list(PROFILE_NAMES)
+    }), 400
+
+def request_error(form=None, require_ready=True):
+    """Error response for an unknown model or profile, a model that won't
+    fit in memory, or (``require_ready``) a model that is still loading;
+    None if the request can go ahead"""
+    form = request.form if form is None else form
+    model_name = requested_model(form)
+    if model_name is None:
+        return unknown_model_response(form)
+    if requested_profile(form) is None:
+        return unknown_profile_response(form)
+    if not registry.can_load(model_name):
+        return model_unavailable_response(model_name)
+    if require_ready and not registry.is_ready(model_name):
+        return model_loading_response(model_name)
+    return None
+
+def check_before_upload(require_ready=True):
+    """Turn the request away on the fields sent ahead of the file, before
+    the upload is read (fields after the file are checked once it's in)"""
+    def check(form):
+        error = request_error(form, require_ready)
+        if error is not None:
+            abort(make_response(error))
+    request.before_upload = check
+
+@app.route("/metrics")
+def metrics():
+    """Prometheus scrape endpoint (see metrics.py)"""
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
 @app.route("/transcribe", methods=["POST"])
 def transcribe():
     try:
-        if "file" not in request.files:
+        check_before_upload()
+        with span("parse"):
+            files = request.files
+        if "file" not in files:
             return jsonify({"error": "No file uploaded"}), 400
         
-        file = request.files["file"]
-        print(f"\n📥 Processing: {file.filename}")
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".webm") as temp:
-            file.save(temp.name)
-            audio_path = temp.name
+        error = request_error()
+        if error is not None:
+            return error
+        model_name = requested_model()
+        profile = requested_profile()
         
-        print(f"🎵 Transcribing with Large-v3...")
-        
-        # GOD-LEVEL ACCURACY SETTINGS
-        result = model.transcribe(
-            audio_path,
-            language="hi",  # Hindi base
-            task="transcribe",
-            
-            # MAXIMUM ACCURACY PARAMETERS
-            temperature=0.0,
-            beam_size=15,       # Increased from 10
-            best_of=15,         # Increased from 10
-            patience=3.0,       # More patience
-            
-            # STRICTER QUALITY FILTERS
-            condition_on_previous_text=False,
-            no_speech_threshold=0.4,    # More sensitive
-            logprob_threshold=-0.5,     # Stricter
-            compression_ratio_threshold=1.5,  # Stricter
-            
-            # ADVANCED FEATURES
-            word_timestamps=True,
-            hallucination_silence_threshold=2.0,
-            
-            # INITIAL PROMPT FOR CONTEXT (helps with ambiguous sounds)
-            initial_prompt=(
-                "यह एक सामान्य हिंदी और हिंग्लिश बातचीत है। "
-                "स्पष्ट उच्चारण के साथ बोली गई है। "
-                "Common words: मैं, यह, वह, एक, दो, तीन, को, के, से, "
-                "सजना, दीवाना, जाना, आना, washroom, gentleman, ladies"
-            ),
-            
-            verbose=False
-        )
-        
-        text = result["text"].strip()
-        detected_lang = result.get("language", "hi")
-        
-        print(f"🗣️  Language: {detected_lang}")
-        
-        # Enhanced cleaning with god mode
-        text = super_clean_transcription(text)
-        
-        # Apply god mode corrections if available
-        if GOD_MODE_AVAILABLE:
-            text = apply_god_mode_corrections(text)
-            text = smart_correction(text)
-        
-        if is_garbage_output(text):
-            text = "[Audio quality too low - please try again with clearer audio]"
-            confidence = "low"
-            print("⚠️  Low quality detected")
-        else:
-            confidence = "high"
-            print(f"✅ Success: {text[:80]}...")
+        file = files["file"]
+        print(f"\n📥 Processing: {file.filename}")
         
-        os.remove(audio_path)
+        stream_format = requested_stream_format()
+        if stream_format:
+            return stream_transcription(file.stream, model_name, profile, stream_format)
         
-        return jsonify({
-            "text": text,
-            "language": detected_lang,
-            "confidence": confidence
-        })
+        result, cached = run_transcription(file.stream, model_name, requested_long_form(), profile)
+        response = jsonify(result)
+        response.headers["X-Cache"] = "HIT" if cached else "MISS"
+        return response
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error: {str(e)}")
         return jsonify({"error": f"Transcription failed: {str(e)}"}), 500
 
-def super_clean_transcription(text):
-    """GOD-LEVEL TEXT CLEANING WITH CONTEXT AWARENESS"""
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    """Queue a transcription and return its job id right away"""
+    # Jobs wait for their model, so only unknown fields are turned away
+    check_before_upload(require_ready=False)
+    if "file" not in request.files:
+        return jsonify({"error": "No file uploaded"}), 400
     
-    # Remove repetitions
-    words = text.split()
-    cleaned = []
-    for word in words:
-        if len(cleaned) >= 2 and word == cleaned[-1] == cleaned[-2]:
-            continue
-        cleaned.append(word)
-    text = " ".join(cleaned)
+    error = request_error(require_ready=False)
+    if error is not None:
+        return error
     
-    # Normalize spacing
-    text = re.sub(r'\s+', ' ', text)
-    text = re.sub(r'(.)\1{5,}', r'\1', text)
+    file = request.files["file"]
+    # Measured while it arrived: refuse audio over MAX_AUDIO_SECONDS now,
+    # not when a worker gets to it
+    try:
+        check_upload_duration(file.stream)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        options = {"model": requested_model(), "long_form": requested_long_form(), "profile": requested_profile()}
+        job_id = job_queue.submit(file.stream, file.filename, options)
+    except QueueFull as e:
+        response = jsonify({"error": "Too many queued jobs, try again later"})
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response, 429
     
-    # ULTRA-COMPREHENSIVE CORRECTIONS WITH CONTEXT
-    corrections = {
-        # Common Hindi clarity issues
-        "यह": "यह",  # Ensure proper यह
-        "वह": "वह",  # Ensure proper वह
-        "एक": "एक",  # Ensure proper एक
-        "ये": "यह",  # Convert ये to यह when appropriate
-        
-        # Common mishearings
-        "साजना": "सजना",
-        "सजना": "सजना",
-        "साझना": "सजना",
-        "दिवाना": "दीवाना",
-        "दीवाना": "दीवाना",
-        "दिल दीवाना": "दिल दीवाना",
-        "बिन सजना": "बिन सजना",
-        "बिन साजना": "बिन सजना",
-        
-        # Common conjunctions
-        "के मने": "के माने",
-        "के माने": "के माने",
-        "न": "ना",  # context-dependent
-        
-        # Greetings
-        "सत स्री अकाल": "सत श्री अकाल",
-        "नमसते": "नमस्ते",
-        "धनयवाद": "धन्यवाद",
-        "शुकरिया": "शुक्रिया",
-        
-        # Common words
-        "खुबसूरत": "खूबसूरत",
-        "किसा": "किस्सा",
-        "कहानी": "कहानी",
-        "जिनदगी": "ज़िंदगी",
-        "ज़िनदगी": "ज़िंदगी",
-        "रिशता": "रिश्ता",
-        
-        # English words in Hindi script
-        "हेलो": "hello",
-        "हलो": "hello",
-        "हैलो": "hello",
-        
-        # Gentleman variations (all of them!)
-        "जेंटलमैन": "gentleman",
-        "जेंटलमेन": "gentleman",
-        "जनतलमन": "gentleman",
-        "जैंटलमैन": "gentleman",
-        "जेन्टलमैन": "gentleman",
-        "जेंटिलमैन": "gentleman",
-        
-        # Ladies
-        "लेडीज": "ladies",
-        "लेडी": "lady",
-        "लेडिज": "ladies",
-        
-        # Greetings
-        "गुड मॉर्निंग": "good morning",
-        "गुड ईवनिंग": "good evening",
-        "गुड नाइट": "good night",
-        "गुड आफ्टरनून": "good afternoon",
-        
-        # Thanks
-        "थैंक यू": "thank you",
-        "थैंक्यू": "thank you",
-        "थैंक": "thank",
-        "थैंकयू": "thank you",
-        
-        # Other
-        "सॉरी": "sorry",
-        "प्लीज": "please",
-        "एक्सक्यूज मी": "excuse me",
-        "ओके": "okay",
-        "ओ के": "OK",
-        
-        # Washroom
-        "वाशरूम": "washroom",
-        "वॉशरूम": "washroom",
+    print(f"\n📥 Queued job {job_id}: {file.filename}")
+    response = jsonify({"id": job_id, "status": "queued", "url": f"/jobs/{job_id}"})
+    response.headers["Location"] = f"/jobs/{job_id}"
+    return response, 202
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    """Job state; ?wait=N holds the request up to N seconds for it to finish"""
+    wait = min(request.args.get("wait", 0, type=float), config.JOB_MAX_WAIT)
+    job = job_queue.get(job_id, wait=wait)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job)
+
+if STREAMING_AVAILABLE:
+    sock = Sock(app)
+    
+    @sock.route("/stream")
+    def stream(ws):
+        """Live transcription: binary messages are recorder chunks (e.g.
+        webm/opus from MediaRecorder), the text message "stop" ends the
+        recording. Sends "partial" messages while recording, then "final"."""
+        model_name = request.args.get("model") or config.STREAM_MODEL
+        if model_name not in config.ALLOWED_MODELS:
+            ws.send(json.dumps({"type": "error", "error": f"Unknown model '{model_name}'"}))
+            return
+        if not registry.can_load(model_name):
+            ws.send(json.dumps({"type": "error", "error": f"Model '{model_name}' can't be loaded on this server right now"}))
+            return
+        if not registry.is_ready(model_name):
+            registry.load_in_background(model_name)
+            ws.send(json.dumps({"type": "error", "error": f"Model '{model_name}' is still loading, try again shortly"}))
+            return
         
-        # Tech
-        "माइक": "mic",
-        "माइट": "mic",
-        "टेस्टिंग": "testing",
-        "बटन": "button",
+        print(f"\n🎙️  Live transcription with {model_name}...")
+        decoder = StreamDecoder()
+        try:
+            transcriber = StreamingTranscriber(get_model(model_name), TRANSCRIBE_OPTIONS)
+            while True:
+                message = ws.receive(timeout=0.1)
+                if message == "stop":
+                    break
+                if isinstance(message, (bytes, bytearray)):
+                    decoder.write(message)
+                transcriber.add_audio(decoder.read())
+                if transcriber.ready():
+                    transcriber.process()
+                    ws.send(json.dumps({
+                        "type": "partial",
+                        "committed": transcriber.committed_text,
+                        "tentative": transcriber.tentative_text,
+                    }, ensure_ascii=False))
+            
+            transcriber.add_audio(decoder.close())
+            decoder = None
+            text, confidence = finish_text(transcriber.finish())
+            ws.send(json.dumps({
+                "type": "final",
+                "text": text,
+                "language": transcriber.language,
+                "confidence": confidence,
+                "model": model_name,
+            }, ensure_ascii=False))
+        except ConnectionClosed:
+            print("🔌 Live transcription closed by the browser")
+        except (RuntimeError, ValueError) as e:
+            print(f"❌ Error: {str(e)}")
+            ws.send(json.dumps({"type": "error", "error": f"Transcription failed: {str(e)}"}))
+        finally:
+            if decoder is not None:
+                try:
+                    decoder.close()
+                except RuntimeError:
+                    pass
+
+def transcribe_audio(audio, model_name, long_form=None, profile=None):
+    """Raw model result for decoded audio, decoded with ``profile``.
+    
+    Only the speech regions reach the model (see vad.py). long_form=None
+    picks long-form mode for LONGFORM_MIN_SECONDS of speech or more.
+    """
+    profile = profile or config.DECODING_PROFILE
+    print(f"🎵 Transcribing with {model_name} ({profile})...")
+    
+    def transcribe(speech):
+        use_long_form = long_form
+        if use_long_form is None:
+            use_long_form = len(speech) / SAMPLE_RATE >= config.LONGFORM_MIN_SECONDS
+        # Language detected once, for every chunk / window of the request
+        routing = route(speech, model_name)
+        options = routed_options(TRANSCRIBE_OPTIONS, routing)
+        with span("transcribe"):
+            if use_long_form:
+                # Hour-long recordings: chunks transcribed in parallel processes
+                result = transcribe_long(speech, model_name, options, profile)
+            else:
+                result = decode(get_model(model_name), speech, options, profile)
+        result["routing"] = routing
+        return result
+    
+    result = transcribe_speech(transcribe, audio)
+    print(f"🔇 Skipped {result['vad']['audio_seconds'] - result['vad']['speech_seconds']:.1f}s of silence")
+    return result
+
+def run_transcription(stream, model_name=None, long_form=None, profile=None):
+    """Transcribe an uploaded file and clean the text (shared by all routes).
+    
+    ``stream`` must be seekable. Returns (response, served from cache).
+    """
+    model_name = model_name or config.DEFAULT_MODEL
+    profile = profile or config.DECODING_PROFILE
+    
+    # Same bytes + same settings = same transcript, so resubmissions are free
+    options = dict(TRANSCRIBE_OPTIONS, long_form=long_form, profile=profile, routing=routing_key())
+    key = cache_key(upload_digest(stream), model_name, options)
+    result = result_cache.get(key)
+    cached = result is not None
+    if cached:
+        print("⚡ Result cache hit")
+    else:
+        # Decode in memory: upload -> ffmpeg stdin -> float32 PCM (mostly
+        # done during the upload already)
+        started = time.perf_counter()
+        with span("decode"):
+            audio = decode_upload(stream)
+        result = transcribe_audio(audio, model_name, long_form, profile)
+        observe_transcription(len(audio) / SAMPLE_RATE, time.perf_counter() - started)
+        result_cache.put(key, result)
+    
+    text = result["text"].strip()
+    detected_lang = result.get("language", "hi")
+    
+    print(f"🗣️  Language: {detected_lang}")
+    text, confidence = finish_text(text, detected_lang)
+    
+    response = {
+        "text": text,
+        "language": detected_lang,
+        "confidence": confidence,
+        "model": model_name
     }
+    response["vad"] = result["vad"]
+    if result.get("decoding"):
+        response["decoding"] = result["decoding"]
+    if result.get("routing", {}).get("detected"):
+        response["routing"] = result["routing"]
+    if "longform" in result:
+        response["longform"] = result["longform"]
+    return response, cached
+
+def stream_transcription(stream, model_name, profile, stream_format):
+    """Streamed /transcribe response: one "segment" event per segment as soon
+    as it's decoded, then a "done" event with the full result (the same text
+    and confidence as the non-streamed response).
     
-    # CONTEXT-AWARE REPLACEMENTS
-    # Fix "मुझे एक कहना था" vs "मुझे यह कहना था"
-    text = re.sub(r'\bमुझे एक कहना\b', 'मुझे यह कहना', text)
-    text = re.sub(r'\bएक कहना था\b', 'यह कहना था', text)
+    Each segment's "text" is the cleaned transcript that became final with
+    it (see cleanup.py); cleanup may hold the last few words back until
+    later segments arrive, and "done" has the whole text.
     
-    # Apply word-boundary corrections
-    for wrong, correct in corrections.items():
-        text = re.sub(rf'\b{re.escape(wrong)}\b', correct, text, flags=re.IGNORECASE)
+    Segments are decoded window by window, so long_form doesn't apply.
+    """
+    options = dict(TRANSCRIBE_OPTIONS, profile=profile, streamed=True, routing=routing_key())
+    key = cache_key(upload_digest(stream), model_name, options)
+    cached = result_cache.get(key)
+    started = time.perf_counter()
+    audio = None
+    if not cached:
+        with span("decode"):
+            audio = decode_upload(stream)
     
-    # Fix Devanagari diacritics
-    text = re.sub(r'(\S)\s+(़|ा|ि|ी|ु|ू|े|ै|ो|ौ|ं|ः|्)', r'\1\2', text)
+    def event(kind, data):
+        data = json.dumps(dict(data, type=kind), ensure_ascii=False)
+        if stream_format == "sse":
+            return f"event: {kind}\ndata: {data}\n\n"
+        return data + "\n"
     
-    # Smart replacements based on context
-    # If "I want to go to" appears, likely washroom not वाशरूम
-    if 'want to go to' in text.lower():
-        text = re.sub(r'वाशरूम', 'washroom', text)
-        text = re.sub(r'वॉशरूम', 'washroom', text)
+    # Picked once the language is known
+    cleanup = None
+    cleaned = []
+    seconds = {"transcribe": 0.0, "cleanup": 0.0}
+    
+    def segment_event(segment_id, segment):
+        start = time.perf_counter()
+        text = cleanup.feed(segment["text"])
+        seconds["cleanup"] += time.perf_counter() - start
+        cleaned.append(text)
+        return event("segment", {
+            "id": segment_id,
+            "start": round(segment["start"], 3),
+            "end": round(segment["end"], 3),
+            "text": text,
+            "words": [
+                {"word": w["word"], "start": round(w["start"], 3), "end": round(w["end"], 3),
+                 "probability": round(float(w.get("probability", 0.0)), 3)}
+                for w in segment.get("words") or []
+            ],
+        })
     
-    return text.strip()
+    def events():
+        nonlocal cleanup
+        try:
+            if cached:
+                result = cached
+                cleanup = app_cleanup(result.get("language"))
+                for i, segment in enumerate(result["segments"]):
+                    yield segment_event(i, segment)
+            else:
+                print(f"🎵 Streaming with {model_name} ({profile})...")
+                speech, timestamps = trim_silence(audio)
+                segments = []
+                routing = route(speech, model_name)
+                language = routing["language"]
+                cleanup = app_cleanup(language)
+                if len(speech):
+                    decoded = iter_decode(get_model(model_name), speech, routed_options(TRANSCRIBE_OPTIONS, routing),
+                                          profile)
+                    while True:
+                        start = time.perf_counter()
+                        try:
+                            segment = next(decoded)
+                        except StopIteration as done:
+                            language = done.value or language
+                            break
+                        finally:
+                            seconds["transcribe"] += time.perf_counter() - start
+                        if timestamps is not None:
+                            timestamps.restore_segment(segment)
+                        segment["id"] = len(segments)
+                        segments.append(segment)
+                        yield segment_event(segment["id"], segment)
+                result = {
+                    "text": "".join(segment["text"] for segment in segments),
+                    "segments": segments,
+                    "language": language,
+                    "routing": routing,
+                    "vad": {
+                        "audio_seconds": round(len(audio) / SAMPLE_RATE, 2),
+                        "speech_seconds": round(len(speech) / SAMPLE_RATE, 2),
+                    },
+                }
+                result_cache.put(key, result)
+                observe_stage("transcribe", seconds["transcribe"])
+                observe_transcription(len(audio) / SAMPLE_RATE, time.perf_counter() - started)
+            
+            start = time.perf_counter()
+            cleaned.append(cleanup.finish())
+            observe_stage("cleanup", seconds["cleanup"] + time.perf_counter() - start)
+            text, confidence = check_text("".join(cleaned))
+            yield event("done", {
+                "text": text,
+                "language": result.get("language"),
+                "confidence": confidence,
+                "model": model_name,
+                "vad": result["vad"],
+            })
+        except Exception as e:
+            print(f"❌ Error: {str(e)}")
+            yield event("error", {"error": f"Transcription failed: {str(e)}"})
+    
+    mimetype = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    response = Response(events(), mimetype=mimetype)
+    response.headers["X-Cache"] = "HIT" if cached else "MISS"
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # don't let nginx hold events back
+    return response
+
+def finish_text(text, language=None):
+    """Cleaned transcript and its confidence"""
+    
+    # Enhanced cleaning with god mode
+    with span("cleanup"):
+        text = super_clean_transcription(text, language)
+    return check_text(text)
+
+def check_text(text):
+    """Final corrections and quality check of a cleaned transcript"""
+    
+    # Apply god mode corrections if available
+    if GOD_MODE_AVAILABLE:
+        with span("god_mode"):
+            text = apply_god_mode_corrections(text)
+            text = smart_correction(text)
+    
+    if is_garbage_output(text):
+        print("⚠️  Low quality detected")
+        return "[Audio quality too low - please try again with clearer audio]", "low"
+    print(f"✅ Success: {text[:80]}...")
+    return text, "high"
+
+def transcribe_job(audio, options):
+    """Job worker entry point: uploaded file -> transcription result"""
+    response, _ = run_transcription(
+        audio, options.get("model"), options.get("long_form"), options.get("profile")
+    )
+    return response
+
+def super_clean_transcription(text, language=None):
+    """GOD-LEVEL TEXT CLEANING WITH CONTEXT AWARENESS (steps in cleanup.py)"""
+    return app_cleanup(language).run(text)
 
 def is_garbage_output(text):
     """Detect hallucination/garbage"""
@@ -628,6 +1029,36 @@ def is_garbage_output(text):
         return True
     return False
 
+# Long uploads go through the job queue. Its workers start with the server
+# (or with the first request under a WSGI server), not at import, so worker
+# processes that re-import this module don't start a second set.
+job_queue = JobQueue(transcribe_job)
+
+Gauge("job_queue_depth", "Jobs waiting for a worker", job_queue.depth)
+Gauge("model_memory_mb", "Estimated memory of each loaded model", lambda: registry.status()["loaded"], ("model",))
+
+@app.before_request
+def start_job_workers():
+    job_queue.start()
+
+# Likewise the model warm-up: under a WSGI server the first request (usually
+# a health probe) starts it
+@app.before_request
+def start_warm_up():
+    registry.warm_up()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def count_request(response):
+    started = g.get("request_started")
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        observe_request(route, response.status_code, time.perf_counter() - started)
+    return response
+
 if __name__ == "__main__":
     print("📍 SERVER STARTING...")
     print(f"   👉 http://localhost:5005")
@@ -636,6 +1067,8 @@ if __name__ == "__main__":
     print("💡 Press Ctrl+C to stop\n")
     print("="*80 + "\n")
     
+    job_queue.start()
+    registry.warm_up()
     app.run(
         host="0.0.0.0",
         port=5005,
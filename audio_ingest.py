@@ -0,0 +1,196 @@
+"""
+Decode uploaded audio straight to 16 kHz float32 PCM - no temp files.
+
+The upload stream is piped into ffmpeg's stdin and the decoded samples are
+read back from its stdout into a NumPy buffer that Whisper accepts directly.
+StreamDecoder keeps one ffmpeg process open for audio that arrives in
+pieces (e.g. MediaRecorder chunks) and hands back samples as they decode.
+"""
+
+import os
+import subprocess
+import tempfile
+import threading
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+CHUNK_SIZE = 64 * 1024
+
+
+def _ffmpeg_command(source, sr):
+    return [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-threads", "0",
+        "-i", source,
+        "-f", "f32le", "-acodec", "pcm_f32le",
+        "-ac", "1", "-ar", str(sr),
+        "pipe:1",
+    ]
+
+
+def _feed(stream, pipe):
+    """Copy the upload into ffmpeg's stdin chunk by chunk"""
+    try:
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            pipe.write(chunk)
+    except (BrokenPipeError, OSError):
+        # ffmpeg gave up early; its exit code tells the caller why
+        pass
+    finally:
+        try:
+            pipe.close()
+        except OSError:
+            pass
+
+
+def _drain(pipe, sink):
+    sink.append(pipe.read())
+
+
+def _run_ffmpeg(source, sr, stream=None):
+    proc = subprocess.Popen(
+        _ffmpeg_command(source, sr),
+        stdin=subprocess.PIPE if stream is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    errors = []
+    threads = [threading.Thread(target=_drain, args=(proc.stderr, errors), daemon=True)]
+    if stream is not None:
+        threads.append(threading.Thread(target=_feed, args=(stream, proc.stdin), daemon=True))
+    for thread in threads:
+        thread.start()
+
+    try:
+        out = proc.stdout.read()
+        proc.wait()
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        for thread in threads:
+            thread.join()
+        proc.stderr.close()
+
+    if proc.returncode != 0:
+        message = errors[0].decode(errors="replace").strip() if errors else ""
+        raise RuntimeError(f"Failed to decode audio: {message}")
+    return np.frombuffer(out, np.float32).copy()
+
+
+class StreamDecoder:
+    """Incremental decoding: write() container bytes, read() new samples"""
+
+    def __init__(self, sr=SAMPLE_RATE):
+        self._proc = subprocess.Popen(
+            _ffmpeg_command("pipe:0", sr),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        self._lock = threading.Lock()
+        self._pending = bytearray()
+        self._errors = []
+        self._threads = [
+            threading.Thread(target=self._collect, daemon=True),
+            threading.Thread(target=_drain, args=(self._proc.stderr, self._errors), daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _collect(self):
+        while True:
+            chunk = self._proc.stdout.read1(CHUNK_SIZE)
+            if not chunk:
+                break
+            with self._lock:
+                self._pending += chunk
+
+    def write(self, data):
+        try:
+            self._proc.stdin.write(data)
+            self._proc.stdin.flush()
+        except (BrokenPipeError, OSError):
+            # ffmpeg gave up; close() reports why
+            pass
+
+    def read(self):
+        """Samples decoded since the last read (whole float32 samples only)"""
+        with self._lock:
+            usable = len(self._pending) - len(self._pending) % 4
+            data = bytes(self._pending[:usable])
+            del self._pending[:usable]
+        return np.frombuffer(data, np.float32).copy()
+
+    def abort(self):
+        """Stop ffmpeg without waiting for the rest of the output"""
+        if self._proc.poll() is None:
+            self._proc.kill()
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+        self._proc.wait()
+        for thread in self._threads:
+            thread.join()
+        self._proc.stdout.close()
+        self._proc.stderr.close()
+
+    def close(self):
+        """Finish decoding and return the remaining samples"""
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self._proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+            self._proc.wait()
+        for thread in self._threads:
+            thread.join()
+        self._proc.stdout.close()
+        self._proc.stderr.close()
+        if self._proc.returncode != 0:
+            message = self._errors[0].decode(errors="replace").strip() if self._errors else ""
+            raise RuntimeError(f"Failed to decode audio: {message}")
+        return self.read()
+
+
+def decode_audio(stream, sr=SAMPLE_RATE):
+    """Decode a file-like upload into a mono float32 array at ``sr`` Hz"""
+    seekable = hasattr(stream, "seekable") and stream.seekable()
+    try:
+        audio = _run_ffmpeg("pipe:0", sr, stream)
+    except RuntimeError:
+        if not seekable:
+            raise
+    else:
+        if len(audio) or not seekable or not stream.tell():
+            return audio
+
+    # MP4/M4A/MOV files with their index at the end can't be read from a
+    # pipe (ffmpeg fails, or finds no audio). Those fall back to a temp
+    # file that is always removed.
+    stream.seek(0)
+    return decode_file(stream, sr)
+
+
+def decode_file(stream, sr=SAMPLE_RATE):
+    """decode_audio() through a temp file, which ffmpeg can seek in"""
+    fd, path = tempfile.mkstemp()
+    try:
+        with os.fdopen(fd, "wb") as temp:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                temp.write(chunk)
+        return _run_ffmpeg(path, sr)
+    finally:
+        os.remove(path)
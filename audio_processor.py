@@ -1,47 +1,90 @@
-import re
-import torch
 import numpy as np
 
-def process_audio_intelligently(model, audio_path):
+from audio_ingest import decode_audio
+from cleanup import processor_cleanup
+from corrections import apply_corrections
+from decoding import COMPRESSION_RATIO_THRESHOLD, LOGPROB_THRESHOLD, decode
+from language import route, routed_options, routing_key
+from longform import transcribe_long
+from result_cache import cache_key, pcm_digest, result_cache, stream_digest
+from vad import transcribe_speech
+
+# A 2-5 word phrase repeated this many times in a row is a loop
+LOOP_NGRAM_SIZES = (2, 3, 4, 5)
+LOOP_REPEATS = 4
+
+# Optimal settings for automatic language detection
+TRANSCRIBE_OPTIONS = dict(
+    language=None,  # Auto-detect Hindi/English/Hinglish
+    task="transcribe",
+    temperature=0.0,  # Deterministic (no randomness)
+    # Beam size comes from the decoding profile (default "balanced", beam 5)
+    
+    # Anti-hallucination guards
+    condition_on_previous_text=False,
+    no_speech_threshold=0.6,
+    logprob_threshold=-1.0,
+    compression_ratio_threshold=2.4,
+    
+    # VAD (Voice Activity Detection)
+    vad_filter=True,
+    vad_parameters={
+        "threshold": 0.5,
+        "min_speech_duration_ms": 250,
+        "min_silence_duration_ms": 2000
+    }
+)
+
+def process_audio_intelligently(model, audio_path, long_form=False, profile="balanced"):
     """
     God-level audio processing with automatic language detection
     and intelligent cleaning. NO PROMPTS NEEDED.
-    """
     
-    # Step 1: Transcribe with optimal settings
-    result = model.transcribe(
-        audio_path,
-        language=None,  # Auto-detect Hindi/English/Hinglish
-        task="transcribe",
-        temperature=0.0,  # Deterministic (no randomness)
-        beam_size=5,  # Better accuracy
-        best_of=5,
-        patience=1.0,
-        
-        # Anti-hallucination guards
-        condition_on_previous_text=False,
-        no_speech_threshold=0.6,
-        logprob_threshold=-1.0,
-        compression_ratio_threshold=2.4,
-        
-        # VAD (Voice Activity Detection)
-        vad_filter=True,
-        vad_parameters={
-            "threshold": 0.5,
-            "min_speech_duration_ms": 250,
-            "min_silence_duration_ms": 2000
-        }
-    )
+    audio_path can also be decoded 16 kHz audio. Silence is trimmed
+    before the model sees it (see vad.py). long_form=True splits long
+    recordings into chunks transcribed in parallel (see longform.py).
+    profile picks the decoding search (see decoding.py). Results are
+    cached by audio content (see result_cache.py). The language is
+    detected once, on the first 30 s of speech (see language.py). Segments
+    that look hallucinated are dropped before cleaning.
+    """
+    if isinstance(audio_path, str):
+        with open(audio_path, "rb") as f:
+            digest = stream_digest(f)
+    else:
+        digest = pcm_digest(audio_path)
+    options = dict(TRANSCRIBE_OPTIONS, long_form=long_form, profile=profile, routing=routing_key())
+    key = cache_key(digest, model.model_name, options)
+    
+    # Step 1: Transcribe the speech regions with optimal settings
+    result = result_cache.get(key)
+    if result is None:
+        audio = audio_path
+        if isinstance(audio, str):
+            with open(audio, "rb") as f:
+                audio = decode_audio(f)
+        result = transcribe_speech(lambda speech: transcribe(model, speech, long_form, profile), audio)
+        result_cache.put(key, result)
     
     raw_text = result["text"].strip()
     detected_lang = result.get("language", "unknown")
+    segments = result.get("segments", [])
+    
+    # Step 2: Drop hallucinated segments, then check what's left
+    dropped = 0
+    if segments:
+        bad = bad_segments(segments)
+        dropped = int(bad.sum())
+        if dropped:
+            segments = [s for s, is_bad in zip(segments, bad) if not is_bad]
+            raw_text = "".join(s["text"] for s in segments).strip()
     
-    # Step 2: Detect if output is garbage/hallucination
-    if is_hallucination(raw_text, result.get("segments", [])):
+    if is_hallucination(raw_text, segments):
         return {
             "text": "[Unable to transcribe - please speak clearly]",
             "language": detected_lang,
-            "confidence": "low"
+            "confidence": "low",
+            "dropped_segments": dropped
         }
     
     # Step 3: Clean the text based on detected language
@@ -50,10 +93,77 @@ def process_audio_intelligently(model, audio_path):
     return {
         "text": cleaned_text,
         "language": detected_lang,
-        "confidence": "high"
+        "confidence": "high",
+        "dropped_segments": dropped
     }
 
 
+def transcribe(model, speech, long_form, profile):
+    """Detect the language once, then decode the whole recording as it"""
+    routing = route(speech, model, fallback=None)
+    options = routed_options(TRANSCRIBE_OPTIONS, routing)
+    if long_form:
+        result = transcribe_long(speech, model.model_name, options, profile)
+    else:
+        result = decode(model, speech, options, profile)
+    result["routing"] = routing
+    return result
+
+
+def find_loops(words):
+    """(start, end) word ranges where a 2-5 word phrase repeats back to back
+    LOOP_REPEATS or more times - Whisper's typical hallucination loop.
+    
+    Words become integer ids, then for each phrase length n one vectorized
+    comparison of ids[i] with ids[i + n] finds the periodic stretches: O(n).
+    """
+    if len(words) < 2 * LOOP_REPEATS:
+        return []
+    vocabulary = {}
+    ids = np.fromiter((vocabulary.setdefault(w, len(vocabulary)) for w in words),
+                      dtype=np.int64, count=len(words))
+    
+    loops = []
+    for n in LOOP_NGRAM_SIZES:
+        if len(ids) < n * LOOP_REPEATS:
+            break
+        same = np.concatenate(([False], ids[n:] == ids[:-n], [False]))
+        edges = np.flatnonzero(same[1:] != same[:-1])
+        for start, end in zip(edges[::2], edges[1::2]):
+            # A run of L matches spans L + n words = (L + n) / n repeats
+            if end - start >= n * (LOOP_REPEATS - 1):
+                loops.append((int(start), int(end) + n))
+    return loops
+
+
+def segment_confidence(segments):
+    """Per-segment avg_logprob and compression_ratio arrays, in one pass"""
+    values = np.fromiter(
+        (value for s in segments
+         for value in (s.get("avg_logprob", 0.0), s.get("compression_ratio", 1.0))),
+        dtype=np.float64, count=2 * len(segments),
+    ).reshape(len(segments), 2)
+    return values[:, 0], values[:, 1]
+
+
+def bad_segments(segments):
+    """Boolean mask of segments that are low-confidence or part of a loop"""
+    avg_logprob, compression = segment_confidence(segments)
+    bad = (avg_logprob < LOGPROB_THRESHOLD) | (compression > COMPRESSION_RATIO_THRESHOLD)
+    
+    # Loops can run across segment boundaries, so look at all words at once
+    words = []
+    owner = []
+    for i, segment in enumerate(segments):
+        segment_words = segment["text"].split()
+        words += segment_words
+        owner += [i] * len(segment_words)
+    owner = np.array(owner, dtype=np.int64)
+    for start, end in find_loops(words):
+        bad[owner[start:end]] = True
+    return bad
+
+
 def is_hallucination(text, segments):
     """Detect if Whisper hallucinated garbage output"""
     
@@ -69,23 +179,17 @@ def is_hallucination(text, segments):
             return True
     
     # Check for looping patterns
-    if len(words) >= 4:
-        # Check if same 2-word pattern repeats
-        for i in range(len(words) - 3):
-            pattern = f"{words[i]} {words[i+1]}"
-            rest = " ".join(words[i+2:])
-            if rest.count(pattern) >= 3:
-                return True
+    if find_loops(words):
+        return True
     
     # Low confidence from segments
     if segments:
-        avg_logprob = np.mean([s.get("avg_logprob", 0) for s in segments])
-        if avg_logprob < -1.0:
+        avg_logprob, compression = segment_confidence(segments)
+        if avg_logprob.mean() < LOGPROB_THRESHOLD:
             return True
         
         # Check compression ratio
-        avg_compression = np.mean([s.get("compression_ratio", 1) for s in segments])
-        if avg_compression > 2.4:
+        if compression.mean() > COMPRESSION_RATIO_THRESHOLD:
             return True
     
     return False
@@ -94,150 +198,16 @@ def is_hallucination(text, segments):
 def clean_transcription(text, language):
     """
     Intelligent cleaning for Hindi, English, and Hinglish
+    (repetitions, corrections, spacing, broken Devanagari - see cleanup.py)
     """
-    
-    # Step 1: Remove repetitions
-    text = remove_phrase_repetition(text)
-    
-    # Step 2: Fix common Hindi OCR-like errors
-    text = fix_hindi_errors(text)
-    
-    # Step 3: Fix Hinglish (technical English words in Hindi script)
-    text = fix_hinglish(text)
-    
-    # Step 4: Normalize spacing and punctuation
-    text = normalize_spacing(text)
-    
-    # Step 5: Fix broken Devanagari
-    text = fix_devanagari(text)
-    
-    return text.strip()
-
-
-def remove_phrase_repetition(text):
-    """Remove repeated phrases and words"""
-    words = text.split()
-    cleaned = []
-    
-    for i, word in enumerate(words):
-        # Skip if same as last 2 words (simple repetition)
-        if len(cleaned) >= 2 and word == cleaned[-1] == cleaned[-2]:
-            continue
-        
-        # Skip if part of repeating 3-word pattern
-        if len(cleaned) >= 3:
-            last_three = " ".join(cleaned[-3:])
-            current_three = " ".join(cleaned[-2:] + [word])
-            if last_three == current_three:
-                continue
-        
-        cleaned.append(word)
-    
-    return " ".join(cleaned)
+    return processor_cleanup(language).run(text)
 
 
 def fix_hindi_errors(text):
     """Fix common Hindi transcription errors"""
-    
-    CORRECTIONS = {
-        # Greetings
-        "सत स्री अकाल": "सत श्री अकाल",
-        "सत सरी अकाल": "सत श्री अकाल",
-        "सतसरीअकाल": "सत श्री अकाल",
-        "नमसते": "नमस्ते",
-        "नमसकार": "नमस्कार",
-        
-        # Common words
-        "अबिननदन": "अभिनंदन",
-        "अभिननदन": "अभिनंदन",
-        "खुबसूरत": "खूबसूरत",
-        "खुपसूरत": "खूबसूरत",
-        "बिचरना": "बिछड़ना",
-        "बिचड़ना": "बिछड़ना",
-        
-        # Pronouns
-        "आप": "आप",
-        "हम": "हम",
-        "तुम": "तुम",
-        
-        # Common verbs
-        "करना": "करना",
-        "होना": "होना",
-        "जाना": "जाना",
-    }
-    
-    for wrong, correct in CORRECTIONS.items():
-        text = text.replace(wrong, correct)
-    
-    return text
+    return apply_corrections(text, "hindi")
 
 
 def fix_hinglish(text):
     """Convert technical English words back from Hindi script"""
-    
-    HINGLISH_MAP = {
-        # Tech terms
-        "माइक": "mic",
-        "माइट": "mic",
-        "टेस्टिंग": "testing",
-        "टेस्ट": "test",
-        "एपीआई": "API",
-        "एपीआईकी": "API key",
-        "की": "key",
-        "बटन": "button",
-        "क्लिक": "click",
-        
-        # Common English
-        "हलो": "hello",
-        "हैलो": "hello",
-        "थैंक्यू": "thank you",
-        "थैंक यू": "thank you",
-        "सॉरी": "sorry",
-        "ओके": "okay",
-        "प्लीज": "please",
-        "ईवनिंग": "evening",
-        "मॉर्निंग": "morning",
-        "जेंटलमेन": "gentleman",
-        "लेडीज": "ladies",
-        
-        # Directions
-        "इधर": "idhar",
-        "उधर": "udhar",
-    }
-    
-    for hindi, english in HINGLISH_MAP.items():
-        # Replace whole words only
-        text = re.sub(rf'\b{re.escape(hindi)}\b', english, text)
-    
-    return text
-
-
-def normalize_spacing(text):
-    """Clean up spacing and punctuation"""
-    
-    # Fix multiple spaces
-    text = re.sub(r'\s+', ' ', text)
-    
-    # Fix repeated punctuation
-    text = re.sub(r'([।.!?])\1+', r'\1', text)
-    
-    # Fix character repetition (e.g., हैैैै -> है)
-    text = re.sub(r'(.)\1{3,}', r'\1', text)
-    
-    # Add space after Devanagari danda
-    text = re.sub(r'।(\S)', r'। \1', text)
-    
-    return text
-
-
-def fix_devanagari(text):
-    """Fix broken Devanagari characters and matras"""
-    
-    # Fix separated matras (vowel marks)
-    text = re.sub(r'(\S)\s+(़)', r'\1\2', text)  # Nukta
-    text = re.sub(r'(\S)\s+(ा|ि|ी|ु|ू|े|ै|ो|ौ|ं|ः|्)', r'\1\2', text)  # Vowel marks
-    
-    # Fix broken conjuncts
-    text = re.sub(r'्\s+', '्', text)
-    
-    return text
\ No newline at end of file
+    return apply_corrections(text, "hinglish")
\ No newline at end of file
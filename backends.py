@@ -0,0 +1,206 @@
+"""
+Inference backends behind one interface.
+
+Both backends expose ``transcribe(audio, **options)`` returning the same
+dict as openai-whisper (``text``, ``segments``, ``language``), so callers
+don't care which one is running. ``iter_segments`` yields the same
+segments one by one as they are decoded, and ``detect_language`` runs
+language identification alone. Options a backend doesn't understand
+(e.g. ``vad_filter`` on openai-whisper) are dropped with a one-time note
+instead of crashing the request. Pick the backend with WHISPER_BACKEND.
+"""
+
+import dataclasses
+import inspect
+
+import config
+from audio_ingest import SAMPLE_RATE
+from batching import BatchScheduler
+from decoding import WINDOW_SECONDS, shift_segments
+from vad import split_on_silence
+from weight_store import load_model
+
+# Rough fp32 footprint of each model size, scaled by the compute type
+MODEL_SIZES_MB = {
+    "tiny": 150,
+    "base": 290,
+    "small": 970,
+    "medium": 3100,
+    "large-v3": 6200,
+}
+COMPUTE_TYPE_SCALE = {"int8": 0.25, "int8_float32": 0.25, "float16": 0.5, "float32": 1.0}
+
+
+def estimate_memory_mb(model_name, backend=None):
+    """Expected footprint of a model before it is loaded"""
+    if config.MODEL_SERVERS and backend is None:
+        return 0.0  # loaded by the model servers (see model_server.py)
+    if (backend or config.WHISPER_BACKEND) == "faster-whisper":
+        scale = COMPUTE_TYPE_SCALE.get(config.FASTER_WHISPER_COMPUTE_TYPE, 1.0)
+    else:
+        scale = 1.0
+    return MODEL_SIZES_MB.get(model_name, 0) * scale
+
+
+class Backend:
+    name = None
+
+    def __init__(self, model_name, device):
+        self.model_name = model_name
+        self.device = device
+        self._supported = set()
+        self._warned = set()
+
+    def _filter_options(self, options):
+        """Drop options this backend can't handle, mentioning each once"""
+        kept = {}
+        for key, value in options.items():
+            if key in self._supported:
+                kept[key] = value
+            elif key not in self._warned:
+                self._warned.add(key)
+                print(f"💡 {self.name} ignores option '{key}'")
+        return kept
+
+    def transcribe(self, audio, **options):
+        raise NotImplementedError
+
+    def iter_segments(self, audio, **options):
+        """Segments as soon as they're decoded; returns the language.
+
+        Without native streaming, WINDOW_SECONDS windows cut at pauses are
+        transcribed one after another.
+        """
+        language = None
+        for start, end in split_on_silence(audio, SAMPLE_RATE, WINDOW_SECONDS):
+            result = self.transcribe(audio[start:end], **options)
+            language = language or result.get("language")
+            yield from shift_segments(result["segments"], start / SAMPLE_RATE)
+        return language
+
+    def detect_language(self, audio):
+        """(language, probability) for the first 30 s of ``audio``"""
+        raise NotImplementedError
+
+    def memory_mb(self):
+        return estimate_memory_mb(self.model_name, self.name)
+
+    def batching_stats(self):
+        return None
+
+
+class OpenAIWhisperBackend(Backend):
+    name = "openai-whisper"
+
+    def __init__(self, model_name, device):
+        super().__init__(model_name, device)
+        import torch
+        import whisper
+
+        if config.INTRA_OP_THREADS:
+            torch.set_num_threads(config.INTRA_OP_THREADS)
+        if config.INTER_OP_THREADS:
+            try:
+                torch.set_num_interop_threads(config.INTER_OP_THREADS)
+            except RuntimeError:
+                # Can only be set once, before torch runs anything in parallel
+                pass
+
+        self.model = load_model(model_name, device=device)
+        self.scheduler = BatchScheduler(self.model, config.BATCH_MAX_SIZE, config.BATCH_MAX_WAIT_MS)
+        self._supported = set(inspect.signature(whisper.transcribe).parameters) - {"model", "audio"}
+        self._supported |= {f.name for f in dataclasses.fields(whisper.DecodingOptions)}
+
+    def transcribe(self, audio, **options):
+        return self.scheduler.run(self.model.transcribe, audio, **self._filter_options(options))
+
+    def detect_language(self, audio):
+        import whisper
+
+        def detect():
+            mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), self.model.dims.n_mels)
+            _, probs = self.model.detect_language(mel.to(self.model.device))
+            return max(probs.items(), key=lambda item: item[1])
+        # An encoder and a decoder pass on the shared model: it must not run
+        # while another request is decoding (its kv-cache hooks would pick
+        # this audio up), so it takes the model like transcribe() does
+        return self.scheduler.run(detect)
+
+    def batching_stats(self):
+        return self.scheduler.stats()
+
+    def memory_mb(self):
+        tensors = list(self.model.parameters()) + list(self.model.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors) / (1024 * 1024)
+
+
+class FasterWhisperBackend(Backend):
+    """CTranslate2 inference - int8 on CPU is several times faster than fp32"""
+
+    name = "faster-whisper"
+
+    # openai-whisper spellings -> faster-whisper spellings
+    RENAMED = {"logprob_threshold": "log_prob_threshold"}
+
+    def __init__(self, model_name, device):
+        super().__init__(model_name, device)
+        from faster_whisper import WhisperModel
+
+        self.compute_type = config.FASTER_WHISPER_COMPUTE_TYPE
+        self.model = WhisperModel(
+            model_name,
+            device=device,
+            compute_type=self.compute_type,
+            cpu_threads=config.INTRA_OP_THREADS,
+            num_workers=max(1, config.INTER_OP_THREADS),
+        )
+        self._supported = set(inspect.signature(self.model.transcribe).parameters) - {"audio"}
+
+    def _generate(self, audio, options):
+        options = {self.RENAMED.get(key, key): value for key, value in options.items()}
+        # Decoding happens lazily, while the segments are iterated
+        segments, info = self.model.transcribe(audio, **self._filter_options(options))
+
+        def segment_dicts():
+            for segment in segments:
+                result = segment._asdict()
+                result["words"] = [word._asdict() for word in segment.words or []]
+                yield result
+        return segment_dicts(), info.language
+
+    def transcribe(self, audio, **options):
+        segments, language = self._generate(audio, options)
+        results = list(segments)
+        return {
+            "text": "".join(segment["text"] for segment in results),
+            "segments": results,
+            "language": language,
+        }
+
+    def iter_segments(self, audio, **options):
+        segments, language = self._generate(audio, options)
+        yield from segments
+        return language
+
+    def detect_language(self, audio):
+        # transcribe() detects the language up front; nothing is decoded
+        # until the segments are iterated
+        _, info = self.model.transcribe(audio, language=None)
+        return info.language, info.language_probability
+
+
+BACKENDS = {
+    OpenAIWhisperBackend.name: OpenAIWhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+
+def load_backend(model_name, device=config.MODEL_DEVICE, backend=None):
+    """Load ``model_name`` with the configured (or given) backend"""
+    if config.MODEL_SERVERS and backend is None:
+        from model_server import RemoteBackend
+        return RemoteBackend(model_name, device)
+    backend = backend or config.WHISPER_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}' (choose from: {', '.join(BACKENDS)})")
+    return BACKENDS[backend](model_name, device)
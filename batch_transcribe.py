@@ -0,0 +1,206 @@
+"""
+Batch transcription - a whole directory tree (or a list of files) in one go
+Usage: python batch_transcribe.py <directory or file list> [-o results.jsonl] [-w workers] [-m model]
+
+Files are shared out to worker processes that each load the model once.
+Every result is appended to the JSONL output, and a manifest next to it
+records which files are finished, so an interrupted run started again
+with the same arguments picks up where it stopped. Changed files (new
+size or modification time) and failed ones are done again.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import config
+from audio_ingest import SAMPLE_RATE
+from decoding import PROFILE_NAMES
+
+AUDIO_EXTENSIONS = {
+    ".wav", ".mp3", ".m4a", ".mp4", ".webm", ".ogg", ".opus", ".flac", ".aac", ".wma", ".mov", ".mkv",
+}
+
+# Set in each worker process by _init_worker
+_worker_model = None
+_worker_profile = None
+
+
+def find_audio_files(source):
+    """Audio files under a directory, or the paths listed in a text file"""
+    if os.path.isdir(source):
+        paths = []
+        for root, _, names in os.walk(source):
+            for name in names:
+                if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                    paths.append(os.path.join(root, name))
+        return sorted(paths)
+    with open(source, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def fingerprint(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def load_manifest(manifest_path, results_path):
+    """Finished files from an earlier run.
+
+    Result lines written after the last manifest entry (a run killed
+    between the two writes) are cut off so they don't appear twice.
+    """
+    finished = {}
+    results_end = 0
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # half-written last line
+                results_end = max(results_end, entry.get("results_end", 0))
+                if entry["status"] == "done":
+                    finished[entry["path"]] = entry
+                else:
+                    finished.pop(entry["path"], None)
+    if os.path.exists(results_path) and os.path.getsize(results_path) > results_end:
+        with open(results_path, "r+b") as f:
+            f.truncate(results_end)
+    return finished
+
+
+def _init_worker(model_name, profile, threads):
+    global _worker_model, _worker_profile
+    # Share the cores between workers instead of every one using all of them
+    config.INTRA_OP_THREADS = threads
+    from model_registry import get_model
+    _worker_model = get_model(model_name)
+    _worker_profile = profile
+
+
+def _transcribe_file(path):
+    from audio_ingest import decode_audio
+    from audio_processor import process_audio_intelligently
+
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        audio = decode_audio(f)
+    result = process_audio_intelligently(_worker_model, audio, profile=_worker_profile)
+    result["audio_seconds"] = round(len(audio) / SAMPLE_RATE, 2)
+    result["seconds"] = round(time.perf_counter() - start, 2)
+    return result
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Transcribe many audio files with a pool of worker processes")
+    parser.add_argument("source", help="directory to walk, or a text file with one path per line")
+    parser.add_argument("-o", "--output", default="transcripts.jsonl", help="JSONL results file")
+    parser.add_argument("-w", "--workers", type=int, default=max(1, (os.cpu_count() or 1) // 4),
+                        help="worker processes, each with its own model")
+    parser.add_argument("-m", "--model", default=config.DEFAULT_MODEL, choices=config.ALLOWED_MODELS)
+    parser.add_argument("-p", "--profile", default="balanced", choices=PROFILE_NAMES)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    manifest_path = args.output + ".manifest"
+
+    paths = find_audio_files(args.source)
+    finished = load_manifest(manifest_path, args.output)
+    todo = []
+    for path in paths:
+        try:
+            current = fingerprint(path)
+        except OSError as e:
+            print(f"⚠️  Skipping {path}: {e}")
+            continue
+        entry = finished.get(path)
+        if entry is None or {k: entry.get(k) for k in current} != current:
+            todo.append(path)
+
+    print(f"\n📂 {len(paths)} files, {len(paths) - len(todo)} already done, {len(todo)} to go")
+    print(f"   Model: {args.model} ({args.profile}), {args.workers} workers")
+    print("=" * 60)
+    if not todo:
+        return
+
+    threads = max(1, (os.cpu_count() or 1) // args.workers)
+    pool = ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(args.model, args.profile, threads),
+    )
+    started = time.perf_counter()
+    audio_seconds = 0.0
+    done = failed = 0
+    broken = False
+    queue = iter(todo)
+    running = {}
+
+    with pool, open(args.output, "ab") as results, \
+            open(manifest_path, "a", encoding="utf-8") as manifest:
+        # Keep a couple of files per worker queued, not all of them at once
+        for path in queue:
+            running[pool.submit(_transcribe_file, path)] = path
+            if len(running) >= 2 * args.workers:
+                break
+
+        while running:
+            completed, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in completed:
+                path = running.pop(future)
+                entry = dict(path=path, **fingerprint(path))
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    # A worker died (out of memory, model failed to load):
+                    # leave the rest for the next run
+                    broken = True
+                    continue
+                except Exception as e:
+                    failed += 1
+                    entry.update(status="failed", error=str(e))
+                    print(f"❌ {path}: {e}")
+                else:
+                    done += 1
+                    audio_seconds += result["audio_seconds"]
+                    results.write((json.dumps(dict(path=path, **result), ensure_ascii=False) + "\n").encode("utf-8"))
+                    results.flush()
+                    entry.update(status="done", audio_seconds=result["audio_seconds"])
+
+                    wall = time.perf_counter() - started
+                    print(f"✅ [{done + failed}/{len(todo)}] {path} "
+                          f"({result['audio_seconds']:.0f}s audio in {result['seconds']:.0f}s) "
+                          f"⚡ {audio_seconds / wall:.1f} audio-hours per wall-hour")
+
+                # The manifest entry comes last: a result only counts once it's recorded here
+                entry["results_end"] = results.tell()
+                manifest.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                manifest.flush()
+
+                next_path = None if broken else next(queue, None)
+                if next_path is not None:
+                    running[pool.submit(_transcribe_file, next_path)] = next_path
+
+    wall = time.perf_counter() - started
+    print("=" * 60)
+    print(f"✓ {done} transcribed, {failed} failed in {wall / 3600:.2f} h")
+    print(f"✓ {audio_seconds / 3600:.2f} h of audio = {audio_seconds / wall:.1f} audio-hours per wall-hour")
+    print(f"✓ Results: {args.output}")
+    print("=" * 60)
+    if broken:
+        print("❌ A worker process died - run the same command again to resume")
+    if failed or broken:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
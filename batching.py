@@ -0,0 +1,176 @@
+"""
+Cross-request batching of Whisper encoder passes (openai-whisper backend).
+
+Each transcription still runs its own ``model.transcribe``, but the
+encoder calls it makes (one per 30 s window) go to an EncoderBatcher that
+waits up to BATCH_MAX_WAIT_MS for other requests' windows and encodes up
+to BATCH_MAX_SIZE of them in one forward pass. Decoding then continues per
+request with the precomputed features. A lone request doesn't wait: the
+batch closes as soon as every request in flight has queued its window.
+
+openai-whisper keeps its decoder kv-cache in hooks on the shared model, so
+two threads decoding on one model at the same time corrupt each other's
+output. BatchScheduler therefore lets one request at a time use the model,
+and releases it only while that request waits for its encoder batch - which
+is exactly when the other requests get to queue their windows.
+
+Both the request's own passes and the batched encoder passes run in CPU
+slots from the inference scheduler (see inference_scheduler.py).
+"""
+
+import queue
+import threading
+import time
+
+import config
+from inference_scheduler import scheduler as inference_scheduler
+from metrics import observe_stage
+
+
+class _Request:
+    def __init__(self, mel):
+        self.mel = mel
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class EncoderBatcher:
+    def __init__(self, forward, max_batch=config.BATCH_MAX_SIZE, max_wait_ms=config.BATCH_MAX_WAIT_MS,
+                 in_flight=None):
+        self._forward = forward
+        # How many callers could still send a window (None = don't know)
+        self._in_flight = in_flight
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self._requests = queue.Queue()
+        self._lock = threading.Lock()
+        self._counts = {"batches": 0, "windows": 0}
+        self._thread = threading.Thread(target=self._run, name="encoder-batcher", daemon=True)
+        self._thread.start()
+
+    def encode(self, mel):
+        """Encoder output for ``mel``, computed together with whatever else is waiting"""
+        request = _Request(mel)
+        self._requests.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _collect(self):
+        batch = [self._requests.get()]
+        size = len(batch[0].mel)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            if self._in_flight is not None and len(batch) >= self._in_flight():
+                break
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._requests.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.mel)
+        return batch
+
+    def _run(self):
+        import torch
+
+        while True:
+            batch = self._collect()
+            groups = {}
+            for request in batch:
+                groups.setdefault((tuple(request.mel.shape[1:]), request.mel.dtype), []).append(request)
+
+            for group in groups.values():
+                try:
+                    with torch.no_grad():
+                        features = inference_scheduler.run(self._forward,
+                                                           torch.cat([request.mel for request in group]))
+                    for request, result in zip(group, features.split([len(r.mel) for r in group])):
+                        request.result = result
+                except Exception as e:
+                    for request in group:
+                        request.error = e
+                finally:
+                    for request in group:
+                        request.done.set()
+
+            with self._lock:
+                self._counts["batches"] += 1
+                self._counts["windows"] += len(batch)
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        counts["avg_batch"] = round(counts["windows"] / counts["batches"], 2) if counts["batches"] else None
+        return counts
+
+
+class BatchScheduler:
+    """Serializes use of one model, batching its encoder passes across requests"""
+
+    def __init__(self, model, max_batch=config.BATCH_MAX_SIZE, max_wait_ms=config.BATCH_MAX_WAIT_MS):
+        self._lock = threading.Lock()
+        self._state = threading.local()
+        self._active = 0              # requests inside or waiting for run()
+        self._active_lock = threading.Lock()
+        self._forward = model.encoder.forward
+        self.batcher = None
+        if max_batch > 1:
+            self.batcher = EncoderBatcher(self._forward, max_batch, max_wait_ms,
+                                          in_flight=lambda: self._active)
+        # Encoder calls come through here, so their time can be told apart from decoding
+        model.encoder.forward = self._encode
+
+    def _encode(self, mel):
+        holds_model = getattr(self._state, "holds_model", False)
+        if self.batcher is None:
+            start = time.perf_counter()
+            try:
+                return self._forward(mel)
+            finally:
+                if holds_model:
+                    self._state.encode_seconds += time.perf_counter() - start
+        if not holds_model:
+            return self.batcher.encode(mel)
+        # Let other requests reach their encoder call while we wait for ours,
+        # and let the batch have our cores
+        with inference_scheduler.suspended():
+            self._lock.release()
+            try:
+                start = time.perf_counter()
+                try:
+                    return self.batcher.encode(mel)
+                finally:
+                    self._state.encode_seconds += time.perf_counter() - start
+            finally:
+                start = time.perf_counter()
+                self._lock.acquire()
+                self._state.wait_seconds += time.perf_counter() - start
+
+    def run(self, fn, *args, **kwargs):
+        """Call ``fn`` with the model to ourselves (except while encoding)"""
+        with self._active_lock:
+            self._active += 1
+        try:
+            with self._lock:
+                self._state.holds_model = True
+                self._state.encode_seconds = self._state.wait_seconds = 0.0
+                start = time.perf_counter()
+                try:
+                    return inference_scheduler.run(fn, *args, **kwargs)
+                finally:
+                    self._state.holds_model = False
+                    total = time.perf_counter() - start
+                    observe_stage("encoder", self._state.encode_seconds)
+                    observe_stage("decoder", total - self._state.encode_seconds - self._state.wait_seconds)
+        finally:
+            with self._active_lock:
+                self._active -= 1
+
+    def stats(self):
+        return self.batcher.stats() if self.batcher else None
@@ -0,0 +1,742 @@
+"""
+Micro-benchmarks for the text cleanup path - no model needed
+Usage: python benchmark.py [number_of_words]
+
+Hallucination detector, original vs O(n):
+Usage: python benchmark.py hallucination [number_of_words]
+
+Cleanup pipelines, batch and segment by segment vs the original passes,
+and each fused pattern vs the passes it replaces:
+Usage: python benchmark.py cleanup [number_of_words]
+
+Load test of encoder batching (needs openai-whisper):
+Usage: python benchmark.py loadtest [model] [audio_file]
+
+Import time of the server, which must not pull in torch/whisper (exits
+non-zero over IMPORT_BUDGET_SECONDS):
+Usage: python benchmark.py startup
+
+Inference scheduler vs every pass using all cores, with one model copy
+per client (needs openai-whisper):
+Usage: python benchmark.py slots [model] [audio_file] [clients]
+
+Everything at once, written to JSON (models: comma-separated, default tiny;
+real-time factors are skipped for backends that aren't installed):
+Usage: python benchmark.py suite [results.json] [models]
+
+Regressions between two suite runs (default threshold 10%) - run both
+on the same, otherwise idle machine:
+Usage: python benchmark.py compare old.json new.json [threshold_percent]
+"""
+
+import contextlib
+import functools
+import io
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+
+from reference import (
+    FILLER_WORDS,
+    FUSED_PASSES,
+    MESSY_PIECES,
+    app_matcher,
+    original_app_corrections,
+    original_clean_transcription,
+    original_processor_corrections,
+    original_super_clean,
+    processor_matcher,
+    synthetic_transcript,
+)
+
+# (name, original implementation, factory for the compiled matcher)
+CORRECTION_CASES = [
+    ("app", original_app_corrections, app_matcher),
+    ("processor", original_processor_corrections, processor_matcher),
+]
+
+
+def chars_per_second(fn, text, repeat=3):
+    """Best-of-N throughput"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    return len(text) / best
+
+
+def legacy_is_hallucination(text, segments):
+    """The original is_hallucination, with its O(n^2) loop check"""
+    import numpy as np
+
+    if len(text.strip()) < 3:
+        return True
+    words = text.split()
+    if len(words) > 6:
+        unique_words = len(set(words))
+        if unique_words <= 2:
+            return True
+    if len(words) >= 4:
+        for i in range(len(words) - 3):
+            pattern = f"{words[i]} {words[i+1]}"
+            rest = " ".join(words[i+2:])
+            if rest.count(pattern) >= 3:
+                return True
+    if segments:
+        avg_logprob = np.mean([s.get("avg_logprob", 0) for s in segments])
+        if avg_logprob < -1.0:
+            return True
+        avg_compression = np.mean([s.get("compression_ratio", 1) for s in segments])
+        if avg_compression > 2.4:
+            return True
+    return False
+
+
+# (text, is it a hallucination loop?)
+LOOP_CASES = [
+    ("थैंक यू थैंक यू थैंक यू थैंक यू", True),
+    ("please subscribe to my channel please subscribe to my channel "
+     "please subscribe to my channel please subscribe to my channel", True),
+    ("मैं घर जा रहा हूँ और फिर मैं घर जा रहा हूँ", False),
+    ("आज मौसम अच्छा है कल भी मौसम अच्छा था परसों भी मौसम अच्छा होगा", False),
+    ("ok ok ok", False),
+]
+
+
+def unique_transcript(n_words, seed=0):
+    """Text without repeated phrases - the original loop check's worst case"""
+    rng = random.Random(seed)
+    vocabulary = [f"{rng.choice(FILLER_WORDS)}{i}" for i in range(5000)]
+    return " ".join(rng.choice(vocabulary) for _ in range(n_words))
+
+
+def fake_segments(text, words_per_segment=12):
+    words = text.split()
+    return [
+        {"text": " " + " ".join(words[i:i + words_per_segment]), "avg_logprob": -0.3, "compression_ratio": 1.4}
+        for i in range(0, len(words), words_per_segment)
+    ]
+
+
+def hallucination_benchmark(n_words=50000):
+    from audio_processor import bad_segments, find_loops, is_hallucination
+
+    print("Checking loop detection...")
+    for text, expected in LOOP_CASES:
+        if bool(find_loops(text.split())) != expected:
+            raise AssertionError(f"find_loops({text!r}) should be {expected}")
+    print(f"✓ {len(LOOP_CASES)} cases detected as expected")
+
+    text = unique_transcript(n_words)
+    segments = fake_segments(text)
+    print(f"\nHallucination check on {n_words} words ({len(segments)} segments)")
+    print("=" * 60)
+    timings = {}
+    for name, fn in (("original", legacy_is_hallucination), ("O(n)", is_hallucination)):
+        start = time.perf_counter()
+        flagged = fn(text, segments)
+        timings[name] = time.perf_counter() - start
+        print(f"  {name:<10} {timings[name]:>10.3f}s  hallucination={flagged}")
+    print(f"  Speedup:   {timings['original'] / timings['O(n)']:>10.0f}x")
+
+    # A loop in the middle costs one segment, not the whole transcript
+    looped = fake_segments(text)
+    looped.insert(len(looped) // 2, {"text": " " + " ".join(["thank you"] * 6), "avg_logprob": -0.2,
+                                      "compression_ratio": 1.2})
+    start = time.perf_counter()
+    bad = bad_segments(looped)
+    print(f"  Per-segment check: {int(bad.sum())} of {len(looped)} segments dropped "
+          f"in {time.perf_counter() - start:.3f}s")
+    print("=" * 60)
+
+
+def messy_transcript(n_words, seed=0):
+    """synthetic_transcript plus repetitions, split matras, odd spacing"""
+    rng = random.Random(seed)
+    words = synthetic_transcript(n_words, seed).split()
+    for _ in range(max(1, n_words // 8)):
+        words.insert(rng.randrange(len(words) + 1), rng.choice(MESSY_PIECES))
+    return rng.choice(["", " "]) + " ".join(words) + rng.choice(["", " ", "।"])
+
+
+def cleanup_benchmark(n_words=10000):
+    from cleanup import app_cleanup, processor_cleanup
+
+    cases = [
+        ("super_clean_transcription", original_super_clean, app_cleanup),
+        ("clean_transcription", original_clean_transcription, processor_cleanup),
+    ]
+    text = messy_transcript(n_words)
+    print(f"\nFused patterns on {n_words} words")
+    print("=" * 60)
+    for name, original, fused in FUSED_PASSES:
+        separate = chars_per_second(original, text)
+        combined = chars_per_second(fused, text)
+        print(f"  {name + ':':<22}{separate:>12,.0f} -> {combined:>12,.0f} chars/s  ({combined / separate:.1f}x)")
+    print("=" * 60)
+
+    segments = [segment["text"] for segment in fake_segments(text)]
+    for name, legacy, make_pipeline in cases:
+        print(f"\n{name} on {n_words} words ({len(segments)} segments)")
+        print("=" * 60)
+        original = chars_per_second(legacy, text)
+        batch = chars_per_second(make_pipeline().run, text)
+
+        pipeline = make_pipeline()
+        slowest = 0.0
+        start = time.perf_counter()
+        for segment in segments:
+            segment_start = time.perf_counter()
+            pipeline.feed(segment)
+            slowest = max(slowest, time.perf_counter() - segment_start)
+        pipeline.finish()
+        streamed = len(text) / (time.perf_counter() - start)
+
+        print(f"  Original passes:       {original:>14,.0f} chars/s")
+        print(f"  Pipeline (batch):      {batch:>14,.0f} chars/s  ({batch / original:.1f}x)")
+        print(f"  Pipeline (streamed):   {streamed:>14,.0f} chars/s  ({streamed / original:.1f}x)")
+        print(f"  Slowest segment:       {slowest * 1000:>14.2f} ms")
+        print("=" * 60)
+
+
+def synthetic_audio(seconds, sr=16000, seed=0):
+    """Deterministic speech-band noise bursts, for runs without a recording"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    envelope = (np.sin(2 * np.pi * 0.5 * t) > 0).astype(np.float32)
+    tone = np.sin(2 * np.pi * 220 * t) + 0.5 * np.sin(2 * np.pi * 440 * t)
+    return (0.1 * envelope * tone + 0.01 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def run_load(backend, audio, options, concurrency, n_requests):
+    """(requests per second, p95 latency) with ``concurrency`` clients"""
+    import numpy as np
+
+    latencies = []
+    lock = threading.Lock()
+
+    def one_request(_):
+        start = time.perf_counter()
+        backend.transcribe(audio, **options)
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one_request, range(n_requests)))
+    wall = time.perf_counter() - start
+    return n_requests / wall, float(np.percentile(latencies, 95))
+
+
+def loadtest(model_name="tiny", audio_file=None, levels=(1, 2, 4, 8)):
+    """Throughput vs p95 latency with encoder batching off and on"""
+    from audio_ingest import decode_audio
+    from backends import load_backend
+    from decoding import PROFILES
+
+    if audio_file:
+        with open(audio_file, "rb") as f:
+            audio = decode_audio(f)
+    else:
+        audio = synthetic_audio(30.0)
+    options = dict(PROFILES["fast"], language="hi", temperature=0.0,
+                   condition_on_previous_text=False, verbose=None)
+
+    print(f"Load test: {model_name}, {len(audio) / 16000:.0f}s of audio per request")
+    print("=" * 60)
+    batch_size = max(2, config.BATCH_MAX_SIZE)
+    backends = {}
+    for label, size in (("off", 1), ("on", batch_size)):
+        config.BATCH_MAX_SIZE = size
+        backends[label] = load_backend(model_name, backend="openai-whisper")
+        backends[label].transcribe(audio, **options)  # warm-up
+
+    print(f"{'clients':>8} | {'batching off':>22} | {'batching on':>22}")
+    print(f"{'':>8} | {'req/s':>10} {'p95 (s)':>11} | {'req/s':>10} {'p95 (s)':>11}")
+    for concurrency in levels:
+        n_requests = concurrency * 4
+        row = [f"{concurrency:>8}"]
+        for label in ("off", "on"):
+            rps, p95 = run_load(backends[label], audio, options, concurrency, n_requests)
+            row.append(f"{rps:>10.2f} {p95:>11.2f}")
+        print(" | ".join(row))
+    print("=" * 60)
+    print(f"Encoder batches (max {batch_size}, wait {config.BATCH_MAX_WAIT_MS:.0f} ms): "
+          f"{backends['on'].batching_stats()}")
+
+
+def slots_benchmark(model_name="tiny", audio_file=None, clients=4, requests_per_client=4):
+    """Throughput and tail latency of ``clients`` concurrent transcriptions,
+    each on its own copy of the model, with and without CPU slots"""
+    import numpy as np
+
+    from audio_ingest import decode_audio
+    from backends import load_backend
+    from decoding import PROFILES
+    from inference_scheduler import scheduler
+
+    if audio_file:
+        with open(audio_file, "rb") as f:
+            audio = decode_audio(f)
+    else:
+        audio = synthetic_audio(30.0)
+    options = dict(PROFILES["fast"], language="hi", temperature=0.0,
+                   condition_on_previous_text=False, verbose=None)
+
+    config.BATCH_MAX_SIZE = 1
+    models = [load_backend(model_name, backend="openai-whisper") for _ in range(clients)]
+    for model in models:
+        model.transcribe(audio, **options)  # warm-up
+
+    def one_client(model):
+        latencies = []
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            model.transcribe(audio, **options)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    max_slots = scheduler.max_slots or max(1, (os.cpu_count() or 1) // 4)
+    print(f"Slots: {model_name} x {clients} clients, {len(audio) / 16000:.0f}s of audio per request, "
+          f"{os.cpu_count()} cores")
+    print("=" * 60)
+    print(f"{'':<24} {'req/s':>8} {'p50 (s)':>9} {'p99 (s)':>9}")
+    for label, slots in (("all cores per pass", 0), (f"up to {max_slots} slots", max_slots)):
+        scheduler.max_slots = slots
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            latencies = [t for client in pool.map(one_client, models) for t in client]
+        wall = time.perf_counter() - start
+        print(f"{label:<24} {len(latencies) / wall:>8.2f} {np.percentile(latencies, 50):>9.2f} "
+              f"{np.percentile(latencies, 99):>9.2f}")
+    print("=" * 60)
+    print(f"Scheduler: {scheduler.stats()}")
+
+
+FIXTURE_PATTERNS = ("speech", "tones", "noise", "gaps")
+
+
+def fixture_audio(pattern, seconds, sr=16000, seed=0):
+    """Deterministic test audio, generated offline.
+
+    ``speech``: synthetic_audio's bursts. ``tones``: a scale of sine tones.
+    ``noise``: steady background noise. ``gaps``: bursts of speech between
+    long silences, for VAD.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sr)
+    t = np.arange(n) / sr
+    if pattern == "speech":
+        return synthetic_audio(seconds, sr, seed)
+    if pattern == "tones":
+        notes = 220 * 2 ** (np.floor(t * 2) % 12 / 12)
+        return (0.2 * np.sin(2 * np.pi * notes * t)).astype(np.float32)
+    if pattern == "noise":
+        return (0.02 * rng.standard_normal(n)).astype(np.float32)
+    if pattern == "gaps":
+        audio = 0.001 * rng.standard_normal(n)
+        for start in range(0, n, 10 * sr):
+            burst = slice(start, min(n, start + 3 * sr))
+            audio[burst] += synthetic_audio(seconds, sr, seed)[burst]
+        return audio.astype(np.float32)
+    raise ValueError(f"Unknown fixture pattern '{pattern}' (choose from: {', '.join(FIXTURE_PATTERNS)})")
+
+
+def wav_bytes(audio, sr=16000):
+    """16-bit mono WAV file contents"""
+    import numpy as np
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sr)
+        f.writeframes((np.clip(audio, -1, 1) * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def best_seconds(fn, repeat=5, min_seconds=0.5):
+    """Fastest run of ``fn()``, out of at least ``repeat`` runs and
+    ``min_seconds`` of running it (so quick ones aren't all noise)"""
+    best = float("inf")
+    runs = 0
+    spent = 0.0
+    while runs < repeat or spent < min_seconds:
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        runs += 1
+        spent += elapsed
+    return best
+
+
+class StubModel:
+    """Stands in for a Whisper backend: answers at a fixed real-time factor,
+    so server overhead can be measured without a model"""
+
+    name = "stub"
+
+    def __init__(self, realtime_factor=100.0):
+        self.realtime_factor = realtime_factor
+
+    def transcribe(self, audio, **options):
+        seconds = len(audio) / 16000
+        time.sleep(seconds / self.realtime_factor)
+        text = " " + synthetic_transcript(max(1, int(seconds * 2)), seed=len(audio))
+        return {
+            "text": text,
+            "segments": [{"id": 0, "start": 0.0, "end": seconds, "text": text,
+                          "avg_logprob": -0.2, "compression_ratio": 1.3}],
+            "language": "hi",
+        }
+
+
+def multipart_body(data, filename, fields):
+    boundary = "benchmark-boundary"
+    parts = [
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        for name, value in fields.items()
+    ]
+    parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+                 f'Content-Type: audio/wav\r\n\r\n'.encode() + data + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def suite_cleanup(results, n_words=10000):
+    from cleanup import app_cleanup, processor_cleanup
+
+    text = messy_transcript(n_words)
+    segments = [segment["text"] for segment in fake_segments(text)]
+    for name, make_pipeline in (("super_clean_transcription", app_cleanup),
+                                ("clean_transcription", processor_cleanup)):
+        results[f"cleanup.{name}.batch"] = (len(text) / best_seconds(lambda: make_pipeline().run(text)),
+                                            "chars/s", "higher")
+
+        def streamed():
+            pipeline = make_pipeline()
+            for segment in segments:
+                pipeline.feed(segment)
+            pipeline.finish()
+        results[f"cleanup.{name}.streamed"] = (len(text) / best_seconds(streamed), "chars/s", "higher")
+
+    text = synthetic_transcript(n_words)
+    for name, _, make_matcher in CORRECTION_CASES:
+        matcher = make_matcher()
+        results[f"corrections.{name}"] = (len(text) / best_seconds(lambda: matcher(text)), "chars/s", "higher")
+
+
+def suite_hallucination(results, sizes=(1000, 10000, 50000)):
+    from audio_processor import is_hallucination
+
+    for n_words in sizes:
+        text = unique_transcript(n_words)
+        segments = fake_segments(text)
+        results[f"hallucination.{n_words}_words"] = (best_seconds(lambda: is_hallucination(text, segments)),
+                                                     "s", "lower")
+
+
+def suite_audio(results, skipped, seconds=120.0):
+    from audio_ingest import decode_audio
+    from vad import trim_silence
+
+    for pattern in FIXTURE_PATTERNS:
+        audio = fixture_audio(pattern, seconds)
+        results[f"vad.{pattern}"] = (seconds / best_seconds(lambda: trim_silence(audio)), "audio s/s", "higher")
+
+    data = wav_bytes(fixture_audio("speech", seconds))
+    try:
+        decode_audio(io.BytesIO(data))
+    except (OSError, RuntimeError) as e:
+        skipped["decode"] = f"ffmpeg not available: {e}"
+        return
+    results["decode.wav"] = (seconds / best_seconds(lambda: decode_audio(io.BytesIO(data))), "audio s/s", "higher")
+
+
+def suite_models(results, skipped, model_names, seconds=30.0):
+    """Real-time factor of every backend that loads, with the fast profile"""
+    from backends import BACKENDS, load_backend
+    from decoding import PROFILES
+
+    audio = fixture_audio("speech", seconds)
+    options = dict(PROFILES["fast"], language="hi", temperature=0.0, condition_on_previous_text=False)
+    for backend_name in BACKENDS:
+        for model_name in model_names:
+            name = f"rtf.{backend_name}.{model_name}"
+            try:
+                backend = load_backend(model_name, backend=backend_name)
+            except Exception as e:
+                skipped[name] = f"{type(e).__name__}: {e}"
+                continue
+            run = functools.partial(backend.transcribe, audio, **options)
+            run()  # warm-up
+            results[name] = (seconds / best_seconds(run, repeat=2, min_seconds=0), "audio s/s", "higher")
+            # Free the model before the next one loads
+            del backend, run
+
+
+def suite_server(results, levels=(1, 4, 16), requests_per_client=8, seconds=5.0):
+    """/transcribe requests per second against a stub model, over real HTTP"""
+    import http.client
+
+    import numpy as np
+
+    from result_cache import ResultCache
+
+    # No job database left behind, and no real model warming up
+    jobs_dir = tempfile.mkdtemp(prefix="benchmark-")
+    config.JOBS_DB = os.path.join(jobs_dir, "jobs.db")
+    config.JOBS_AUDIO_DIR = os.path.join(jobs_dir, "audio")
+    config.WARMUP_MODELS = ()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as server_app
+        from werkzeug.serving import make_server
+
+    stub = StubModel()
+    server_app.get_model = lambda name=None: stub
+    server_app.registry.is_ready = lambda name=None: True
+    # Every request is the same upload: without this all but the first are cache hits
+    server_app.result_cache = ResultCache(max_entries=0, disk_max_mb=0)
+    server = make_server("127.0.0.1", 0, server_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    body, content_type = multipart_body(wav_bytes(fixture_audio("speech", seconds)), "fixture.wav",
+                                        {"model": config.DEFAULT_MODEL, "profile": "fast"})
+
+    def one_request(_):
+        start = time.perf_counter()
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=60)
+        try:
+            connection.request("POST", "/transcribe", body, {"Content-Type": content_type})
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                raise RuntimeError(f"/transcribe answered {response.status}")
+        finally:
+            connection.close()
+        return time.perf_counter() - start
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            one_request(0)  # warm-up
+            for concurrency in levels:
+                n_requests = concurrency * requests_per_client
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                    latencies = list(pool.map(one_request, range(n_requests)))
+                wall = time.perf_counter() - start
+                results[f"server.{concurrency}_clients.requests_per_s"] = (n_requests / wall, "req/s", "higher")
+                results[f"server.{concurrency}_clients.p95"] = (float(np.percentile(latencies, 95)), "s", "lower")
+    finally:
+        server.shutdown()
+
+
+# `import app` has to stay cheap: the server answers /healthz and /readyz
+# while the models load, so nothing heavy may be imported up front
+IMPORT_BUDGET_SECONDS = 1.0
+HEAVY_MODULES = ("torch", "whisper", "faster_whisper", "ctranslate2", "av")
+
+
+def import_app_seconds():
+    """(seconds, heavy modules imported, -X importtime report) for ``import app``
+    in a fresh interpreter"""
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import app\n"
+        "seconds = time.perf_counter() - start\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(repr((seconds, heavy)))\n"
+    )
+    env = dict(os.environ, JOBS_DB=os.path.join(tempfile.mkdtemp(prefix="benchmark-"), "jobs.db"))
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), env=env, check=True)
+    seconds, heavy = eval(process.stdout.strip().splitlines()[-1])
+    return seconds, heavy, process.stderr
+
+
+def slowest_imports(report, count=10):
+    """(cumulative microseconds, module) of the modules app imports directly
+    that took longest, from an -X importtime report"""
+    imports = []
+    for line in report.splitlines():
+        fields = line.split("|")
+        # Nested imports are indented two spaces per level
+        if len(fields) == 3 and fields[1].strip().isdigit() and fields[2].startswith("   ") \
+                and not fields[2].startswith("    "):
+            imports.append((int(fields[1]), fields[2].strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def startup_check():
+    """True if ``import app`` is under budget and imports nothing heavy"""
+    times = []
+    for _ in range(3):
+        seconds, heavy, report = import_app_seconds()
+        times.append(seconds)
+    seconds = min(times)
+
+    print("Slowest imports by app (cumulative):")
+    print("=" * 60)
+    for microseconds, module in slowest_imports(report):
+        print(f"  {module:<40} {microseconds / 1000:>8.1f} ms")
+    print("=" * 60)
+    print(f"import app: {seconds:.2f}s (budget {IMPORT_BUDGET_SECONDS:.2f}s)")
+    ok = True
+    if heavy:
+        print(f"❌ Imported at startup: {', '.join(heavy)}")
+        ok = False
+    if seconds > IMPORT_BUDGET_SECONDS:
+        print("❌ Over budget")
+        ok = False
+    if ok:
+        print("✓ Within budget")
+    return ok
+
+
+def suite_startup(results):
+    results["startup.import_app"] = (min(import_app_seconds()[0] for _ in range(3)), "s", "lower")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(output="benchmark-results.json", models="tiny"):
+    results = {}
+    skipped = {}
+    steps = [
+        ("startup", lambda: suite_startup(results)),
+        ("cleanup", lambda: suite_cleanup(results)),
+        ("hallucination", lambda: suite_hallucination(results)),
+        ("audio", lambda: suite_audio(results, skipped)),
+        ("server", lambda: suite_server(results)),
+        ("models", lambda: suite_models(results, skipped, [m for m in models.split(",") if m])),
+    ]
+    print(f"Benchmark suite -> {output}")
+    print("=" * 60)
+    for label, step in steps:
+        start = time.perf_counter()
+        step()
+        print(f"✓ {label:<14} {time.perf_counter() - start:>6.1f}s")
+    for name, reason in skipped.items():
+        print(f"⚠️  Skipped {name}: {reason}")
+
+    report = {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "results": {
+            name: {"value": value, "unit": unit, "better": better}
+            for name, (value, unit, better) in sorted(results.items())
+        },
+        "skipped": skipped,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print("=" * 60)
+    for name, (value, unit, _) in sorted(results.items()):
+        print(f"  {name:<48} {value:>14,.3f} {unit}")
+    print("=" * 60)
+    return report
+
+
+def compare(old_path, new_path, threshold_percent=10.0):
+    """Print every shared result; True if none got worse by more than the threshold"""
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+
+    print(f"{old.get('commit') or old_path} -> {new.get('commit') or new_path} "
+          f"(regression threshold {threshold_percent:g}%)")
+    print("=" * 60)
+    regressions = []
+    for name, after in sorted(new["results"].items()):
+        before = old["results"].get(name)
+        if before is None or not before["value"]:
+            continue
+        change = (after["value"] - before["value"]) / before["value"] * 100
+        worse = -change if after["better"] == "higher" else change
+        flag = ""
+        if worse > threshold_percent:
+            flag = "  ❌ regression"
+            regressions.append(name)
+        elif worse < -threshold_percent:
+            flag = "  ⚡ faster"
+        print(f"  {name:<48} {before['value']:>12,.3f} -> {after['value']:>12,.3f} {after['unit']:<9} "
+              f"{change:+6.1f}%{flag}")
+    print("=" * 60)
+    if old.get("platform") != new.get("platform") or old.get("cpus") != new.get("cpus"):
+        print("⚠️  Results come from different machines - compare with care")
+    print(f"{len(regressions)} regression(s)" if regressions else "✓ No regressions")
+    return not regressions
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "suite":
+        run_suite(*sys.argv[2:4])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        threshold = float(sys.argv[4]) if len(sys.argv) > 4 else 10.0
+        if not compare(sys.argv[2], sys.argv[3], threshold):
+            sys.exit(1)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "startup":
+        if not startup_check():
+            sys.exit(1)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "slots":
+        slots_benchmark(*sys.argv[2:4], *(int(n) for n in sys.argv[4:5]))
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "loadtest":
+        loadtest(*sys.argv[2:4])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "hallucination":
+        hallucination_benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 50000)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "cleanup":
+        cleanup_benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 10000)
+        return
+
+    n_words = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    text = synthetic_transcript(n_words)
+    for name, legacy, make_matcher in CORRECTION_CASES:
+        print(f"\nCorrections ({name}) on {n_words} words ({len(text)} chars)")
+        print("=" * 60)
+
+        original = chars_per_second(legacy, text)
+        cold = chars_per_second(lambda t: make_matcher()(t), text)
+        warm = chars_per_second(make_matcher(), text)
+
+        print(f"  Original loop:         {original:>14,.0f} chars/s")
+        print(f"  Compiled (cold cache): {cold:>14,.0f} chars/s  ({cold / original:.1f}x)")
+        print(f"  Compiled (warm cache): {warm:>14,.0f} chars/s  ({warm / original:.1f}x)")
+        print("=" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+"""
+Transcript cleanup as a pipeline of stages that can also run incrementally.
+
+super_clean_transcription (app.py) and clean_transcription
+(audio_processor.py) are each one Pipeline: ``run(text)`` cleans a whole
+transcript exactly like the old chain of passes did. A streamed transcript
+goes through ``feed(piece)`` one segment at a time instead, and ``finish()``
+at the end; the pieces returned add up to the same text, byte for byte.
+
+To get there each stage only hands on output that nothing later in the
+text can change, and holds back the rest - usually the last few words:
+
+* RegexStage cuts at a whitespace run that no match straddles and that
+  has ``span + 1`` complete whitespace runs after it, ``span`` being how
+  many whitespace runs one match can reach across. Scanning resumes at
+  the cut with the text before it still visible to lookbehinds and ``\\b``.
+* RepeatStage keeps the last two words it let through.
+* TriggeredStage (the washroom rule) depends on the whole text, so until
+  its trigger shows up it holds everything from the first word it might
+  still have to replace.
+
+English transcripts (see language.py) get their own, shorter pipelines:
+the Devanagari fixes and the built-in correction tables, all Hindi, have
+nothing to do there, but the operators' corrections file and
+custom_dictionary.py still apply (the "en" correction profile).
+
+Every pattern is compiled once, below; a pipeline holds streaming state,
+so one is made per transcript, but they all share the compiled patterns.
+Passes that can't interfere with each other run as one pattern with a
+callback: the whitespace and repeated-character passes, the two "एक
+कहना" fixes, and clean_transcription's nukta, matra and virama passes
+(see _join_signs). Each fused stage gives exactly what its passes gave
+one after another - test_cleanup.py checks that against the original
+chains of passes.
+"""
+
+import re
+
+from corrections import engine
+
+# Input kept from before a cut for lookbehinds and \b
+CONTEXT_CHARS = 8
+
+DEVANAGARI_SIGNS = 'ा|ि|ी|ु|ू|े|ै|ो|ौ|ं|ः|्'
+NUKTA = '़'
+VIRAMA = '्'
+
+_WHITESPACE = re.compile(r'\s+')
+_NEVER = re.compile(r'(?!)')
+
+# Whitespace runs -> one space, and runs of 6+ (app) or 4+ (processor,
+# after collapsing repeated punctuation) of one character -> one. Single
+# spaces are left alone rather than replaced by themselves, so the
+# callback only runs where something changes; (?=\2) turns most
+# characters away before the repeat is tried
+_APP_SPACING = re.compile(r'(\s{2,}|[^\S ])|(.)(?=\2)\2{5,}')
+_PROCESSOR_SPACING = re.compile(r'(\s{2,}|[^\S ])|(.)(?=\2)(?:(?<=[।.!?])\2+|\2{3,})')
+_ENGLISH_SPACING = re.compile(r'(\s{2,}|[^\S ])|(.)(?=\2)(?:(?<=[.!?])\2+|\2{3,})')
+
+# fix "मुझे एक कहना था" vs "मुझे यह कहना था"
+_CONTEXT_FIXES = {'मुझे एक कहना': 'मुझे यह कहना', 'एक कहना था': 'यह कहना था'}
+_CONTEXT = re.compile(r'\b(?:मुझे एक कहना|एक कहना था)\b')
+
+_SPACED_SIGN = re.compile(rf'(\S)\s+(़|{DEVANAGARI_SIGNS})')
+_DANDA = re.compile(r'।(\S)')
+# A character followed by signs, each after whitespace; or whitespace
+# after a virama
+_SIGN_CHAIN = re.compile(rf'\S(?=\s)(?:\s+(?:़|{DEVANAGARI_SIGNS}))+|(?<=्)\s+')
+
+
+def _spacing(match):
+    return " " if match.group(1) else match.group(2)
+
+
+def _context_fix(match):
+    return _CONTEXT_FIXES[match.group()]
+
+
+def _join_signs(match):
+    """A _SIGN_CHAIN as the separate passes left it: nukta joined to the
+    character before, then the other signs, then anything after a virama.
+
+    A pass joins a sign to the character before it unless that character
+    is the sign it has just joined (it was consumed by that match), so in
+    a chain of the same kind of sign every other space stays.
+    """
+    chain = match.group()
+    chars = _WHITESPACE.split(chain)
+    if not chars[0]:
+        return ""
+    pieces = [chars[0]]
+    nukta = sign = False      # the previous space was removed by that pass
+    for left, space, right in zip(chars, _WHITESPACE.findall(chain), chars[1:]):
+        nukta, sign = right == NUKTA and not nukta, right != NUKTA and not sign
+        if not (nukta or sign or left == VIRAMA):
+            pieces.append(space)
+        pieces.append(right)
+    return "".join(pieces)
+
+
+class Stage:
+    """One cleanup step.
+
+    ``apply`` cleans a complete text. ``feed`` takes the next piece of a
+    text and returns whatever output is final so far; ``flush`` returns
+    the rest once the text is complete and resets the stage.
+    """
+
+    def apply(self, text):
+        raise NotImplementedError
+
+    def feed(self, text):
+        raise NotImplementedError
+
+    def flush(self):
+        raise NotImplementedError
+
+
+class RegexStage(Stage):
+    """``pattern.sub(repl, text)``"""
+
+    def __init__(self, pattern, repl, span=0, flags=0):
+        self.pattern = re.compile(pattern, flags)
+        self.repl = repl
+        self.span = span
+        self._context = ""
+        self._buffer = ""
+
+    def apply(self, text):
+        return self.pattern.sub(self.repl, text)
+
+    def _expand(self, match):
+        return self.repl(match) if callable(self.repl) else match.expand(self.repl)
+
+    def _commit(self, text, offset, matches, cut):
+        pieces = []
+        pos = offset
+        for match in matches:
+            if match.end() > cut:
+                break
+            pieces += [text[pos:match.start()], self._expand(match)]
+            pos = match.end()
+        pieces.append(text[pos:cut])
+        self._context = text[:cut][-CONTEXT_CHARS:]
+        self._buffer = text[cut:]
+        return "".join(pieces)
+
+    def feed(self, text):
+        self._buffer += text
+        text = self._context + self._buffer
+        offset = len(self._context)
+        matches = list(self.pattern.finditer(text, offset))
+        runs = [m.start() for m in _WHITESPACE.finditer(text, offset) if m.end() < len(text)]
+        for cut in reversed(runs[:len(runs) - self.span]):
+            if cut <= offset:
+                break
+            if not any(m.start() < cut < m.end() for m in matches):
+                return self._commit(text, offset, matches, cut)
+        return ""
+
+    def flush(self):
+        text = self._context + self._buffer
+        offset = len(self._context)
+        output = self._commit(text, offset, list(self.pattern.finditer(text, offset)), len(text))
+        self._context = self._buffer = ""
+        return output
+
+
+class CorrectionStage(RegexStage):
+    """apply_corrections(text, profile), with the rules current when it's made"""
+
+    def __init__(self, profile):
+        self.matcher = engine.matcher(profile)
+        # The rules only ever rewrite runs of "sticky" words; a run ends at
+        # the first word that isn't one, one whitespace run further on
+        runs = self.matcher.runs or _NEVER
+        super().__init__(runs, self.matcher.replace_run, span=1)
+
+    def apply(self, text):
+        return self.matcher(text)
+
+
+class RepeatStage(Stage):
+    """A word said three or more times in a row is kept twice. Output words
+    are joined by single spaces."""
+
+    def __init__(self):
+        self._partial = ""   # last word of the input so far, maybe incomplete
+        self._last = []      # the last two words let through
+        self._started = False
+
+    def apply(self, text):
+        words = text.split()
+        cleaned = []
+        for word in words:
+            if len(cleaned) >= 2 and word == cleaned[-1] == cleaned[-2]:
+                continue
+            cleaned.append(word)
+        return " ".join(cleaned)
+
+    def _words(self, words):
+        kept = []
+        for word in words:
+            if len(self._last) == 2 and word == self._last[0] == self._last[1]:
+                continue
+            self._last = (self._last + [word])[-2:]
+            kept.append(word)
+        if not kept:
+            return ""
+        text = " ".join(kept)
+        if self._started:
+            text = " " + text
+        self._started = True
+        return text
+
+    def feed(self, text):
+        text = self._partial + text
+        words = text.split()
+        self._partial = ""
+        if text and not text[-1].isspace():
+            self._partial = words.pop()
+        return self._words(words)
+
+    def flush(self):
+        words = [self._partial] if self._partial else []
+        output = self._words(words)
+        self._partial = ""
+        self._last = []
+        self._started = False
+        return output
+
+
+class TriggeredStage(Stage):
+    """Literal replacements made only if ``trigger`` is somewhere in the
+    lowercased text"""
+
+    def __init__(self, trigger, replacements):
+        self.trigger = trigger
+        self.replacements = replacements
+        self._triggered = False
+        self._seen = ""      # end of the input so far, for a trigger split across pieces
+        self._held = ""
+
+    def apply(self, text):
+        if self.trigger in text.lower():
+            for wrong, right in self.replacements:
+                text = text.replace(wrong, right)
+        return text
+
+    def _replace(self, text):
+        if self._triggered:
+            for wrong, right in self.replacements:
+                text = text.replace(wrong, right)
+        return text
+
+    def _partial(self, text):
+        """Length of the longest end of ``text`` that could start a replacement"""
+        longest = 0
+        for wrong, _ in self.replacements:
+            for size in range(min(len(wrong) - 1, len(text)), longest, -1):
+                if wrong.startswith(text[-size:]):
+                    longest = size
+                    break
+        return longest
+
+    def feed(self, text):
+        if not self._triggered:
+            seen = self._seen + text
+            self._triggered = self.trigger in seen.lower()
+            self._seen = seen[-len(self.trigger):]
+
+        text = self._held + text
+        cut = len(text) - self._partial(text)
+        if not self._triggered:
+            # Might still have to be replaced: hold on to it
+            for wrong, _ in self.replacements:
+                found = text.find(wrong)
+                if found >= 0:
+                    cut = min(cut, found)
+        self._held = text[cut:]
+        return self._replace(text[:cut])
+
+    def flush(self):
+        output = self._replace(self._held)
+        self._triggered = False
+        self._seen = self._held = ""
+        return output
+
+
+class StripStage(Stage):
+    """``text.strip()``"""
+
+    def __init__(self):
+        self._started = False
+        self._held = ""      # whitespace that is only output if more text follows
+
+    def apply(self, text):
+        return text.strip()
+
+    def feed(self, text):
+        text = self._held + text
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                return ""
+            self._started = True
+        output = text.rstrip()
+        self._held = text[len(output):]
+        return output
+
+    def flush(self):
+        self._started = False
+        self._held = ""
+        return ""
+
+
+class Pipeline:
+    def __init__(self, stages):
+        self.stages = stages
+
+    def run(self, text):
+        """Clean a whole text"""
+        for stage in self.stages:
+            text = stage.apply(text)
+        return text
+
+    def feed(self, text):
+        """Clean the next piece of a text; returns the output that is final"""
+        for stage in self.stages:
+            text = stage.feed(text)
+        return text
+
+    def finish(self):
+        """The rest of the output, once the whole text has been fed"""
+        text = ""
+        for stage in self.stages:
+            text = stage.feed(text) + stage.flush()
+        return text
+
+
+def app_cleanup(language=None):
+    """The steps of super_clean_transcription"""
+    if language == "en":
+        return Pipeline([
+            RepeatStage(),
+            RegexStage(_APP_SPACING, _spacing),
+            CorrectionStage("en"),
+            StripStage(),
+        ])
+    return Pipeline([
+        # Remove repetitions, normalize spacing and repeated characters
+        RepeatStage(),
+        RegexStage(_APP_SPACING, _spacing),
+
+        # Context-aware replacements
+        RegexStage(_CONTEXT, _context_fix, span=2),
+
+        # Word-boundary corrections (see corrections.py)
+        CorrectionStage("app"),
+
+        # Fix Devanagari diacritics
+        RegexStage(_SPACED_SIGN, r'\1\2', span=1),
+
+        # If "I want to go to" appears, likely washroom not वाशरूम
+        TriggeredStage('want to go to', [('वाशरूम', 'washroom'), ('वॉशरूम', 'washroom')]),
+
+        StripStage(),
+    ])
+
+
+def processor_cleanup(language=None):
+    """The steps of clean_transcription"""
+    if language == "en":
+        return Pipeline([
+            RepeatStage(),
+            CorrectionStage("en"),
+            RegexStage(_ENGLISH_SPACING, _spacing),
+            StripStage(),
+        ])
+    return Pipeline([
+        # Remove repetitions
+        RepeatStage(),
+
+        # Hindi errors, Hinglish words and custom corrections in one pass
+        CorrectionStage("processor"),
+
+        # Normalize spacing and punctuation: multiple spaces, repeated
+        # punctuation, repeated characters (हैैैै -> है), space after danda
+        RegexStage(_PROCESSOR_SPACING, _spacing),
+        RegexStage(_DANDA, r'। \1'),
+
+        # Fix broken Devanagari: separated nukta and vowel marks, broken conjuncts
+        RegexStage(_SIGN_CHAIN, _join_signs, span=1),
+
+        StripStage(),
+    ])
@@ -0,0 +1,132 @@
+"""
+Runtime settings - every value can be overridden with an environment variable
+"""
+
+import os
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Corrections operators can edit while the server is running (JSON object
+# of "wrong spelling": "correct spelling"). Missing file = no extra entries.
+CORRECTIONS_FILE = os.environ.get(
+    "CORRECTIONS_FILE", os.path.join(BASE_DIR, "custom_corrections.json")
+)
+
+# How often (seconds) to stat the corrections sources for changes
+CORRECTIONS_RELOAD_INTERVAL = float(os.environ.get("CORRECTIONS_RELOAD_INTERVAL", "1.0"))
+
+# Whisper models: which one to use by default, which ones callers may pick,
+# where they run, and how many may stay in memory at once
+DEFAULT_MODEL = os.environ.get("WHISPER_MODEL", "large-v3")
+ALLOWED_MODELS = tuple(
+    os.environ.get("WHISPER_ALLOWED_MODELS", "tiny,base,small,medium,large-v3").split(",")
+)
+MODEL_DEVICE = os.environ.get("WHISPER_DEVICE", "cpu")
+MAX_RESIDENT_MODELS = int(os.environ.get("MAX_RESIDENT_MODELS", "2"))
+MODEL_MEMORY_BUDGET_MB = int(os.environ.get("MODEL_MEMORY_BUDGET_MB", "8192"))
+
+# Language routing (see language.py): detect the language once per request
+# and decode English as English instead of as Hindi. LANGID_MODEL is the
+# model that detects it (empty = the request's own model), and English
+# needs at least LANGID_ENGLISH_PROBABILITY to be routed
+LANGUAGE_ROUTING = os.environ.get("LANGUAGE_ROUTING", "1") != "0"
+LANGID_MODEL = os.environ.get("LANGID_MODEL", "")
+LANGID_ENGLISH_PROBABILITY = float(os.environ.get("LANGID_ENGLISH_PROBABILITY", "0.7"))
+
+# Models loaded in the background as soon as the server starts (comma-
+# separated, empty = none; default DEFAULT_MODEL and LANGID_MODEL), and the
+# Retry-After (seconds) sent with a 503 while the model a request needs is
+# still loading
+WARMUP_MODELS = tuple(
+    m for m in os.environ.get("WARMUP_MODELS", ",".join(filter(None, (DEFAULT_MODEL, LANGID_MODEL)))).split(",") if m
+)
+MODEL_LOADING_RETRY_AFTER = int(os.environ.get("MODEL_LOADING_RETRY_AFTER", "10"))
+
+# Converted weights (openai-whisper, see weight_store.py): checkpoints are
+# converted once into shards that every process maps instead of loading,
+# so workers share one copy in RAM. WEIGHT_STORE=0 loads checkpoints as before
+WEIGHT_STORE = os.environ.get("WEIGHT_STORE", "1") != "0"
+WEIGHT_STORE_DIR = os.environ.get("WEIGHT_STORE_DIR", os.path.join(BASE_DIR, "weight_store"))
+WEIGHT_SHARD_MB = int(os.environ.get("WEIGHT_SHARD_MB", "512"))
+
+# Inference backend: "openai-whisper" or "faster-whisper" (CTranslate2)
+WHISPER_BACKEND = os.environ.get("WHISPER_BACKEND", "openai-whisper")
+FASTER_WHISPER_COMPUTE_TYPE = os.environ.get("FASTER_WHISPER_COMPUTE_TYPE", "int8")
+
+# Model servers (see model_server.py): Unix sockets of the processes that
+# run the models, comma-separated; empty = run them in this process. The
+# directory is where `python model_server.py` puts its sockets
+MODEL_SERVERS = tuple(s for s in os.environ.get("MODEL_SERVERS", "").split(",") if s)
+MODEL_SERVER_DIR = os.environ.get("MODEL_SERVER_DIR", os.path.join(tempfile.gettempdir(), "audio-to-text"))
+
+# CPU threads per model (0 = library default): intra-op threads inside one
+# matrix op, inter-op threads / parallel workers across ops
+INTRA_OP_THREADS = int(os.environ.get("INTRA_OP_THREADS", "0"))
+INTER_OP_THREADS = int(os.environ.get("INTER_OP_THREADS", "0"))
+
+# CPU slots for torch inference (see inference_scheduler.py): most forward
+# passes the cores are split between when busy (0 = no scheduling, every
+# pass asks for all cores), and whether passes are pinned to their cores
+INFERENCE_MAX_SLOTS = int(os.environ.get("INFERENCE_MAX_SLOTS", str(max(1, (os.cpu_count() or 1) // 4))))
+INFERENCE_AFFINITY = os.environ.get("INFERENCE_AFFINITY", "0") == "1"
+
+# Encoder batching across concurrent requests (openai-whisper): most 30 s
+# windows per encoder pass (1 = off) and how long to wait for a batch to fill
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", "25"))
+
+# Asynchronous jobs (POST /jobs): worker threads, how many jobs may wait,
+# where job state and queued uploads survive restarts, and the longest
+# GET /jobs/<id>?wait=
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", "32"))
+JOBS_DB = os.environ.get("JOBS_DB", os.path.join(BASE_DIR, "jobs.db"))
+JOBS_AUDIO_DIR = os.environ.get("JOBS_AUDIO_DIR", os.path.join(BASE_DIR, "jobs_audio"))
+JOB_MAX_WAIT = float(os.environ.get("JOB_MAX_WAIT", "60"))
+
+# Long-form mode: chunk length, padding shared by neighbouring chunks,
+# worker processes (each loads its own model), how long they stay up
+# without long-form work (0 = until the server stops) and the audio length
+# from which /transcribe switches to it automatically
+LONGFORM_CHUNK_SECONDS = float(os.environ.get("LONGFORM_CHUNK_SECONDS", "120"))
+LONGFORM_OVERLAP_SECONDS = float(os.environ.get("LONGFORM_OVERLAP_SECONDS", "2"))
+LONGFORM_WORKERS = max(1, int(os.environ.get("LONGFORM_WORKERS", "2")))
+LONGFORM_IDLE_SECONDS = float(os.environ.get("LONGFORM_IDLE_SECONDS", "300"))
+LONGFORM_MIN_SECONDS = float(os.environ.get("LONGFORM_MIN_SECONDS", "600"))
+
+# Silence trimming before the model: "energy" (NumPy frame energy),
+# "silero" (faster-whisper's bundled VAD model) or "off". Pauses shorter
+# than VAD_MIN_SILENCE_SECONDS are kept, speech keeps VAD_PAD_SECONDS of
+# context on each side, and frames count as speech VAD_MARGIN_DB above the
+# noise floor (never below VAD_MIN_DB dBFS)
+VAD_MODE = os.environ.get("VAD_MODE", "energy")
+VAD_MIN_SILENCE_SECONDS = float(os.environ.get("VAD_MIN_SILENCE_SECONDS", "1.0"))
+VAD_MIN_SPEECH_SECONDS = float(os.environ.get("VAD_MIN_SPEECH_SECONDS", "0.25"))
+VAD_PAD_SECONDS = float(os.environ.get("VAD_PAD_SECONDS", "0.3"))
+VAD_MARGIN_DB = float(os.environ.get("VAD_MARGIN_DB", "12"))
+VAD_MIN_DB = float(os.environ.get("VAD_MIN_DB", "-55"))
+
+# Decoding profile when a request doesn't pick one: fast, balanced,
+# accurate or adaptive (see decoding.py)
+DECODING_PROFILE = os.environ.get("DECODING_PROFILE", "accurate")
+
+# Live transcription (/stream): model and decoding profile, how often the
+# window is transcribed again, and how much committed audio it keeps
+STREAM_MODEL = os.environ.get("STREAM_MODEL", "small")
+STREAM_PROFILE = os.environ.get("STREAM_PROFILE", "fast")
+STREAM_STEP_SECONDS = float(os.environ.get("STREAM_STEP_SECONDS", "1.0"))
+STREAM_WINDOW_SECONDS = float(os.environ.get("STREAM_WINDOW_SECONDS", "15"))
+
+# Uploads (see upload.py): largest request body, longest decoded audio
+# (0 = no limit), and how much of an upload is kept in memory before it
+# spills to a temp file
+MAX_UPLOAD_MB = int(os.environ.get("MAX_UPLOAD_MB", "2048"))
+MAX_AUDIO_SECONDS = float(os.environ.get("MAX_AUDIO_SECONDS", "10800"))
+UPLOAD_SPOOL_MB = int(os.environ.get("UPLOAD_SPOOL_MB", "8"))
+
+# Transcription result cache: entries kept in memory, and where / how much
+# to keep on disk (0 MB disables the disk tier)
+RESULT_CACHE_ENTRIES = int(os.environ.get("RESULT_CACHE_ENTRIES", "256"))
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", os.path.join(BASE_DIR, "result_cache"))
+RESULT_CACHE_DISK_MB = int(os.environ.get("RESULT_CACHE_DISK_MB", "1024"))
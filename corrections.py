@@ -0,0 +1,392 @@
+"""
+Correction engine for Whisper transcripts.
+
+Every correction table in the project is loaded here - the built-in tables
+for app.py and audio_processor.py, custom_dictionary.py, and an optional
+JSON file operators can edit while the server is running - and compiled
+into one ordered rule list per profile.
+
+Sources are applied in PRECEDENCE order; when two sources define the same
+misspelling, the higher-precedence one wins. This changes the output in
+one way: custom_dictionary.py used to be applied after a caller's own
+table and now comes before it, so a custom correction sees the word
+before a table rule has rewritten part of it. Custom "जेंटलमेन" ->
+"gentleman" now gives "gentleman" in super_clean_transcription, where
+the app table's "न" -> "ना" used to get there first ("gentlemanा").
+
+A single scan over the
+transcript finds the runs of words that contain anything a rule could
+match; only those short runs go through the ordered rules, and their
+results are memoized, so the rest of the text is copied through untouched.
+
+When the JSON file or custom_dictionary.py changes on disk, the next call
+notices (a stat of each file, at most every CORRECTIONS_RELOAD_INTERVAL)
+and starts a background thread that rebuilds the index and swaps it in
+atomically. Every request, the one that noticed included, keeps using
+the current index until then; nobody waits for the rebuild.
+"""
+
+import importlib
+import json
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+
+import config
+import custom_dictionary
+
+# Common mishearings fixed by super_clean_transcription (order matters:
+# entries are applied one after another, exactly like the original loop)
+APP_CORRECTIONS = {
+    # Common Hindi clarity issues
+    "यह": "यह",  # Ensure proper यह
+    "वह": "वह",  # Ensure proper वह
+    "एक": "एक",  # Ensure proper एक
+    "ये": "यह",  # Convert ये to यह when appropriate
+
+    # Common mishearings
+    "साजना": "सजना",
+    "सजना": "सजना",
+    "साझना": "सजना",
+    "दिवाना": "दीवाना",
+    "दीवाना": "दीवाना",
+    "दिल दीवाना": "दिल दीवाना",
+    "बिन सजना": "बिन सजना",
+    "बिन साजना": "बिन सजना",
+
+    # Common conjunctions
+    "के मने": "के माने",
+    "के माने": "के माने",
+    "न": "ना",  # context-dependent
+
+    # Greetings
+    "सत स्री अकाल": "सत श्री अकाल",
+    "नमसते": "नमस्ते",
+    "धनयवाद": "धन्यवाद",
+    "शुकरिया": "शुक्रिया",
+
+    # Common words
+    "खुबसूरत": "खूबसूरत",
+    "किसा": "किस्सा",
+    "कहानी": "कहानी",
+    "जिनदगी": "ज़िंदगी",
+    "ज़िनदगी": "ज़िंदगी",
+    "रिशता": "रिश्ता",
+
+    # English words in Hindi script
+    "हेलो": "hello",
+    "हलो": "hello",
+    "हैलो": "hello",
+
+    # Gentleman variations (all of them!)
+    "जेंटलमैन": "gentleman",
+    "जेंटलमेन": "gentleman",
+    "जनतलमन": "gentleman",
+    "जैंटलमैन": "gentleman",
+    "जेन्टलमैन": "gentleman",
+    "जेंटिलमैन": "gentleman",
+
+    # Ladies
+    "लेडीज": "ladies",
+    "लेडी": "lady",
+    "लेडिज": "ladies",
+
+    # Greetings
+    "गुड मॉर्निंग": "good morning",
+    "गुड ईवनिंग": "good evening",
+    "गुड नाइट": "good night",
+    "गुड आफ्टरनून": "good afternoon",
+
+    # Thanks
+    "थैंक यू": "thank you",
+    "थैंक्यू": "thank you",
+    "थैंक": "thank",
+    "थैंकयू": "thank you",
+
+    # Other
+    "सॉरी": "sorry",
+    "प्लीज": "please",
+    "एक्सक्यूज मी": "excuse me",
+    "ओके": "okay",
+    "ओ के": "OK",
+
+    # Washroom
+    "वाशरूम": "washroom",
+    "वॉशरूम": "washroom",
+
+    # Tech
+    "माइक": "mic",
+    "माइट": "mic",
+    "टेस्टिंग": "testing",
+    "बटन": "button",
+}
+
+
+# Common Hindi transcription errors (plain substring replacement)
+HINDI_CORRECTIONS = {
+    # Greetings
+    "सत स्री अकाल": "सत श्री अकाल",
+    "सत सरी अकाल": "सत श्री अकाल",
+    "सतसरीअकाल": "सत श्री अकाल",
+    "नमसते": "नमस्ते",
+    "नमसकार": "नमस्कार",
+
+    # Common words
+    "अबिननदन": "अभिनंदन",
+    "अभिननदन": "अभिनंदन",
+    "खुबसूरत": "खूबसूरत",
+    "खुपसूरत": "खूबसूरत",
+    "बिचरना": "बिछड़ना",
+    "बिचड़ना": "बिछड़ना",
+
+    # Pronouns
+    "आप": "आप",
+    "हम": "हम",
+    "तुम": "तुम",
+
+    # Common verbs
+    "करना": "करना",
+    "होना": "होना",
+    "जाना": "जाना",
+}
+
+# Technical English words written in Hindi script (whole words, case-sensitive)
+HINGLISH_CORRECTIONS = {
+    # Tech terms
+    "माइक": "mic",
+    "माइट": "mic",
+    "टेस्टिंग": "testing",
+    "टेस्ट": "test",
+    "एपीआई": "API",
+    "एपीआईकी": "API key",
+    "की": "key",
+    "बटन": "button",
+    "क्लिक": "click",
+
+    # Common English
+    "हलो": "hello",
+    "हैलो": "hello",
+    "थैंक्यू": "thank you",
+    "थैंक यू": "thank you",
+    "सॉरी": "sorry",
+    "ओके": "okay",
+    "प्लीज": "please",
+    "ईवनिंग": "evening",
+    "मॉर्निंग": "morning",
+    "जेंटलमेन": "gentleman",
+    "लेडीज": "ladies",
+
+    # Directions
+    "इधर": "idhar",
+    "उधर": "udhar",
+}
+
+# Highest precedence first. Each source is (whole_word, ignore_case).
+PRECEDENCE = ("file", "custom", "app", "hindi", "hinglish")
+SOURCE_MODES = {
+    "file": (True, True),
+    "custom": (True, True),
+    "app": (True, True),
+    "hindi": (False, False),
+    "hinglish": (True, False),
+}
+
+# Which sources each caller uses, listed in PRECEDENCE order
+PROFILES = {
+    "app": ("file", "custom", "app"),
+    "processor": ("file", "custom", "hindi", "hinglish"),
+    # English transcripts: none of the built-in tables, which are all Hindi
+    "en": ("file", "custom"),
+    "hindi": ("hindi",),
+    "hinglish": ("hinglish",),
+}
+
+
+def table_rules(table, whole_word=True, ignore_case=True):
+    """Turn a {wrong: correct} table into matcher rules"""
+    return [(wrong, correct, whole_word, ignore_case) for wrong, correct in table.items()]
+
+
+def _trie_pattern(words):
+    """Regex matching any of ``words``, factored by common prefix.
+
+    Only used to test whether a word *contains* one of them, so a path
+    stops at the shortest word on it.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        if "" in node:
+            return ""
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items())]
+        return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+    return build(trie)
+
+
+class CorrectionMatcher:
+    """Apply an ordered list of rules in one pass over the text.
+
+    ``rules`` are ``(wrong, correct, whole_word, ignore_case)`` tuples. The
+    output is exactly what applying each rule in turn with ``re.sub`` gives
+    (``\\b`` around ``wrong`` when ``whole_word`` is set).
+    """
+
+    def __init__(self, rules, cache_size=8192):
+        self.rules = []
+        for wrong, correct, whole_word, ignore_case in rules:
+            pattern = re.escape(wrong)
+            if whole_word:
+                pattern = rf'\b{pattern}\b'
+            flags = re.IGNORECASE if ignore_case else 0
+            self.rules.append((re.compile(pattern, flags), correct.replace("\\", "\\\\")))
+
+        # A rule can only touch a word that contains one of its key's words,
+        # and can only span whitespace between two such words. Everything
+        # outside runs of these "sticky" words is left as-is by the rules.
+        pieces = {piece for wrong, *_ in rules for piece in wrong.split()}
+        if pieces:
+            sticky_word = rf'(?<!\S)\S*?{_trie_pattern(pieces)}\S*'
+            self.runs = re.compile(rf'{sticky_word}(?:\s+{sticky_word})*', re.IGNORECASE)
+        else:
+            self.runs = None
+
+        self._apply_rules = lru_cache(maxsize=cache_size)(self._apply_rules_uncached)
+
+    def _apply_rules_uncached(self, run):
+        for pattern, correct in self.rules:
+            run = pattern.sub(correct, run)
+        return run
+
+    def replace_run(self, match):
+        return self._apply_rules(match.group(0))
+
+    def __call__(self, text):
+        if self.runs is None:
+            return text
+        return self.runs.sub(self.replace_run, text)
+
+
+def _load_file(path):
+    """Read the operators' JSON corrections file ({} if it doesn't exist)"""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        table = json.load(f)
+    if not isinstance(table, dict):
+        raise ValueError(f"{path} must contain a JSON object")
+    return {str(wrong).strip(): str(correct) for wrong, correct in table.items() if str(wrong).strip()}
+
+
+def build_index(sources, force_english=()):
+    """Compile one matcher per profile from {source name: table}.
+
+    A misspelling defined by several sources only keeps the entry from the
+    highest-precedence one. Words in ``force_english`` are never rewritten.
+    """
+    protected = {word.lower() for word in force_english}
+    index = {}
+    for profile, names in PROFILES.items():
+        rules = []
+        seen = set()
+        for name in sorted(names, key=PRECEDENCE.index):
+            whole_word, ignore_case = SOURCE_MODES[name]
+            for wrong, correct in sources.get(name, {}).items():
+                if wrong in seen or wrong.lower() in protected:
+                    continue
+                seen.add(wrong)
+                rules.append((wrong, correct, whole_word, ignore_case))
+        index[profile] = CorrectionMatcher(rules)
+    return index
+
+
+class CorrectionEngine:
+    """Holds the compiled index and rebuilds it when its files change"""
+
+    def __init__(self, path=config.CORRECTIONS_FILE,
+                 check_interval=config.CORRECTIONS_RELOAD_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._reload_lock = threading.Lock()
+        self._next_check = 0.0
+        self._stamps = self._current_stamps()
+        self._index = self._build()
+
+    def _watched_files(self):
+        return (self.path, custom_dictionary.__file__)
+
+    def _current_stamps(self):
+        stamps = []
+        for path in self._watched_files():
+            try:
+                stamps.append(os.stat(path).st_mtime_ns)
+            except (OSError, TypeError):
+                stamps.append(None)
+        return tuple(stamps)
+
+    def _build(self):
+        sources = {
+            "file": _load_file(self.path),
+            "custom": dict(custom_dictionary.CUSTOM_CORRECTIONS),
+            "app": APP_CORRECTIONS,
+            "hindi": HINDI_CORRECTIONS,
+            "hinglish": HINGLISH_CORRECTIONS,
+        }
+        return build_index(sources, custom_dictionary.FORCE_ENGLISH)
+
+    def reload_if_changed(self):
+        """Start rebuilding the index in the background if a watched file
+        changed since the last check; True if a rebuild was started.
+
+        The caller keeps the current index, like everyone else, until the
+        rebuild swaps the new one in.
+        """
+        now = time.monotonic()
+        if now < self._next_check or not self._reload_lock.acquire(blocking=False):
+            return False
+        self._next_check = now + self.check_interval
+        stamps = self._current_stamps()
+        if stamps == self._stamps:
+            self._reload_lock.release()
+            return False
+        # The rebuild releases the lock when it's done
+        threading.Thread(target=self._reload, args=(stamps,), name="corrections-reload", daemon=True).start()
+        return True
+
+    def _reload(self, stamps):
+        try:
+            self._stamps = stamps
+            try:
+                if stamps[1] is not None:
+                    importlib.reload(custom_dictionary)
+                index = self._build()
+            except Exception as e:
+                print(f"⚠️  Corrections not reloaded, keeping previous set: {e}")
+                return
+            self._index = index
+            print("🔄 Corrections reloaded")
+        finally:
+            self._reload_lock.release()
+
+    def matcher(self, profile="app"):
+        """The current CorrectionMatcher for ``profile``"""
+        self.reload_if_changed()
+        return self._index[profile]
+
+    def apply(self, text, profile="app"):
+        return self.matcher(profile)(text)
+
+
+engine = CorrectionEngine()
+
+
+def apply_corrections(text, profile="app"):
+    """Correct ``text`` with the rules of ``profile`` (see PROFILES)"""
+    return engine.apply(text, profile)
@@ -1,6 +1,7 @@
 """
 Custom Dictionary - Add your own word corrections here!
-The system will automatically use these corrections.
+The system will automatically use these corrections - edits are picked up
+while the server is running (see corrections.py), no restart needed.
 """
 
 # Add any misspellings you notice here
@@ -0,0 +1,171 @@
+"""
+Decoding profiles: how hard the model searches for each transcript.
+
+``fast`` is greedy, ``balanced`` a 5-wide beam, ``accurate`` the 15-wide,
+patient beam the server always used to run. ``adaptive`` decodes greedily
+and re-decodes with the ``accurate`` beam only the segments that fail the
+same confidence checks as ``is_hallucination`` (average log-probability
+and compression ratio), keeping whichever version scores better. Every
+result carries a ``decoding`` report with the time spent and, for
+adaptive, how many segments greedy decoding got right on its own.
+
+iter_decode() is the streaming form: it yields segments as they are
+decoded instead of returning one result at the end.
+"""
+
+import time
+
+import numpy as np
+
+from audio_ingest import SAMPLE_RATE
+from vad import split_on_silence
+
+# A segment is suspect below this average log-probability...
+LOGPROB_THRESHOLD = -1.0
+# ...or above this compression ratio (repetitive text compresses well)
+COMPRESSION_RATIO_THRESHOLD = 2.4
+
+PROFILES = {
+    "fast": dict(beam_size=1, best_of=1, patience=1.0),
+    "balanced": dict(beam_size=5, best_of=5, patience=1.0),
+    "accurate": dict(beam_size=15, best_of=15, patience=3.0),
+}
+ADAPTIVE = "adaptive"
+PROFILE_NAMES = tuple(PROFILES) + (ADAPTIVE,)
+
+# Context kept around a segment that gets decoded again
+REDECODE_PAD_SECONDS = 0.25
+# Streaming decodes audio in windows of (at most) Whisper's 30 s input
+WINDOW_SECONDS = 30.0
+
+
+def segment_ok(segment):
+    """Whether a segment passes the confidence thresholds"""
+    return (segment.get("avg_logprob", 0.0) >= LOGPROB_THRESHOLD
+            and segment.get("compression_ratio", 1.0) <= COMPRESSION_RATIO_THRESHOLD)
+
+
+def _mean_logprob(segments):
+    return float(np.mean([s.get("avg_logprob", 0.0) for s in segments])) if segments else float("-inf")
+
+
+def _failing_runs(segments):
+    """(first, last) index pairs of consecutive segments that fail"""
+    runs = []
+    for i, segment in enumerate(segments):
+        if segment_ok(segment):
+            continue
+        if runs and runs[-1][1] == i - 1:
+            runs[-1][1] = i
+        else:
+            runs.append([i, i])
+    return runs
+
+
+def shift_segments(segments, offset):
+    """Copies of ``segments`` moved ``offset`` seconds later"""
+    shifted = []
+    for segment in segments:
+        segment = dict(segment, start=segment["start"] + offset, end=segment["end"] + offset)
+        if segment.get("words"):
+            segment["words"] = [
+                dict(word, start=word["start"] + offset, end=word["end"] + offset)
+                for word in segment["words"]
+            ]
+        shifted.append(segment)
+    return shifted
+
+
+def _decode_adaptive(model, audio, options, sr):
+    started = time.perf_counter()
+    result = model.transcribe(audio, **dict(options, **PROFILES["fast"]))
+    greedy_seconds = time.perf_counter() - started
+
+    segments = result["segments"]
+    runs = _failing_runs(segments)
+    pad = int(REDECODE_PAD_SECONDS * sr)
+    replacements = {}
+    for first, last in runs:
+        start = max(0, int(segments[first]["start"] * sr) - pad)
+        end = min(len(audio), int(segments[last]["end"] * sr) + pad)
+        if end <= start:
+            continue
+        retry = model.transcribe(audio[start:end], **dict(options, **PROFILES["accurate"]))["segments"]
+        if retry and _mean_logprob(retry) >= _mean_logprob(segments[first:last + 1]):
+            replacements[first] = (last, shift_segments(retry, start / sr))
+
+    merged = []
+    i = 0
+    while i < len(segments):
+        if i in replacements:
+            last, retry = replacements[i]
+            merged += retry
+            i = last + 1
+        else:
+            merged.append(segments[i])
+            i += 1
+    for i, segment in enumerate(merged):
+        segment["id"] = i
+
+    seconds = time.perf_counter() - started
+    failed = sum(last - first + 1 for first, last in runs)
+    result["segments"] = merged
+    result["text"] = "".join(segment["text"] for segment in merged)
+    result["decoding"] = {
+        "profile": ADAPTIVE,
+        "seconds": round(seconds, 2),
+        "greedy_seconds": round(greedy_seconds, 2),
+        "redecode_seconds": round(seconds - greedy_seconds, 2),
+        "segments": len(segments),
+        "redecoded": failed,
+        "improved": sum(last - first + 1 for first, (last, _) in replacements.items()),
+        "acceptance_rate": round(1 - failed / len(segments), 3) if segments else None,
+    }
+    return result
+
+
+def decode(model, audio, options, profile, sr=SAMPLE_RATE):
+    """``model.transcribe(audio, **options)`` searched as hard as ``profile`` says"""
+    if profile == ADAPTIVE:
+        return _decode_adaptive(model, audio, options, sr)
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown decoding profile '{profile}' (choose from: {', '.join(PROFILE_NAMES)})")
+
+    started = time.perf_counter()
+    result = model.transcribe(audio, **dict(options, **PROFILES[profile]))
+    result["decoding"] = {"profile": profile, "seconds": round(time.perf_counter() - started, 2)}
+    return result
+
+
+def iter_decode(model, audio, options, profile, sr=SAMPLE_RATE):
+    """Like decode(), but yields segments as soon as they're decoded.
+
+    The generator's return value is the detected language.
+    """
+    if profile == ADAPTIVE:
+        # Adaptive re-decoding looks at a whole window at a time
+        language = None
+        for start, end in split_on_silence(audio, sr, WINDOW_SECONDS):
+            result = _decode_adaptive(model, audio[start:end], options, sr)
+            language = language or result.get("language")
+            yield from shift_segments(result["segments"], start / sr)
+        return language
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown decoding profile '{profile}' (choose from: {', '.join(PROFILE_NAMES)})")
+    return (yield from model.iter_segments(audio, **dict(options, **PROFILES[profile])))
+
+
+def merge_reports(reports):
+    """One decoding report for a transcript decoded in several pieces"""
+    reports = [report for report in reports if report]
+    if not reports:
+        return None
+    merged = {"profile": reports[0]["profile"]}
+    for name in ("seconds", "greedy_seconds", "redecode_seconds", "segments", "redecoded", "improved"):
+        if name in reports[0]:
+            merged[name] = round(sum(report[name] for report in reports), 2)
+    if merged.get("segments"):
+        merged["acceptance_rate"] = round(1 - merged["redecoded"] / merged["segments"], 3)
+    elif "segments" in merged:
+        merged["acceptance_rate"] = None
+    return merged
@@ -1,39 +1,35 @@
 """
 FIX CORRUPTED WHISPER MODEL
-Run this once to clear cache and re-download clean model
+Run this when a model fails to load: every shard of the converted weights
+is checked again and only the bad ones are rebuilt (see weight_store.py).
+Usage: python fix_model.py [model ...]
 """
 
-import os
-import shutil
+import sys
 
-# Find Whisper cache location
-cache_dir = os.path.expanduser("~/.cache/whisper")
-if os.name == 'nt':  # Windows
-    cache_dir = os.path.join(os.environ['USERPROFILE'], '.cache', 'whisper')
+import config
+from weight_store import weight_store
 
-print("="*70)
-print("  FIXING WHISPER MODEL CACHE")
-print("="*70)
-print(f"\nCache location: {cache_dir}\n")
-
-if os.path.exists(cache_dir):
-    print("🗑️  Deleting corrupted cache...")
-    shutil.rmtree(cache_dir)
-    print("✅ Cache deleted!\n")
-else:
-    print("ℹ️  No cache found (already clean)\n")
+models = sys.argv[1:] or [config.DEFAULT_MODEL]
 
 print("="*70)
-print("  NOW DOWNLOADING FRESH MODEL...")
+print("  CHECKING WHISPER MODEL WEIGHTS")
 print("="*70)
-print("\nThis will take 2-5 minutes...\n")
+print(f"\nWeight store: {config.WEIGHT_STORE_DIR}\n")
+
+for name in models:
+    print(f"🔍 Verifying {name}...")
+    # Whisper checks the downloaded checkpoint's own sha256 and downloads
+    # it again only if that's broken - no need to clear its cache
+    rebuilt = weight_store.repair(name)
+    if rebuilt is None:
+        print(f"✅ {name} converted from scratch\n")
+    elif rebuilt:
+        print(f"✅ {name}: {rebuilt} shard(s) rebuilt\n")
+    else:
+        print(f"✅ {name}: all shards OK\n")
 
-import whisper
-
-# Download fresh model
-model = whisper.load_model("large-v3")
-
-print("\n" + "="*70)
+print("="*70)
 print("  ✅ MODEL FIXED AND READY!")
 print("="*70)
 print("\nNow run: python app.py\n")
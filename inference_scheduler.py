@@ -0,0 +1,151 @@
+"""
+CPU slots for torch inference.
+
+Every forward pass runs inside a slot: a share of the cores, with
+torch.set_num_threads() set to its size in the thread that runs the pass
+and, with INFERENCE_AFFINITY, that thread pinned to those cores. Without
+it every pass that runs at the same time as another (two resident models,
+an encoder batch next to another request's decoding, ...) asks for all
+the cores, and they spend their time fighting over them.
+
+The slots adapt to the load: the pass at the head of the queue gets
+cores / min(demand, INFERENCE_MAX_SLOTS) cores, demand being the passes
+running plus waiting. A lone request has the whole machine; under load it
+is split into INFERENCE_MAX_SLOTS narrow slots. Passes start in arrival
+order, each once enough cores are free. INFERENCE_MAX_SLOTS=0 turns the
+scheduler off.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import config
+
+
+def available_cores():
+    """Cores this process may run on (the first INTRA_OP_THREADS, if set)"""
+    if hasattr(os, "sched_getaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+    if config.INTRA_OP_THREADS:
+        cores = cores[:config.INTRA_OP_THREADS]
+    return cores
+
+
+class InferenceScheduler:
+    def __init__(self, max_slots=config.INFERENCE_MAX_SLOTS, affinity=config.INFERENCE_AFFINITY, cores=None):
+        self.max_slots = max_slots
+        self.affinity = affinity and hasattr(os, "sched_setaffinity")
+        self._cores = cores           # worked out on first use (after any pinning of the process)
+        self._free = None
+        self._cond = threading.Condition()
+        self._waiting = deque()
+        self._running = 0
+        self._state = threading.local()
+        self._counts = {"passes": 0, "wait_seconds": 0.0, "cores_used": 0}
+
+    def _width(self):
+        demand = self._running + len(self._waiting)
+        return max(1, len(self._cores) // max(1, min(demand, self.max_slots)))
+
+    def _acquire(self):
+        ticket = object()
+        start = time.perf_counter()
+        with self._cond:
+            if self._cores is None:
+                self._cores = available_cores()
+            if self._free is None:
+                self._free = list(self._cores)
+            self._waiting.append(ticket)
+            while True:
+                if self._waiting[0] is ticket:
+                    width = self._width()
+                    if len(self._free) >= width:
+                        break
+                self._cond.wait()
+            self._waiting.popleft()
+            cores = self._free[:width]
+            del self._free[:width]
+            self._running += 1
+            self._counts["passes"] += 1
+            self._counts["wait_seconds"] += time.perf_counter() - start
+            self._counts["cores_used"] += width
+            # The next in line may fit in what's left
+            self._cond.notify_all()
+        return cores
+
+    def _release(self, cores):
+        with self._cond:
+            self._free = sorted(self._free + cores)
+            self._running -= 1
+            self._cond.notify_all()
+
+    def _enter(self, cores):
+        """Give the calling thread ``cores``; returns what to restore"""
+        previous = {}
+        torch = sys.modules.get("torch")
+        if torch is not None:
+            previous["threads"] = torch.get_num_threads()
+            torch.set_num_threads(len(cores))
+        if self.affinity:
+            previous["affinity"] = os.sched_getaffinity(0)
+            os.sched_setaffinity(0, cores)
+        self._state.cores = cores
+        return previous
+
+    def _leave(self, previous):
+        self._state.cores = None
+        if "threads" in previous:
+            sys.modules["torch"].set_num_threads(previous["threads"])
+        if "affinity" in previous:
+            os.sched_setaffinity(0, previous["affinity"])
+
+    def run(self, fn, *args, **kwargs):
+        """Call ``fn`` in a slot (in the one the thread already has, if any)"""
+        if self.max_slots <= 0 or getattr(self._state, "cores", None) is not None:
+            return fn(*args, **kwargs)
+        previous = self._enter(self._acquire())
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            # Not necessarily the cores it started with (see suspended())
+            cores = self._state.cores
+            self._leave(previous)
+            self._release(cores)
+
+    @contextmanager
+    def suspended(self):
+        """Hand the thread's slot back while it waits (for an encoder batch,
+        say), and get a new one afterwards"""
+        cores = getattr(self._state, "cores", None)
+        if cores is None:
+            yield
+            return
+        self._leave({})
+        self._release(cores)
+        try:
+            yield
+        finally:
+            self._enter(self._acquire())
+
+    def stats(self):
+        with self._cond:
+            counts = dict(self._counts)
+            passes = counts.pop("passes")
+            return {
+                "cores": len(self._cores) if self._cores else None,
+                "max_slots": self.max_slots,
+                "running": self._running,
+                "waiting": len(self._waiting),
+                "passes": passes,
+                "avg_cores": round(counts["cores_used"] / passes, 1) if passes else None,
+                "avg_wait_ms": round(counts["wait_seconds"] / passes * 1000, 1) if passes else None,
+            }
+
+
+scheduler = InferenceScheduler()
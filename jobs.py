@@ -0,0 +1,205 @@
+"""
+Asynchronous transcription jobs.
+
+Job state is kept in a local SQLite file and each job's upload in a file
+of its own under JOBS_AUDIO_DIR (SQLite can't hold a BLOB as big as the
+largest upload), deleted once the job has finished. Jobs are processed by
+a fixed pool of worker threads, so long recordings don't hold an HTTP
+request open and a
+burst of uploads can't run more transcriptions at once than there are
+workers. When JOB_QUEUE_SIZE jobs are already waiting, new submissions are
+refused with a Retry-After estimate. Jobs that were queued or running when
+the server stopped are queued again on the next start.
+"""
+
+import io
+import json
+import math
+import os
+import queue
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    filename TEXT,
+    options TEXT NOT NULL,
+    audio BLOB,
+    audio_path TEXT,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+)
+"""
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Job queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class JobQueue:
+    def __init__(self, handler, db_path=config.JOBS_DB, workers=config.JOB_WORKERS,
+                 max_queued=config.JOB_QUEUE_SIZE, audio_dir=config.JOBS_AUDIO_DIR):
+        self.handler = handler
+        self.audio_dir = audio_dir
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(SCHEMA)
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(jobs)")]
+        if "audio_path" not in columns:
+            # Databases from before uploads were kept in files
+            self._db.execute("ALTER TABLE jobs ADD COLUMN audio_path TEXT")
+        self._db_lock = threading.Lock()
+        self._submit_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._finished = {}           # job id -> Event, for ?wait= callers
+        self._avg_seconds = 30.0      # running average job duration
+        self._threads = []
+
+    def _execute(self, sql, params=()):
+        with self._db_lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def start(self):
+        """Re-queue unfinished jobs from a previous run and start the workers.
+
+        Safe to call more than once; only the first call does anything.
+        """
+        with self._submit_lock:
+            if self._threads:
+                return
+            self._start()
+
+    def _start(self):
+        self._execute("UPDATE jobs SET status = 'queued', started = NULL WHERE status = 'running'")
+        for (job_id,) in self._execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created"):
+            self._finished[job_id] = threading.Event()
+            self._queue.put(job_id)
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def depth(self):
+        """Jobs waiting for a worker"""
+        return self._queue.qsize()
+
+    def retry_after(self):
+        waves = (self.depth() + 1) / self.workers
+        return max(1, math.ceil(waves * self._avg_seconds))
+
+    def submit(self, audio, filename, options):
+        """Queue a job for the upload in file object ``audio``, which is
+        copied to the job's own file"""
+        with self._submit_lock:
+            if self.depth() >= self.max_queued:
+                raise QueueFull(self.retry_after())
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.audio_dir, exist_ok=True)
+        audio_path = os.path.join(self.audio_dir, job_id)
+        with open(audio_path, "wb") as out:
+            shutil.copyfileobj(audio, out)
+        with self._submit_lock:
+            # Others may have filled the queue while this one was copied
+            if self.depth() >= self.max_queued:
+                os.remove(audio_path)
+                raise QueueFull(self.retry_after())
+            self._execute(
+                "INSERT INTO jobs (id, status, filename, options, audio_path, created) "
+                "VALUES (?, 'queued', ?, ?, ?, ?)",
+                (job_id, filename, json.dumps(options), audio_path, time.time()),
+            )
+            self._finished[job_id] = threading.Event()
+            self._queue.put(job_id)
+        return job_id
+
+    def get(self, job_id, wait=0.0):
+        """Public view of a job (None if unknown), optionally waiting for it"""
+        done = self._finished.get(job_id)
+        if wait > 0 and done is not None:
+            done.wait(wait)
+
+        rows = self._execute(
+            "SELECT id, status, filename, options, result, error, created, started, finished "
+            "FROM jobs WHERE id = ?",
+            (job_id,),
+        )
+        if not rows:
+            return None
+        job_id, status, filename, options, result, error, created, started, finished = rows[0]
+        job = {
+            "id": job_id,
+            "status": status,
+            "filename": filename,
+            "options": json.loads(options),
+            "created": created,
+            "started": started,
+            "finished": finished,
+        }
+        if status == "queued":
+            job["queue_depth"] = self.depth()
+        if result is not None:
+            job["result"] = json.loads(result)
+        if error is not None:
+            job["error"] = error
+        return job
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job_id):
+        rows = self._execute(
+            "SELECT audio, audio_path, options FROM jobs WHERE id = ? AND status = 'queued'", (job_id,)
+        )
+        if not rows:
+            return
+        audio_bytes, audio_path, options = rows[0]
+        started = time.time()
+        self._execute("UPDATE jobs SET status = 'running', started = ? WHERE id = ?", (started, job_id))
+        print(f"⏳ Job {job_id} started")
+
+        try:
+            # Jobs queued before uploads were kept in files have a BLOB
+            with (open(audio_path, "rb") if audio_path else io.BytesIO(audio_bytes)) as audio:
+                result = self.handler(audio, json.loads(options))
+        except Exception as e:
+            print(f"❌ Job {job_id} failed: {e}")
+            self._execute(
+                "UPDATE jobs SET status = 'failed', error = ?, audio = NULL, finished = ? WHERE id = ?",
+                (f"Transcription failed: {e}", time.time(), job_id),
+            )
+        else:
+            finished = time.time()
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (finished - started)
+            self._execute(
+                "UPDATE jobs SET status = 'done', result = ?, audio = NULL, finished = ? WHERE id = ?",
+                (json.dumps(result, ensure_ascii=False), finished, job_id),
+            )
+            print(f"✅ Job {job_id} done")
+        finally:
+            if audio_path:
+                try:
+                    os.remove(audio_path)
+                except OSError:
+                    pass
+            done = self._finished.pop(job_id, None)
+            if done is not None:
+                done.set()
@@ -0,0 +1,84 @@
+"""
+Language routing: what a request is decoded as, and which cleanup it gets.
+
+The app decodes everything as Hindi (``language="hi"`` plus a Hindi
+prompt), which turns English speech into transliterated Hindi and then
+runs it through the Devanagari cleanup for nothing. With LANGUAGE_ROUTING,
+route() runs Whisper's language detection once per request on the first
+30 s of speech - with LANGID_MODEL if set (a small model does this well),
+else the request's own model - before anything is decoded:
+
+* English, at least LANGID_ENGLISH_PROBABILITY sure, is decoded as English
+  without the Hindi prompt, and cleaned without the Devanagari passes and
+  Hindi correction tables (see cleanup.py).
+* Anything else is decoded as the caller's fallback language, as before.
+
+The decision goes into the result as ``routing``, so every chunk or window
+of the request, and a later cache hit, use it instead of detecting again.
+"""
+
+import time
+
+import config
+from audio_ingest import SAMPLE_RATE
+from metrics import span
+
+ENGLISH = "en"
+HINDI = "hi"
+# Whisper detects the language from one 30 s window
+DETECT_SECONDS = 30.0
+
+
+def routing_key():
+    """The settings that change routing decisions (for result cache keys)"""
+    if not config.LANGUAGE_ROUTING:
+        return None
+    return {"model": config.LANGID_MODEL or None, "english": config.LANGID_ENGLISH_PROBABILITY}
+
+
+def route(audio, model, fallback=HINDI, sr=SAMPLE_RATE):
+    """Detect the language of speech ``audio`` once (``model``: the request's
+    model, a backend or its name).
+
+    Returns the routing decision: ``language`` is what to decode as -
+    English if that's what was detected, otherwise ``fallback`` (None =
+    whatever was detected).
+    """
+    routing = {"language": fallback}
+    if not config.LANGUAGE_ROUTING or not len(audio):
+        return routing
+
+    from model_registry import get_model
+
+    if config.LANGID_MODEL:
+        model = config.LANGID_MODEL
+    start = time.perf_counter()
+    try:
+        if isinstance(model, str):
+            model = get_model(model)
+        with span("langid"):
+            detected, probability = model.detect_language(audio[:int(DETECT_SECONDS * sr)])
+    except Exception as e:
+        print(f"⚠️  Language detection failed ({e}) - decoding as {fallback or 'detected'}")
+        return routing
+
+    if detected == ENGLISH and probability >= config.LANGID_ENGLISH_PROBABILITY:
+        language = ENGLISH
+    else:
+        language = fallback or detected
+    print(f"🌐 Detected {detected} ({probability:.0%}) with {model.model_name} - decoding as {language}")
+    return {
+        "language": language,
+        "detected": detected,
+        "probability": round(float(probability), 3),
+        "model": model.model_name,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def routed_options(options, routing):
+    """Decoding options for a routing decision"""
+    if routing["language"] == ENGLISH:
+        # The Hindi prompt would pull English speech back towards Hindi
+        return dict(options, language=ENGLISH, initial_prompt=None)
+    return dict(options, language=routing["language"])
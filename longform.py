@@ -0,0 +1,215 @@
+"""
+Long-form transcription: split, transcribe chunks in parallel, stitch.
+
+Decoded audio is cut into chunks of about LONGFORM_CHUNK_SECONDS, each cut
+placed at the quietest moment near the chunk end so words are rarely split.
+Chunks are padded with LONGFORM_OVERLAP_SECONDS of audio on both sides and
+transcribed concurrently by a pool of worker processes, each holding its
+own copy of the model and its own slice of the cores. Those copies are outside the model registry's
+memory budget, so there is only ever one pool: a request for another
+model replaces it, and it is shut down after LONGFORM_IDLE_SECONDS
+without long-form work. Word timestamps put every word back on the original
+timeline; a word belongs to the chunk whose unpadded span contains its
+midpoint, which drops the duplicates the overlap produces.
+"""
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import config
+from audio_ingest import SAMPLE_RATE
+from decoding import decode, merge_reports
+from inference_scheduler import available_cores
+from model_server import split_cores
+from vad import split_on_silence
+
+# (model name, ProcessPoolExecutor), requests using each pool (a replaced
+# one is shut down when its last request is done), and the timer that shuts
+# the current one down once it's idle
+_pool = None
+_pool_users = {}
+_idle_timer = None
+_pool_lock = threading.Lock()
+
+# Set in each worker process by _init_worker
+_worker_model_name = None
+
+
+def _init_worker(model_name, core_slices):
+    global _worker_model_name
+    _worker_model_name = model_name
+    # Each worker takes its own slice of the cores instead of every one
+    # using (or, with INFERENCE_AFFINITY, pinning itself to) the same ones
+    try:
+        cores = core_slices.get(timeout=10)
+    except queue.Empty:
+        cores = None  # more workers than cores
+    if cores:
+        try:
+            os.sched_setaffinity(0, cores)
+        except (AttributeError, OSError) as e:
+            print(f"💡 Tip: core pinning needs Linux ({e})")
+    config.INTRA_OP_THREADS = len(cores) if cores else 1
+    from model_registry import get_model
+    get_model(model_name)
+
+
+def _transcribe_chunk(audio, options, profile):
+    from model_registry import get_model
+
+    start = time.perf_counter()
+    result = decode(get_model(_worker_model_name), audio, options, profile)
+    return result, time.perf_counter() - start
+
+
+def _new_pool(model_name):
+    workers = config.LONGFORM_WORKERS
+    context = multiprocessing.get_context("spawn")
+    core_slices = context.Queue()
+    for cores in split_cores(available_cores(), workers):
+        core_slices.put(cores)
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(model_name, core_slices),
+    )
+
+
+def _acquire_pool(model_name):
+    """The worker pool for ``model_name``; give it back with _release_pool()"""
+    global _pool, _idle_timer
+    with _pool_lock:
+        if _idle_timer is not None:
+            _idle_timer.cancel()
+            _idle_timer = None
+        if _pool is not None and _pool[0] != model_name:
+            print(f"♻️  Long-form workers switch from {_pool[0]} to {model_name}")
+            if not _pool_users.get(_pool[1]):
+                _pool[1].shutdown(wait=False)
+            _pool = None
+        if _pool is None:
+            _pool = (model_name, _new_pool(model_name))
+        pool = _pool[1]
+        _pool_users[pool] = _pool_users.get(pool, 0) + 1
+        return pool
+
+
+def _release_pool(pool, broken=False):
+    global _pool, _idle_timer
+    with _pool_lock:
+        _pool_users[pool] -= 1
+        idle = not _pool_users[pool]
+        if idle:
+            del _pool_users[pool]
+        current = _pool is not None and _pool[1] is pool
+        if broken and current:
+            # A worker died (e.g. out of memory); start a fresh pool next time
+            _pool = None
+            current = False
+        if not current:
+            if idle or broken:
+                pool.shutdown(wait=False)
+        elif idle and config.LONGFORM_IDLE_SECONDS:
+            _idle_timer = threading.Timer(config.LONGFORM_IDLE_SECONDS, _shut_down_idle, args=(pool,))
+            _idle_timer.daemon = True
+            _idle_timer.start()
+
+
+def _shut_down_idle(pool):
+    global _pool, _idle_timer
+    with _pool_lock:
+        if _pool is None or _pool[1] is not pool or pool in _pool_users:
+            return
+        print(f"💤 Long-form workers for {_pool[0]} shut down (idle)")
+        _pool = None
+        _idle_timer = None
+        pool.shutdown(wait=False)
+
+
+def _core_segments(segments, offset, core_start, core_end):
+    """Shift a chunk's segments to the original timeline and keep only what
+    falls inside the chunk's own (unpadded) span"""
+    kept = []
+    for segment in segments:
+        segment = dict(segment)
+        segment["start"] += offset
+        segment["end"] += offset
+        words = segment.get("words") or []
+        if not words:
+            middle = (segment["start"] + segment["end"]) / 2
+            if core_start <= middle < core_end:
+                kept.append(segment)
+            continue
+
+        inside = []
+        for word in words:
+            word = dict(word, start=word["start"] + offset, end=word["end"] + offset)
+            if core_start <= (word["start"] + word["end"]) / 2 < core_end:
+                inside.append(word)
+        if inside:
+            segment["words"] = inside
+            segment["text"] = "".join(word["word"] for word in inside)
+            segment["start"] = inside[0]["start"]
+            segment["end"] = inside[-1]["end"]
+            kept.append(segment)
+    return kept
+
+
+def transcribe_long(audio, model_name, options, profile, sr=SAMPLE_RATE):
+    """Transcribe ``audio`` chunk-parallel; same result shape as decode()"""
+    regions = split_on_silence(audio, sr)
+    overlap = int(config.LONGFORM_OVERLAP_SECONDS * sr)
+    options = dict(options, word_timestamps=True)
+    pool = _acquire_pool(model_name)
+
+    started = time.perf_counter()
+    segments = []
+    reports = []
+    languages = Counter()
+    serial_seconds = 0.0
+    broken = False
+    try:
+        jobs = []
+        for start, end in regions:
+            padded_start = max(0, start - overlap)
+            padded_end = min(len(audio), end + overlap)
+            future = pool.submit(_transcribe_chunk, audio[padded_start:padded_end], options, profile)
+            jobs.append((start, end, padded_start, future))
+
+        for start, end, padded_start, future in jobs:
+            result, elapsed = future.result()
+            serial_seconds += elapsed
+            reports.append(result.get("decoding"))
+            languages[result.get("language")] += end - start
+            segments += _core_segments(result["segments"], padded_start / sr, start / sr, end / sr)
+    except BrokenProcessPool:
+        broken = True
+        raise
+    finally:
+        _release_pool(pool, broken)
+    wall_seconds = time.perf_counter() - started
+
+    for i, segment in enumerate(segments):
+        segment["id"] = i
+    print(f"⚡ Long-form: {len(regions)} chunks, {serial_seconds:.1f}s of work "
+          f"in {wall_seconds:.1f}s ({serial_seconds / wall_seconds:.1f}x)")
+    return {
+        "text": "".join(segment["text"] for segment in segments),
+        "segments": segments,
+        "language": languages.most_common(1)[0][0] if languages else None,
+        "decoding": merge_reports(reports),
+        "longform": {
+            "chunks": len(regions),
+            "workers": config.LONGFORM_WORKERS,
+            "wall_seconds": round(wall_seconds, 2),
+            "serial_seconds": round(serial_seconds, 2),
+            "speedup": round(serial_seconds / wall_seconds, 2) if wall_seconds else None,
+        },
+    }
@@ -0,0 +1,196 @@
+"""
+Prometheus metrics for the transcription path, served at /metrics.
+
+Each stage of a request is timed with ``with span("decode"):`` into the
+``transcription_stage_seconds`` histogram:
+
+    parse     reading the multipart upload
+    decode    ffmpeg, upload -> PCM
+    vad       finding the speech
+    langid    detecting the language (see language.py)
+    transcribe  the model, start to finish
+    encoder / decoder  the two halves of it (openai-whisper only; the
+              encoder part includes waiting for the cross-request batch)
+    cleanup   super_clean_transcription
+    god_mode  god mode corrections
+
+Recording is a perf_counter() call and a few additions under a lock; the
+text format is only built when /metrics is scraped, and gauges (queue
+depth, model memory) are read by callbacks at scrape time, so nothing is
+spent on them in between.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds per stage: from a cache-warm cleanup to a long upload
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# Audio seconds transcribed per wall second
+REALTIME_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 50, 100)
+
+_metrics = []
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels):
+        return tuple(labels[name] for name in self.labels)
+
+    def samples(self):
+        """(name suffix, label values, extra label, value) tuples"""
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, values, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labels, values, extra)} {_number(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, description, labels=()):
+        super().__init__(name, description, labels)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [("", key, "", value) for key, value in sorted(self._values.items())]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, description, buckets, labels=()):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets)
+        self._series = {}    # label values -> [bucket counts..., count, sum]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        samples = []
+        for key, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                samples.append(("_bucket", key, f'le="{_number(float(bound))}"', cumulative))
+            samples.append(("_bucket", key, 'le="+Inf"', values[-2]))
+            samples.append(("_count", key, "", values[-2]))
+            samples.append(("_sum", key, "", values[-1]))
+        return samples
+
+
+class Gauge(Metric):
+    """Read at scrape time: ``read()`` returns a number, or a dict of
+    {label value(s): number} for a labelled gauge"""
+
+    kind = "gauge"
+
+    def __init__(self, name, description, read, labels=()):
+        super().__init__(name, description, labels)
+        self.read = read
+
+    def samples(self):
+        value = self.read()
+        if not isinstance(value, dict):
+            return [("", (), "", value)]
+        return [
+            ("", key if isinstance(key, tuple) else (key,), "", number)
+            for key, number in sorted(value.items())
+        ]
+
+
+requests_total = Counter("http_requests_total", "HTTP requests by route and status", ("route", "status"))
+request_seconds = Histogram("http_request_seconds", "Time to the response headers", STAGE_BUCKETS, ("route",))
+stage_seconds = Histogram("transcription_stage_seconds", "Time spent per transcription stage",
+                          STAGE_BUCKETS, ("stage",))
+audio_seconds_total = Counter("transcription_audio_seconds_total", "Seconds of audio transcribed")
+wall_seconds_total = Counter("transcription_wall_seconds_total", "Wall seconds spent transcribing it")
+realtime_factor = Histogram("transcription_realtime_factor", "Audio seconds per wall second, per request",
+                            REALTIME_BUCKETS)
+
+
+@contextmanager
+def span(stage):
+    """Time the block as ``stage``"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage=stage)
+
+
+def observe_stage(stage, seconds):
+    """Record ``seconds`` spent on ``stage`` outside a span() block"""
+    stage_seconds.observe(seconds, stage=stage)
+
+
+def observe_request(route, status, seconds):
+    requests_total.inc(route=route, status=status)
+    request_seconds.observe(seconds, route=route)
+
+
+def observe_transcription(audio_seconds, wall_seconds):
+    """One request's audio length and the time it took (decode to text)"""
+    audio_seconds_total.inc(audio_seconds)
+    wall_seconds_total.inc(wall_seconds)
+    if wall_seconds > 0:
+        realtime_factor.observe(audio_seconds / wall_seconds)
+
+
+def render_metrics():
+    """All metrics in the Prometheus text format"""
+    sections = []
+    for metric in _metrics:
+        try:
+            sections.append(metric.render())
+        except Exception as e:
+            # A gauge whose source isn't available shouldn't break the scrape
+            print(f"⚠️  Metric {metric.name} unavailable: {e}")
+    return "\n".join(sections) + "\n"
@@ -0,0 +1,209 @@
+"""
+Shared Whisper model registry.
+
+Models are loaded the first time somebody asks for them, not at import;
+warm_up() loads WARMUP_MODELS on a background thread when the server
+starts, so the page and health checks answer while they load.
+Up to MAX_RESIDENT_MODELS stay in memory; when that count or the
+MODEL_MEMORY_BUDGET_MB budget would be exceeded, the least recently used
+model is dropped. DEFAULT_MODEL and WARMUP_MODELS are pinned: they are
+never dropped, and count against both limits even before they have
+loaded, so a model a request asks for is refused (ModelUnavailable) if
+it can't fit next to them. Threads asking for a model that is still
+loading wait for that one load instead of starting their own.
+
+Entries are backends (see backends.py) loaded with WHISPER_BACKEND; they
+all have the same ``transcribe(audio, **options)`` as a whisper model.
+"""
+
+import threading
+from collections import OrderedDict
+
+import config
+from backends import estimate_memory_mb, load_backend
+
+
+class ModelUnavailable(RuntimeError):
+    """The model doesn't fit next to the pinned models"""
+
+
+def pinned_models():
+    """Models that are never unloaded: the default and the warm-up models"""
+    return {config.DEFAULT_MODEL, *config.WARMUP_MODELS}
+
+
+class ModelRegistry:
+    def __init__(self, max_models=config.MAX_RESIDENT_MODELS,
+                 memory_budget_mb=config.MODEL_MEMORY_BUDGET_MB,
+                 device=config.MODEL_DEVICE):
+        self.max_models = max(1, max_models)
+        self.memory_budget_mb = memory_budget_mb
+        self.device = device
+        self._lock = threading.Lock()
+        self._models = OrderedDict()  # name -> model, least recently used first
+        self._sizes = {}
+        self._loading = {}            # name -> Event set when the load ends
+        self._errors = {}
+        self._warm_up_started = False
+
+    def _over_budget(self, extra_mb=0.0, extra_models=0):
+        count = len(self._models) + extra_models
+        used = sum(self._sizes.values()) + extra_mb
+        if count > self.max_models:
+            return True
+        return bool(self.memory_budget_mb) and used > self.memory_budget_mb
+
+    def _fits(self, name, size_mb):
+        """Whether ``name`` fits next to the pinned models, loaded or not"""
+        pinned = pinned_models()
+        if name in pinned:
+            return True
+        used = size_mb + sum(self._sizes.get(p, estimate_memory_mb(p)) for p in pinned)
+        if len(pinned) + 1 > self.max_models:
+            return False
+        return not self.memory_budget_mb or used <= self.memory_budget_mb
+
+    def _evict(self, extra_mb=0.0, extra_models=0, keep=None):
+        """Drop least recently used models until the new one fits"""
+        pinned = pinned_models()
+        for name in list(self._models):
+            if not self._over_budget(extra_mb, extra_models):
+                break
+            if name == keep or name in pinned:
+                continue
+            del self._models[name]
+            self._sizes.pop(name, None)
+            print(f"♻️  Unloaded Whisper {name} model (least recently used)")
+
+    def _load(self, name):
+        print(f"\n📥 Loading Whisper {name} model ({config.WHISPER_BACKEND})...")
+        print("  ⏳ First time: downloads the checkpoint (one-time only)")
+        try:
+            model = load_backend(name, device=self.device)
+        except Exception as e:
+            print(f"\n❌ ERROR loading model: {e}\n")
+            print("💡 Solution:")
+            print("   1. Check internet connection")
+            print(f"   2. Run: pip install {config.WHISPER_BACKEND}")
+            print("   3. Wait for download to complete\n")
+            raise
+        print(f"✅ Whisper {name} model loaded")
+        return model
+
+    def get(self, name=None):
+        """Return a loaded model, loading it (once) if needed"""
+        name = name or config.DEFAULT_MODEL
+        if name not in config.ALLOWED_MODELS:
+            raise ValueError(
+                f"Unknown model '{name}' (choose from: {', '.join(config.ALLOWED_MODELS)})"
+            )
+
+        with self._lock:
+            if name in self._models:
+                self._models.move_to_end(name)
+                return self._models[name]
+            done = self._loading.get(name)
+            owner = done is None
+            if owner:
+                size = estimate_memory_mb(name)
+                if not self._fits(name, size):
+                    raise ModelUnavailable(
+                        f"Model '{name}' doesn't fit next to {', '.join(sorted(pinned_models()))} "
+                        f"(MAX_RESIDENT_MODELS={self.max_models}, MODEL_MEMORY_BUDGET_MB={self.memory_budget_mb})"
+                    )
+                done = self._loading[name] = threading.Event()
+                self._errors.pop(name, None)
+                self._evict(size, extra_models=1)
+
+        if not owner:
+            done.wait()
+            with self._lock:
+                if name in self._models:
+                    self._models.move_to_end(name)
+                    return self._models[name]
+                raise RuntimeError(f"Loading model '{name}' failed: {self._errors.get(name)}")
+
+        try:
+            model = self._load(name)
+            size = model.memory_mb()
+        except Exception as e:
+            with self._lock:
+                self._errors[name] = str(e)
+                del self._loading[name]
+            done.set()
+            raise
+
+        with self._lock:
+            self._models[name] = model
+            self._sizes[name] = size
+            self._evict(keep=name)
+            del self._loading[name]
+        done.set()
+        return model
+
+    def load_in_background(self, name=None):
+        """Start loading ``name`` on its own thread, unless it's loaded or loading"""
+        name = name or config.DEFAULT_MODEL
+        with self._lock:
+            if name in self._models or name in self._loading:
+                return
+        threading.Thread(target=self._load_quietly, args=(name,), name=f"load-{name}", daemon=True).start()
+
+    def _load_quietly(self, *names):
+        for name in names:
+            try:
+                self.get(name)
+            except (ValueError, ModelUnavailable) as e:
+                print(f"⚠️  Not loading {name}: {e}")
+            except Exception:
+                pass  # _load reported it, and status() keeps the error
+
+    def warm_up(self, names=None):
+        """Load ``names`` (default WARMUP_MODELS) one after another on a
+        background thread; only the first call does anything"""
+        with self._lock:
+            if self._warm_up_started:
+                return
+            self._warm_up_started = True
+        names = config.WARMUP_MODELS if names is None else names
+        if names:
+            threading.Thread(target=self._load_quietly, args=tuple(names), name="warm-up", daemon=True).start()
+
+    def is_ready(self, name=None):
+        with self._lock:
+            return (name or config.DEFAULT_MODEL) in self._models
+
+    def can_load(self, name=None):
+        """Whether ``name`` is loaded or may be, next to the pinned models"""
+        name = name or config.DEFAULT_MODEL
+        with self._lock:
+            return name in self._models or self._fits(name, estimate_memory_mb(name))
+
+    def status(self):
+        """Readiness report for health checks and the UI"""
+        with self._lock:
+            batching = {}
+            for name, model in self._models.items():
+                stats = model.batching_stats()
+                if stats:
+                    batching[name] = stats
+            return {
+                "default_model": config.DEFAULT_MODEL,
+                "ready": config.DEFAULT_MODEL in self._models,
+                "loaded": {name: round(self._sizes[name]) for name in self._models},
+                "pinned": sorted(pinned_models()),
+                "batching": batching,
+                "loading": sorted(self._loading),
+                "errors": dict(self._errors),
+                "memory_mb": round(sum(self._sizes.values())),
+                "memory_budget_mb": self.memory_budget_mb,
+                "max_models": self.max_models,
+            }
+
+
+registry = ModelRegistry()
+
+
+def get_model(name=None):
+    """Shared handle to a Whisper model (``None`` = config.DEFAULT_MODEL)"""
+    return registry.get(name)
@@ -0,0 +1,303 @@
+"""
+Model server: inference in separate processes, behind a Unix socket.
+Usage: python model_server.py [-n servers] [-m model ...] [--socket-dir DIR]
+
+One threaded Flask process runs Python's side of every request under one
+GIL and one torch thread pool. In this mode the HTTP front ends (e.g.
+``gunicorn -w 8 app:app``) stay light and hand transcriptions to
+``-n`` model server processes, each with its own copy of the model and
+its own slice of the CPU cores. Start the servers, then start the front
+ends with the MODEL_SERVERS line this script prints.
+
+Requests are one JSON line over the socket; the audio itself goes through
+shared memory (the front end copies the PCM in once, the server reads it
+in place), so nothing is pickled. Replies are JSON lines: one result, or
+one line per segment for ``iter_segments``. Requests to one server share
+its model - and its encoder batching - like threads in one process do.
+
+A front end with MODEL_SERVERS set gets a RemoteBackend from load_backend()
+instead of a local model, and sends each request to the server with the
+fewest requests in flight.
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import socket
+import socketserver
+import sys
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import config
+from backends import Backend
+from result_cache import jsonable
+
+
+def _attach(name):
+    """Open a shared memory block the client owns (and will unlink)"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 always tracks it, and would unlink it at exit
+        from multiprocessing import resource_tracker
+
+        block = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(block._name, "shared_memory")
+        return block
+
+
+def _close(block):
+    try:
+        block.close()
+    except BufferError:
+        # A tensor made from the array is still waiting to be collected
+        gc.collect()
+        block.close()
+
+
+# --- server ---------------------------------------------------------------
+
+def _replies(request):
+    from model_registry import get_model, registry
+
+    op = request.get("op")
+    if op == "status":
+        yield {"status": registry.status()}
+        return
+    if op == "load":
+        get_model(request.get("model"))
+        yield {"loaded": request.get("model")}
+        return
+    if op not in ("transcribe", "iter_segments", "detect_language"):
+        raise ValueError(f"Unknown operation '{op}'")
+
+    model = get_model(request.get("model"))
+    block = _attach(request["shm"])
+    audio = segments = None
+    try:
+        audio = np.ndarray((request["samples"],), dtype=np.float32, buffer=block.buf)
+        options = request.get("options") or {}
+        if op == "transcribe":
+            yield {"result": model.transcribe(audio, **options)}
+        elif op == "detect_language":
+            language, probability = model.detect_language(audio)
+            yield {"language": language, "probability": probability}
+        else:
+            segments = model.iter_segments(audio, **options)
+            while True:
+                try:
+                    segment = next(segments)
+                except StopIteration as done:
+                    yield {"language": done.value}
+                    break
+                yield {"segment": segment}
+    finally:
+        # Nothing may point into the block once it's closed
+        audio = segments = None
+        _close(block)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _send(self, message):
+        self.wfile.write((json.dumps(message, ensure_ascii=False, default=jsonable) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            for message in _replies(json.loads(line)):
+                self._send(message)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the front end went away
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            try:
+                self._send({"error": f"{type(e).__name__}: {e}"})
+            except OSError:
+                pass
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path, cores=None, models=()):
+    """Run one model server on ``socket_path``, pinned to ``cores``"""
+    # The server runs its models itself
+    config.MODEL_SERVERS = ()
+    if cores:
+        try:
+            os.sched_setaffinity(0, cores)
+        except (AttributeError, OSError) as e:
+            print(f"💡 Tip: core pinning needs Linux ({e})")
+        # One torch thread per pinned core
+        config.INTRA_OP_THREADS = len(cores)
+
+    from model_registry import registry
+
+    for name in models:
+        registry.get(name)
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = _Server(socket_path, _Handler)
+    print(f"✅ Model server on {socket_path} (cores: {_format_cores(cores) if cores else 'all'})")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+
+
+def _format_cores(cores):
+    cores = sorted(cores)
+    if len(cores) > 1 and cores == list(range(cores[0], cores[-1] + 1)):
+        return f"{cores[0]}-{cores[-1]}"
+    return ",".join(map(str, cores))
+
+
+def split_cores(cores, parts):
+    """Split ``cores`` into ``parts`` contiguous slices of (nearly) equal size"""
+    cores = sorted(cores)
+    parts = max(1, min(parts, len(cores)))
+    size, extra = divmod(len(cores), parts)
+    slices = []
+    start = 0
+    for i in range(parts):
+        end = start + size + (i < extra)
+        slices.append(cores[start:end])
+        start = end
+    return slices
+
+
+# --- client ---------------------------------------------------------------
+
+class RemoteBackend(Backend):
+    """A model that lives in model server processes (see MODEL_SERVERS)"""
+
+    name = "remote"
+
+    def __init__(self, model_name, device, sockets=None):
+        super().__init__(model_name, device)
+        self.sockets = tuple(sockets or config.MODEL_SERVERS)
+        self._lock = threading.Lock()
+        self._in_flight = dict.fromkeys(self.sockets, 0)
+        # Every server loads the model now, so the registry's "ready" means ready
+        for path in self.sockets:
+            for _ in self._exchange(path, {"op": "load", "model": model_name}):
+                pass
+
+    def _exchange(self, path, request):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(path)
+            with sock.makefile("rwb") as f:
+                f.write((json.dumps(request, ensure_ascii=False) + "\n").encode("utf-8"))
+                f.flush()
+                for line in f:
+                    message = json.loads(line)
+                    if "error" in message:
+                        raise RuntimeError(f"Model server {path}: {message['error']}")
+                    yield message
+
+    def _servers(self):
+        """Sockets, the one with the fewest requests in flight first"""
+        with self._lock:
+            return sorted(self.sockets, key=lambda path: self._in_flight[path])
+
+    def _request(self, op, audio, options):
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        block = shared_memory.SharedMemory(create=True, size=max(1, audio.nbytes))
+        try:
+            view = np.ndarray(audio.shape, dtype=np.float32, buffer=block.buf)
+            view[:] = audio
+            del view
+            request = {"op": op, "model": self.model_name, "options": options,
+                       "shm": block.name, "samples": len(audio)}
+            errors = []
+            for path in self._servers():
+                with self._lock:
+                    self._in_flight[path] += 1
+                try:
+                    replies = self._exchange(path, request)
+                    try:
+                        first = next(replies)
+                    except (ConnectionRefusedError, FileNotFoundError) as e:
+                        # That server is down: try the next one
+                        errors.append(f"{path}: {e}")
+                        continue
+                    yield first
+                    yield from replies
+                    return
+                finally:
+                    with self._lock:
+                        self._in_flight[path] -= 1
+            raise RuntimeError(f"No model server reachable ({'; '.join(errors)})")
+        finally:
+            block.close()
+            block.unlink()
+
+    def transcribe(self, audio, **options):
+        for message in self._request("transcribe", audio, options):
+            return message["result"]
+
+    def iter_segments(self, audio, **options):
+        for message in self._request("iter_segments", audio, options):
+            if "language" in message:
+                return message["language"]
+            yield message["segment"]
+
+    def detect_language(self, audio):
+        for message in self._request("detect_language", audio, {}):
+            return message["language"], message["probability"]
+
+    def memory_mb(self):
+        # The weights live in the model servers
+        return 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run model server processes for the HTTP front ends")
+    parser.add_argument("-n", "--servers", type=int, default=1,
+                        help="server processes; the cores are split between them")
+    parser.add_argument("-m", "--model", action="append", choices=config.ALLOWED_MODELS,
+                        help="model to load up front (repeatable, default: WARMUP_MODELS)")
+    parser.add_argument("--socket-dir", default=config.MODEL_SERVER_DIR)
+    args = parser.parse_args(argv)
+
+    models = tuple(args.model or config.WARMUP_MODELS)
+    os.makedirs(args.socket_dir, exist_ok=True)
+    cores = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else range(os.cpu_count() or 1)
+    slices = split_cores(cores, args.servers)
+    sockets = [os.path.join(args.socket_dir, f"model-{i}.sock") for i in range(len(slices))]
+
+    print(f"\n🧠 {len(slices)} model server(s), models: {', '.join(models) or 'on first use'}")
+    print("=" * 60)
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=serve, args=(path, cores, models), name=f"model-server-{i}")
+        for i, (path, cores) in enumerate(zip(sockets, slices))
+    ]
+    for process in processes:
+        process.start()
+    print("Start the front ends with:")
+    print(f"   MODEL_SERVERS={','.join(sockets)}")
+    print("=" * 60)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+    if any(process.exitcode for process in processes):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+The original implementations the fast code replaced, and synthetic text to
+run them on.
+
+test_corrections.py and test_cleanup.py check the compiled correction
+matchers and the cleanup pipelines against these, and benchmark.py times
+the two against each other; keep one copy here so the reference can't
+drift between them.
+"""
+
+import random
+import re
+
+import cleanup
+from corrections import (
+    APP_CORRECTIONS,
+    HINDI_CORRECTIONS,
+    HINGLISH_CORRECTIONS,
+    CorrectionMatcher,
+    apply_corrections,
+    table_rules,
+)
+
+# Everyday words that never hit a correction, mixed in to look like speech
+FILLER_WORDS = [
+    "मैं", "आज", "बहुत", "खुश", "हूँ", "और", "हम", "सब", "घर", "जा", "रहे",
+    "हैं", "क्या", "आप", "मुझे", "बता", "सकते", "कि", "कल", "मौसम", "कैसा",
+    "होगा", "मेरा", "नाम", "राहुल", "है", "यह", "वह", "एक", "दो", "तीन",
+    "को", "के", "से", "पर", "में", "भी", "तो", "जाने", "ने", "meeting",
+    "office", "please", "the", "project", "deadline", "kal",
+]
+
+
+def original_app_corrections(text):
+    """The original per-entry loop from super_clean_transcription"""
+    for wrong, correct in APP_CORRECTIONS.items():
+        text = re.sub(rf'\b{re.escape(wrong)}\b', correct, text, flags=re.IGNORECASE)
+    return text
+
+
+def original_processor_corrections(text):
+    """The original fix_hindi_errors + fix_hinglish loops"""
+    for wrong, correct in HINDI_CORRECTIONS.items():
+        text = text.replace(wrong, correct)
+    for hindi, english in HINGLISH_CORRECTIONS.items():
+        text = re.sub(rf'\b{re.escape(hindi)}\b', english, text)
+    return text
+
+
+def app_matcher():
+    return CorrectionMatcher(table_rules(APP_CORRECTIONS))
+
+
+def processor_matcher():
+    return CorrectionMatcher(
+        table_rules(HINDI_CORRECTIONS, whole_word=False, ignore_case=False)
+        + table_rules(HINGLISH_CORRECTIONS, ignore_case=False)
+    )
+
+
+def synthetic_transcript(n_words, seed=0, corrections=0.1, punctuate=False):
+    """Deterministic Hindi/Hinglish text with a correction key for about
+    ``corrections`` of the words, some followed by punctuation if ``punctuate``"""
+    rng = random.Random(seed)
+    keys = list(APP_CORRECTIONS) + list(HINDI_CORRECTIONS) + list(HINGLISH_CORRECTIONS)
+    words = []
+    for _ in range(n_words):
+        word = rng.choice(keys) if rng.random() < corrections else rng.choice(FILLER_WORDS)
+        if punctuate:
+            word += rng.choice(["", "", ",", "।"])
+        words.append(word)
+    return " ".join(words)
+
+
+def original_super_clean(text):
+    """The original chain of passes in super_clean_transcription"""
+    words = text.split()
+    cleaned = []
+    for word in words:
+        if len(cleaned) >= 2 and word == cleaned[-1] == cleaned[-2]:
+            continue
+        cleaned.append(word)
+    text = " ".join(cleaned)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'(.)\1{5,}', r'\1', text)
+    text = re.sub(r'\bमुझे एक कहना\b', 'मुझे यह कहना', text)
+    text = re.sub(r'\bएक कहना था\b', 'यह कहना था', text)
+    text = apply_corrections(text, "app")
+    text = re.sub(r'(\S)\s+(़|ा|ि|ी|ु|ू|े|ै|ो|ौ|ं|ः|्)', r'\1\2', text)
+    if 'want to go to' in text.lower():
+        text = re.sub(r'वाशरूम', 'washroom', text)
+        text = re.sub(r'वॉशरूम', 'washroom', text)
+    return text.strip()
+
+
+def original_clean_transcription(text):
+    """The original chain of passes in clean_transcription"""
+    words = text.split()
+    cleaned = []
+    for word in words:
+        if len(cleaned) >= 2 and word == cleaned[-1] == cleaned[-2]:
+            continue
+        if len(cleaned) >= 3 and " ".join(cleaned[-3:]) == " ".join(cleaned[-2:] + [word]):
+            continue
+        cleaned.append(word)
+    text = " ".join(cleaned)
+    text = apply_corrections(text, "processor")
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'([।.!?])\1+', r'\1', text)
+    text = re.sub(r'(.)\1{3,}', r'\1', text)
+    text = re.sub(r'।(\S)', r'। \1', text)
+    text = re.sub(r'(\S)\s+(़)', r'\1\2', text)
+    text = re.sub(r'(\S)\s+(ा|ि|ी|ु|ू|े|ै|ो|ौ|ं|ः|्)', r'\1\2', text)
+    text = re.sub(r'्\s+', '्', text)
+    return text.strip()
+
+
+def separate_passes(*passes):
+    """The original one-``re.sub``-per-pass version of a fused stage"""
+    def run(text):
+        for pattern, repl in passes:
+            text = re.sub(pattern, repl, text)
+        return text
+    return run
+
+
+# (name, the original passes, the fused cleanup.py pattern that replaced them)
+FUSED_PASSES = [
+    ("app spacing", separate_passes((r'\s+', ' '), (r'(.)\1{5,}', r'\1')),
+     lambda text: cleanup._APP_SPACING.sub(cleanup._spacing, text)),
+    ("context fixes", separate_passes((r'\bमुझे एक कहना\b', 'मुझे यह कहना'), (r'\bएक कहना था\b', 'यह कहना था')),
+     lambda text: cleanup._CONTEXT.sub(cleanup._context_fix, text)),
+    ("processor spacing", separate_passes((r'\s+', ' '), (r'([।.!?])\1+', r'\1'), (r'(.)\1{3,}', r'\1')),
+     lambda text: cleanup._PROCESSOR_SPACING.sub(cleanup._spacing, text)),
+    ("english spacing", separate_passes((r'\s+', ' '), (r'([.!?])\1+', r'\1'), (r'(.)\1{3,}', r'\1')),
+     lambda text: cleanup._ENGLISH_SPACING.sub(cleanup._spacing, text)),
+    ("nukta/matra/virama", separate_passes((r'(\S)\s+(़)', r'\1\2'), (rf'(\S)\s+({cleanup.DEVANAGARI_SIGNS})', r'\1\2'),
+                                           (r'्\s+', '्')),
+     lambda text: cleanup._SIGN_CHAIN.sub(cleanup._join_signs, text)),
+]
+
+# What Whisper gets wrong in ways the cleanup steps care about
+MESSY_PIECES = [
+    "है है है है", "नमस्ते", "क िताब", "ह ै", "अच्छ ा", "स्कू ल", "बड़ ़ा", "क् ष",
+    "।", "।।", "...", "!!", "हैैैैैै", "aaaaaaa", "मुझे एक कहना था", "एक कहना था",
+    "I want to go to", "WANT TO GO TO", "वाशरूम", "वॉशरूम", "  ", "\n",
+    "थैंक यू थैंक यू थैंक यू", "गुड मॉर्निंग", "जेंटलमेन", "न जाने",
+]
@@ -0,0 +1,193 @@
+"""
+Content-addressed cache of transcription results.
+
+The key is a hash of the audio (the uploaded bytes, or the decoded PCM
+when that's all there is) plus everything that changes the output: model,
+backend, VAD mode and decoding options. What's cached is the raw model
+result, so text cleanup and correction edits still apply to cache hits.
+
+Recent results live in an in-memory LRU (RESULT_CACHE_ENTRIES); every
+result is also written to RESULT_CACHE_DIR, which is trimmed back to
+RESULT_CACHE_DISK_MB by dropping the least recently used files.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import config
+
+# Bump when the cached result format changes
+CACHE_VERSION = 1
+CHUNK_SIZE = 1024 * 1024
+
+
+def stream_digest(stream):
+    """sha256 of a seekable file-like object, which is rewound afterwards"""
+    digest = hashlib.sha256()
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def pcm_digest(audio):
+    """sha256 of decoded float32 audio"""
+    return hashlib.sha256(np.ascontiguousarray(audio, dtype=np.float32).tobytes()).hexdigest()
+
+
+def cache_key(audio_digest, model_name, options):
+    params = {
+        "version": CACHE_VERSION,
+        "audio": audio_digest,
+        "model": model_name,
+        "backend": config.WHISPER_BACKEND,
+        "compute_type": config.FASTER_WHISPER_COMPUTE_TYPE,
+        "vad": config.VAD_MODE,
+        "options": options,
+    }
+    encoded = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def jsonable(value):
+    # NumPy scalars (e.g. word probabilities) -> plain Python numbers
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class ResultCache:
+    def __init__(self, max_entries=config.RESULT_CACHE_ENTRIES,
+                 disk_dir=config.RESULT_CACHE_DIR, disk_max_mb=config.RESULT_CACHE_DISK_MB):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir if disk_max_mb > 0 else None
+        self.disk_max_bytes = disk_max_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> JSON text, least recently used first
+        self._counts = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._disk_bytes = None       # measured on first write
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _remember(self, key, data):
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = f.read()
+            os.utime(path)  # mark as recently used
+        except OSError:
+            return None
+        return data
+
+    def get(self, key):
+        """Cached result for ``key`` (a fresh copy), or None"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._counts["memory_hits"] += 1
+                return json.loads(data)
+
+        data = self._read_disk(key)
+        with self._lock:
+            if data is None:
+                self._counts["misses"] += 1
+                return None
+            self._counts["disk_hits"] += 1
+            self._remember(key, data)
+        return json.loads(data)
+
+    def put(self, key, result):
+        data = json.dumps(result, ensure_ascii=False, default=jsonable)
+        with self._lock:
+            self._remember(key, data)
+            self._counts["stores"] += 1
+        if self.disk_dir:
+            try:
+                self._write_disk(key, data)
+            except OSError as e:
+                print(f"⚠️  Couldn't write result cache entry: {e}")
+
+    def _write_disk(self, key, data):
+        os.makedirs(self.disk_dir, exist_ok=True)
+        encoded = data.encode("utf-8")
+        # Write then rename, so readers never see half a file
+        fd, temp = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(encoded)
+            os.replace(temp, self._path(key))
+        except OSError:
+            os.remove(temp)
+            raise
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, _, size in self._disk_entries())
+            else:
+                self._disk_bytes += len(encoded)
+            if self._disk_bytes > self.disk_max_bytes:
+                self._trim_disk()
+
+    def _disk_entries(self):
+        entries = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith(".json"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, entry.path, stat.st_size))
+        return entries
+
+    def _trim_disk(self):
+        """Delete least recently used files until the disk tier fits"""
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self._counts["evictions"] += 1
+        self._disk_bytes = total
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+            hits = counts["memory_hits"] + counts["disk_hits"]
+            lookups = hits + counts["misses"]
+            return dict(
+                counts,
+                hits=hits,
+                hit_rate=round(hits / lookups, 3) if lookups else None,
+                memory_entries=len(self._memory),
+                disk_mb=round((self._disk_bytes or 0) / (1024 * 1024), 1),
+                disk_max_mb=round(self.disk_max_bytes / (1024 * 1024)),
+            )
+
+
+result_cache = ResultCache()
@@ -0,0 +1,125 @@
+"""
+Live transcription of audio that is still being recorded.
+
+The recording so far is transcribed again every STREAM_STEP_SECONDS over
+a sliding window. Whisper keeps revising the last few words of such a
+hypothesis, so words are only *committed* once two consecutive passes
+agree on them (LocalAgreement); the rest is shown as *tentative* text.
+Committed audio is dropped from the window once it grows past
+STREAM_WINDOW_SECONDS, so every pass stays short no matter how long the
+recording gets.
+"""
+
+import re
+
+import numpy as np
+
+import config
+from audio_ingest import SAMPLE_RATE
+from decoding import decode
+from vad import energy_regions
+
+# Whisper can't look at more than 30 s at once
+MAX_WINDOW_SECONDS = 28.0
+# Committed text fed back as the prompt for the next pass
+PROMPT_CHARS = 200
+
+_NON_WORD = re.compile(r"[^\w]")
+
+
+def _normalize(word):
+    return _NON_WORD.sub("", word.lower())
+
+
+class StreamingTranscriber:
+    def __init__(self, model, options, profile=None, sr=SAMPLE_RATE):
+        self.model = model
+        self.options = dict(options, word_timestamps=True)
+        self.profile = profile or config.STREAM_PROFILE
+        self.sr = sr
+        self.language = None
+        self._audio = np.zeros(0, np.float32)
+        self._offset = 0.0           # recording time of self._audio[0]
+        self._unprocessed = 0        # samples added since the last pass
+        self._committed = []         # (word, start, end), recording time
+        self._hypothesis = []        # uncommitted words of the last pass
+
+    @property
+    def committed_text(self):
+        return "".join(word for word, _, _ in self._committed).strip()
+
+    @property
+    def tentative_text(self):
+        return "".join(word for word, _, _ in self._hypothesis).strip()
+
+    def add_audio(self, samples):
+        self._audio = np.concatenate([self._audio, samples])
+        self._unprocessed += len(samples)
+
+    def ready(self):
+        """Whether enough new audio arrived for another pass"""
+        return self._unprocessed >= config.STREAM_STEP_SECONDS * self.sr
+
+    def _transcribe(self):
+        """Words of the current window that come after the committed ones"""
+        options = dict(self.options)
+        if self._committed:
+            options["initial_prompt"] = "".join(word for word, _, _ in self._committed)[-PROMPT_CHARS:]
+        result = decode(self.model, self._audio, options, self.profile, self.sr)
+        self.language = result.get("language") or self.language
+
+        committed_end = self._committed[-1][2] if self._committed else 0.0
+        words = []
+        for segment in result["segments"]:
+            for word in segment.get("words") or []:
+                start, end = word["start"] + self._offset, word["end"] + self._offset
+                if (start + end) / 2 > committed_end:
+                    words.append((word["word"], start, end))
+        return words
+
+    def _trim(self, cut):
+        """Forget audio before recording time ``cut``"""
+        drop = int((cut - self._offset) * self.sr)
+        if drop > 0:
+            self._audio = self._audio[drop:]
+            self._offset += drop / self.sr
+
+    def process(self):
+        """Run one pass; returns the newly committed text"""
+        self._unprocessed = 0
+        if not energy_regions(self._audio, self.sr):
+            # Nothing but silence so far - don't let Whisper imagine words
+            self._hypothesis = []
+            self._trim(self._offset + max(0.0, len(self._audio) / self.sr - config.VAD_PAD_SECONDS))
+            return ""
+
+        words = self._transcribe()
+        agreed = 0
+        for new, old in zip(words, self._hypothesis):
+            if _normalize(new[0]) != _normalize(old[0]):
+                break
+            agreed += 1
+        window = len(self._audio) / self.sr
+        if window > MAX_WINDOW_SECONDS:
+            # The window is full and still undecided: take what we have
+            agreed = len(words)
+
+        newly = words[:agreed]
+        self._committed += newly
+        self._hypothesis = words[agreed:]
+
+        if window > MAX_WINDOW_SECONDS and not words:
+            self._trim(self._offset + window - config.VAD_PAD_SECONDS)
+        elif self._committed and window > config.STREAM_WINDOW_SECONDS:
+            self._trim(self._committed[-1][2])
+        return "".join(word for word, _, _ in newly)
+
+    def finish(self):
+        """Transcribe whatever is left and commit all of it"""
+        if self._unprocessed:
+            self._unprocessed = 0
+            if energy_regions(self._audio, self.sr):
+                self._hypothesis = self._transcribe()
+        self._committed += self._hypothesis
+        self._hypothesis = []
+        return self.committed_text
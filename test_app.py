@@ -0,0 +1,158 @@
+"""
+/transcribe and /jobs turn a request away on its form fields before the
+upload is read, and hold every upload to the same limits; /transcribe can
+stream its segments as NDJSON or server-sent events.
+"""
+
+import io
+import json
+import shutil
+import wave
+
+import numpy as np
+import pytest
+from werkzeug.datastructures import MultiDict
+
+import app as app_module
+import config
+from result_cache import ResultCache
+from upload import AudioTooLong, IngestRequest, UploadSink
+
+app = app_module.app
+
+
+def wav_bytes(seconds, sr=16000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(sr)
+        out.writeframes(np.zeros(int(seconds * sr), dtype=np.int16).tobytes())
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_module.job_queue, "start", lambda: None)
+    monkeypatch.setattr(app_module.registry, "warm_up", lambda: None)
+    monkeypatch.setattr(app_module.registry, "load_in_background", lambda name=None: None)
+    return app.test_client()
+
+
+@pytest.fixture
+def uploads(monkeypatch):
+    """Files whose upload was started (spooled and decoded)"""
+    started = []
+    get_file_stream = IngestRequest._get_file_stream
+
+    def record(self, *args, **kwargs):
+        started.append(self.endpoint)
+        return get_file_stream(self, *args, **kwargs)
+    monkeypatch.setattr(IngestRequest, "_get_file_stream", record)
+    return started
+
+
+@pytest.fixture
+def queued(monkeypatch):
+    jobs = []
+
+    def submit(audio, filename, options):
+        jobs.append((audio.read(), options))
+        return "job-1"
+    monkeypatch.setattr(app_module.job_queue, "submit", submit)
+    return jobs
+
+
+def test_loading_model_is_refused_before_the_upload(client, uploads, monkeypatch):
+    monkeypatch.setattr(app_module.registry, "is_ready", lambda name=None: False)
+    response = client.post("/transcribe", data={"file": (io.BytesIO(wav_bytes(1)), "a.wav")})
+    assert response.status_code == 503
+    assert uploads == []
+
+
+@pytest.mark.parametrize("field, value", [("model", "no-such-model"), ("profile", "no-such-profile")])
+def test_unknown_fields_are_refused_before_the_upload(client, uploads, field, value):
+    for route in ("/transcribe", "/jobs"):
+        data = {field: value, "file": (io.BytesIO(wav_bytes(1)), "a.wav")}
+        response = client.post(route, data=data)
+        assert response.status_code == 400
+        assert value in response.get_json()["error"]
+    assert uploads == []
+
+
+def test_fields_after_the_file_are_still_checked(client, queued):
+    data = MultiDict([("file", (io.BytesIO(wav_bytes(1)), "a.wav")), ("model", "no-such-model")])
+    response = client.post("/jobs", data=data)
+    assert response.status_code == 400
+    assert queued == []
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+def test_jobs_keep_to_the_duration_limit(client, queued, monkeypatch):
+    monkeypatch.setattr(config, "MAX_AUDIO_SECONDS", 2)
+    audio = wav_bytes(1)
+    response = client.post("/jobs", data={"file": (io.BytesIO(audio), "a.wav")})
+    assert response.status_code == 202
+    assert queued[0][0] == audio
+
+    response = client.post("/jobs", data={"file": (io.BytesIO(wav_bytes(3)), "b.wav")})
+    assert response.status_code == 413
+    assert len(queued) == 1
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+def test_counting_sink_keeps_no_audio(monkeypatch):
+    monkeypatch.setattr(config, "MAX_AUDIO_SECONDS", 4)
+    for seconds, too_long in ((3, False), (5, True)):
+        audio = wav_bytes(seconds)
+        sink = UploadSink(decode=True, keep_samples=False)
+        try:
+            for start in range(0, len(audio), 65536):
+                sink.write(audio[start:start + 65536])
+            assert sink._samples == []
+            sink.check_duration()
+        except AudioTooLong:
+            assert too_long
+        else:
+            assert not too_long
+            assert sink._sample_count == seconds * 16000
+            assert sink.read() == audio
+        finally:
+            sink.close()
+
+
+class StreamingModel:
+    def iter_segments(self, audio, **options):
+        yield {"start": 0.0, "end": 0.4, "text": " नमस्ते"}
+        yield {"start": 0.4, "end": 0.9, "text": " दोस्तों"}
+        return "hi"
+
+
+@pytest.fixture
+def streaming(client, monkeypatch):
+    monkeypatch.setattr(app_module.registry, "is_ready", lambda name=None: True)
+    monkeypatch.setattr(app_module, "get_model", lambda name=None: StreamingModel())
+    monkeypatch.setattr(app_module, "route", lambda audio, model: {"language": "hi"})
+    monkeypatch.setattr(app_module, "result_cache", ResultCache(max_entries=0, disk_max_mb=0))
+    monkeypatch.setattr(config, "VAD_MODE", "off")
+    return client
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+def test_ndjson_stream(streaming):
+    response = streaming.post("/transcribe?stream=ndjson", data={"file": (io.BytesIO(wav_bytes(1)), "a.wav")})
+    assert response.mimetype == "application/x-ndjson"
+    events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [event["type"] for event in events] == ["segment", "segment", "done"]
+    assert [event["id"] for event in events[:2]] == [0, 1]
+    assert events[2]["text"] == "नमस्ते दोस्तों"
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+def test_sse_stream(streaming):
+    response = streaming.post("/transcribe", data={"file": (io.BytesIO(wav_bytes(1)), "a.wav")},
+                              headers={"Accept": "text/event-stream"})
+    assert response.mimetype == "text/event-stream"
+    blocks = response.get_data(as_text=True).strip().split("\n\n")
+    assert [block.splitlines()[0] for block in blocks] == ["event: segment", "event: segment", "event: done"]
+    assert json.loads(blocks[-1].splitlines()[1][len("data: "):])["text"] == "नमस्ते दोस्तों"
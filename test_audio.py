@@ -1,21 +1,21 @@
 """
 Standalone test script - Drop any audio file and get god-level transcription
-Usage: python test_audio.py path/to/your/audio.m4a
+Usage: python test_audio.py path/to/your/audio.m4a [model_name]
 """
 
-import whisper
 import sys
 from audio_processor import process_audio_intelligently
+from model_registry import get_model
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python test_audio.py <audio_file_path>")
+        print("Usage: python test_audio.py <audio_file_path> [model_name]")
         sys.exit(1)
     
     audio_path = sys.argv[1]
+    model_name = sys.argv[2] if len(sys.argv) > 2 else "medium"
     
-    print("Loading Whisper model (large-v3)...")
-    model = whisper.load_model("medium")
+    model = get_model(model_name)
     
     print(f"\nTranscribing: {audio_path}")
     print("=" * 60)
@@ -0,0 +1,65 @@
+"""
+Hallucination checks: a 2-5 word phrase repeated LOOP_REPEATS times back to
+back is a loop, and only the segments a loop runs through are dropped.
+"""
+
+import pytest
+
+from audio_processor import LOOP_NGRAM_SIZES, LOOP_REPEATS, bad_segments, find_loops, is_hallucination
+
+PHRASE = ["मैं", "आज", "घर", "जा", "रहा"]
+
+
+def looped(n, repeats):
+    return PHRASE[:n] * repeats
+
+
+def segment(text, avg_logprob=-0.2, compression_ratio=1.2):
+    return {"text": " " + text, "avg_logprob": avg_logprob, "compression_ratio": compression_ratio}
+
+
+@pytest.mark.parametrize("n", LOOP_NGRAM_SIZES)
+def test_loop_threshold(n):
+    assert find_loops(looped(n, LOOP_REPEATS - 1)) == []
+    assert find_loops(looped(n, LOOP_REPEATS)) == [(0, n * LOOP_REPEATS)]
+
+
+def test_loop_inside_other_words():
+    words = ["ok", "so"] + looped(2, LOOP_REPEATS) + ["thanks"]
+    assert find_loops(words) == [(2, 2 + 2 * LOOP_REPEATS)]
+
+
+def test_repeats_that_are_not_back_to_back():
+    words = []
+    for filler in ["एक", "दो", "तीन", "चार", "पाँच"]:
+        words += ["thank", "you", filler]
+    assert find_loops(words) == []
+    assert not is_hallucination(" ".join(words), [])
+
+
+@pytest.mark.parametrize("text", ["", "नमस्ते"])
+def test_empty_and_one_word_transcripts(text):
+    assert find_loops(text.split()) == []
+    assert bad_segments([segment(text)]).tolist() == [False]
+
+
+def test_short_text_is_a_hallucination():
+    assert is_hallucination("", [])
+    assert not is_hallucination("नमस्ते", [])
+
+
+def test_bad_segments_keeps_good_segments_around_a_loop():
+    segments = [
+        segment("मैं आज ऑफिस में हूँ"),
+        segment(" ".join(looped(2, LOOP_REPEATS + 2))),
+        segment("कल मिलते हैं"),
+        segment("धीरे बोला", avg_logprob=-1.5),
+    ]
+    assert bad_segments(segments).tolist() == [False, True, False, True]
+
+
+def test_loop_across_segments_drops_both():
+    words = looped(3, LOOP_REPEATS)
+    segments = [segment("शुरू " + " ".join(words[:5])), segment(" ".join(words[5:]) + " बस"),
+                segment("बाकी सब ठीक")]
+    assert bad_segments(segments).tolist() == [True, True, False]
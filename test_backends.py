@@ -0,0 +1,84 @@
+"""
+openai-whisper keeps a request's decoding state (kv-cache hooks) on the
+shared model, so nothing else may run the model while a request decodes.
+"""
+
+import sys
+import threading
+import types
+
+import numpy as np
+
+from backends import Backend, OpenAIWhisperBackend
+from batching import BatchScheduler
+from inference_scheduler import scheduler as inference_scheduler
+
+
+class FakeMel:
+    def to(self, device):
+        return self
+
+
+class FakeEncoder:
+    def forward(self, mel):
+        return mel
+
+
+class FakeModel:
+    """Counts language detections that ran while a transcription was decoding"""
+
+    def __init__(self):
+        self.encoder = FakeEncoder()
+        self.dims = types.SimpleNamespace(n_mels=80)
+        self.device = "cpu"
+        self.decoding = False
+        self.overlaps = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def transcribe(self, audio, **options):
+        self.decoding = True
+        self.started.set()
+        self.release.wait(5)
+        self.decoding = False
+        return {"text": "", "segments": [], "language": "hi"}
+
+    def detect_language(self, mel):
+        if self.decoding:
+            self.overlaps += 1
+        return None, {"en": 0.9, "hi": 0.1}
+
+
+def openai_backend(model):
+    backend = OpenAIWhisperBackend.__new__(OpenAIWhisperBackend)
+    Backend.__init__(backend, "tiny", "cpu")
+    backend.model = model
+    backend.scheduler = BatchScheduler(model, max_batch=1)
+    return backend
+
+
+def test_detect_language_waits_for_transcription_in_flight(monkeypatch):
+    fake_whisper = types.SimpleNamespace(pad_or_trim=lambda audio: audio,
+                                         log_mel_spectrogram=lambda audio, n_mels: FakeMel())
+    monkeypatch.setitem(sys.modules, "whisper", fake_whisper)
+    # Only the model may keep the two apart, not a shortage of CPU slots
+    monkeypatch.setattr(inference_scheduler, "max_slots", 0)
+    model = FakeModel()
+    backend = openai_backend(model)
+    audio = np.zeros(16000, dtype=np.float32)
+
+    transcription = threading.Thread(target=backend.transcribe, args=(audio,))
+    transcription.start()
+    assert model.started.wait(5)
+
+    detected = []
+    detection = threading.Thread(target=lambda: detected.append(backend.detect_language(audio)))
+    detection.start()
+    detection.join(0.2)
+    assert detection.is_alive(), "detection ran while the transcription held the model"
+
+    model.release.set()
+    transcription.join(5)
+    detection.join(5)
+    assert model.overlaps == 0
+    assert detected == [("en", 0.9)]
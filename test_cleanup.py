@@ -0,0 +1,86 @@
+"""
+The cleanup pipelines must give exactly what the original chains of
+``re.sub`` passes gave, on a whole text and fed piece by piece; and each
+fused pattern exactly what the passes it replaces gave (see cleanup.py).
+"""
+
+import json
+import random
+
+import pytest
+
+import cleanup
+from cleanup import app_cleanup, processor_cleanup
+from corrections import CorrectionEngine
+from reference import FUSED_PASSES, MESSY_PIECES, original_clean_transcription, original_super_clean
+
+# Where the separate passes do something surprising: each joins a sign
+# only to a character it hasn't just consumed, so in a chain of one kind
+# of sign every other space stays
+EDGE_CASES = [
+    "क ़", "क ़ ़", "क ़ ़ ़ ़", "क ा ा", "क ा ा ा ा", "क ़ ा", "क ा ़", "क ़ ़ ा ा",
+    "क ि ़ ि", "क्  ष", "क् ा ा", "क ् ्  ्", "क्\n\tष", "क्", "क् ", " ्", "्  ्",
+    " ा", "ा ा", "क  ा  ा", "क।।।। ा", "....", "!!!! ?", "aaaa", "aaaaaa  bbbbbbb",
+    "मुझे एक कहना था", "मुझे एक कहना एक कहना था", "एक कहना थाा",
+]
+
+# What the fused patterns treat specially, for random strings
+FUZZ_PIECES = ["क", "a", "ष", "़", "ा", "ि", "्", " ", "  ", "\t", "\n", "।", ".", "!", "aaaa"]
+
+
+def fuzz_samples(count, seed=0):
+    rng = random.Random(seed)
+    return ["".join(rng.choice(FUZZ_PIECES) for _ in range(rng.randint(1, 20))) for _ in range(count)]
+
+
+def messy_samples(count, seed=0):
+    rng = random.Random(seed)
+    return [rng.choice(["", " "]) + " ".join(rng.choice(MESSY_PIECES) for _ in range(rng.randint(1, 40)))
+            + rng.choice(["", " ", "।"]) for _ in range(count)]
+
+
+SAMPLES = EDGE_CASES + MESSY_PIECES + messy_samples(300) + fuzz_samples(2000)
+
+
+def split_randomly(text, rng, max_piece=40):
+    """``text`` cut at random places, mid-word included, like segment texts"""
+    pieces = []
+    while text:
+        size = rng.randint(0, max_piece)
+        pieces.append(text[:size])
+        text = text[size:]
+    return pieces
+
+
+@pytest.mark.parametrize("name, original, fused", FUSED_PASSES, ids=[case[0] for case in FUSED_PASSES])
+def test_fused_patterns_match_separate_passes(name, original, fused):
+    for sample in SAMPLES + fuzz_samples(20000, seed=1):
+        assert fused(sample) == original(sample), f"{name}: {sample!r}"
+
+
+@pytest.mark.parametrize("make_pipeline, original", [
+    (app_cleanup, original_super_clean),
+    (processor_cleanup, original_clean_transcription),
+], ids=["super_clean_transcription", "clean_transcription"])
+def test_pipelines_match_original_passes(make_pipeline, original):
+    rng = random.Random(0)
+    pipeline = make_pipeline()
+    for sample in SAMPLES:
+        expected = original(sample)
+        assert pipeline.run(sample) == expected, f"batch: {sample!r}"
+        for _ in range(3):
+            pieces = split_randomly(sample, rng)
+            streamed = "".join(pipeline.feed(piece) for piece in pieces) + pipeline.finish()
+            assert streamed == expected, f"streamed {pieces!r}"
+
+
+@pytest.mark.parametrize("make_pipeline", [app_cleanup, processor_cleanup],
+                         ids=["super_clean_transcription", "clean_transcription"])
+def test_english_keeps_file_corrections_only(make_pipeline, tmp_path, monkeypatch):
+    path = tmp_path / "corrections.json"
+    path.write_text(json.dumps({"teh": "the"}), encoding="utf-8")
+    monkeypatch.setattr(cleanup, "engine", CorrectionEngine(str(path)))
+    pipeline = make_pipeline("en")
+    # The file's correction applies; the Hindi tables ("थैंक" -> "thank")
+    # and the Devanagari sign fixes don't
+    assert pipeline.run("teh  meeting थैंक क ा") == "the meeting थैंक क ा"
@@ -0,0 +1,102 @@
+"""
+The compiled correction matchers must give exactly what the original
+per-entry loops gave (see corrections.py).
+"""
+
+import json
+import os
+import threading
+
+import pytest
+
+from corrections import CorrectionEngine
+from reference import (
+    app_matcher,
+    original_app_corrections,
+    original_processor_corrections,
+    processor_matcher,
+    synthetic_transcript,
+)
+
+# (input, app output, processor output), captured from the original loops
+GOLDEN = [
+    ('नमसते जेंटलमेन और लेडीज, गुड मॉर्निंग',
+     'नमसते gentlemanा और ladies, गुड मॉर्नािंग',
+     'नमस्ते gentleman और ladies, गुड morning'),
+    ('मुझे वाशरूम जाना है प्लीज',
+     'मुझे washroom जानाा है please',
+     'मुझे वाशरूम जाना है please'),
+    ('थैंक यू सो मच, थैंक्यू, थैंकयू',
+     'thank यू सो मच, thank्यू, थैंकयू',
+     'थैंक यू सो मच, थैंक्यू, थैंकयू'),
+    ('बिन साजना के मने क्या है',
+     'बिना साजना के मने क्या है',
+     'बिन साजना के मने क्या है'),
+    ('सत स्री अकाल जी, धनयवाद',
+     'सत श्री अकाल जी, धन्यवाद',
+     'सत श्री अकाल जी, धनयवाद'),
+    ('ये मेरी जिनदगी का सबसे खुबसूरत किसा है',
+     'ये मेरी जिनदगी का सबसे खूबसूरत किसा है',
+     'ये मेरी जिनदगी का सबसे खूबसूरत किसा है'),
+    ('माइक टेस्टिंग माइक टेस्टिंग, बटन दबाओ',
+     'mic testing mic testing, button दबाओ',
+     'mic testing mic testing, button दबाओ'),
+    ('हेलो हलो हैलो, सॉरी, ओके ओ के',
+     'हेलो हलो हैलो, सॉरी, ओके ओ के',
+     'हेलो हलो हैलो, सॉरी, ओके ओ के'),
+    ('न जाने क्यों दिल दीवाना है',
+     'ना जानाे क्यों दिल दीवानाा है',
+     'न जाने क्यों दिल दीवाना है'),
+    ('एक्सक्यूज मी, गुड नाइट',
+     'एक्सक्यूज मी, गुड नााइट',
+     'एक्सक्यूज मी, गुड नाइट'),
+    ('HELLO Ok थैंक',
+     'HELLO Ok thank',
+     'HELLO Ok थैंक'),
+    ('सतसरीअकाल, एपीआईकी दो, इधर क्लिक करना',
+     'सतसरीअकाल, एपीआईकी दो, इधर क्लिक करना',
+     'सत श्री अकाल, एपीआईकी दो, idhar click करना'),
+    ('', '', ''),
+]
+
+
+@pytest.mark.parametrize("text, app, processor", GOLDEN)
+def test_golden_outputs(text, app, processor):
+    assert app_matcher()(text) == app
+    assert processor_matcher()(text) == processor
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_matchers_match_original_loops(seed):
+    text = synthetic_transcript(200, seed, corrections=0.3, punctuate=True)
+    assert app_matcher()(text) == original_app_corrections(text)
+    assert processor_matcher()(text) == original_processor_corrections(text)
+
+
+def test_reload_happens_off_the_request_path(tmp_path, monkeypatch):
+    path = tmp_path / "corrections.json"
+    path.write_text(json.dumps({"foo": "bar"}), encoding="utf-8")
+    engine = CorrectionEngine(str(path), check_interval=0)
+    assert engine.apply("foo baz") == "bar baz"
+
+    path.write_text(json.dumps({"foo": "bar", "baz": "qux"}), encoding="utf-8")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+    rebuilding = threading.Event()
+    release = threading.Event()
+    build = engine._build
+
+    def slow_build():
+        rebuilding.set()
+        release.wait(5)
+        return build()
+    monkeypatch.setattr(engine, "_build", slow_build)
+
+    # The request that notices the change doesn't wait for the rebuild
+    assert engine.apply("foo baz") == "bar baz"
+    assert rebuilding.wait(5)
+    assert engine.apply("foo baz") == "bar baz"
+
+    release.set()
+    with engine._reload_lock:
+        pass
+    assert engine.apply("foo baz") == "bar qux"
@@ -0,0 +1,57 @@
+"""
+The adaptive profile re-decodes only the segments that fail the confidence
+checks, and keeps the re-decode only where it scores better.
+"""
+
+import numpy as np
+import pytest
+
+from decoding import PROFILES, REDECODE_PAD_SECONDS, decode
+
+SR = 100
+
+
+def seg(start, end, text, avg_logprob=-0.2):
+    return {"start": start, "end": end, "text": text, "avg_logprob": avg_logprob, "compression_ratio": 1.2}
+
+
+class FakeModel:
+    """Greedy decoding gets the middle of three segments wrong; the beam
+    gives ``retry_logprob`` for it"""
+
+    def __init__(self, retry_logprob):
+        self.retry_logprob = retry_logprob
+        self.calls = []
+
+    def transcribe(self, audio, **options):
+        self.calls.append((options["beam_size"], len(audio)))
+        if options["beam_size"] == PROFILES["fast"]["beam_size"]:
+            segments = [seg(0.0, 2.0, " एक"), seg(2.0, 4.0, " गलत", avg_logprob=-2.0), seg(4.0, 6.0, " तीन")]
+        else:
+            segments = [seg(REDECODE_PAD_SECONDS, 2.0 + REDECODE_PAD_SECONDS, " दो", self.retry_logprob)]
+        return {"text": "".join(s["text"] for s in segments), "segments": segments, "language": "hi"}
+
+
+def test_only_failing_segments_are_redecoded():
+    model = FakeModel(retry_logprob=-0.3)
+    result = decode(model, np.zeros(6 * SR), {}, "adaptive", sr=SR)
+
+    pad = int(REDECODE_PAD_SECONDS * SR)
+    assert model.calls == [(1, 6 * SR), (15, 2 * SR + 2 * pad)]
+    assert result["text"] == " एक दो तीन"
+    assert [(s["id"], s["start"], s["end"]) for s in result["segments"]] == [
+        (0, 0.0, 2.0), (1, pytest.approx(2.0), pytest.approx(4.0)), (2, 4.0, 6.0)]
+    report = result["decoding"]
+    assert (report["segments"], report["redecoded"], report["improved"]) == (3, 1, 1)
+    assert report["acceptance_rate"] == pytest.approx(0.667)
+
+
+def test_worse_redecode_is_dropped():
+    result = decode(FakeModel(retry_logprob=-3.0), np.zeros(6 * SR), {}, "adaptive", sr=SR)
+    assert result["text"] == " एक गलत तीन"
+    assert (result["decoding"]["redecoded"], result["decoding"]["improved"]) == (1, 0)
+
+
+def test_unknown_profile():
+    with pytest.raises(ValueError):
+        decode(FakeModel(-0.3), np.zeros(SR), {}, "thorough")
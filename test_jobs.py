@@ -0,0 +1,82 @@
+"""
+JobQueue: a submitted upload goes through a worker to its result, with the
+job's state in SQLite and its audio in a file that is gone once it's done.
+"""
+
+import io
+import os
+import sqlite3
+
+import pytest
+
+from jobs import JobQueue, QueueFull
+
+
+def read_handler(audio, options):
+    return {"text": audio.read().decode(), "options": options}
+
+
+def failing_handler(audio, options):
+    raise RuntimeError("no speech")
+
+
+def make_queue(tmp_path, handler=read_handler, **kwargs):
+    return JobQueue(handler, db_path=str(tmp_path / "jobs.db"), audio_dir=str(tmp_path / "audio"), **kwargs)
+
+
+def test_submit_run_status(tmp_path):
+    jobs = make_queue(tmp_path)
+    job_id = jobs.submit(io.BytesIO(b"hello"), "a.wav", {"model": "tiny"})
+    assert jobs.get(job_id)["status"] == "queued"
+    assert os.listdir(tmp_path / "audio") == [job_id]
+
+    jobs.start()
+    job = jobs.get(job_id, wait=5)
+    assert job["status"] == "done"
+    assert job["filename"] == "a.wav"
+    assert job["result"] == {"text": "hello", "options": {"model": "tiny"}}
+    assert os.listdir(tmp_path / "audio") == []
+
+
+def test_failed_job_reports_error(tmp_path):
+    jobs = make_queue(tmp_path, failing_handler)
+    jobs.start()
+    job = jobs.get(jobs.submit(io.BytesIO(b"hello"), "a.wav", {}), wait=5)
+    assert job["status"] == "failed"
+    assert job["error"] == "Transcription failed: no speech"
+    assert os.listdir(tmp_path / "audio") == []
+
+
+def test_unknown_job(tmp_path):
+    assert make_queue(tmp_path).get("no-such-job") is None
+
+
+def test_full_queue_refuses_without_keeping_the_upload(tmp_path):
+    jobs = make_queue(tmp_path, max_queued=1)
+    jobs.submit(io.BytesIO(b"one"), "a.wav", {})
+    with pytest.raises(QueueFull):
+        jobs.submit(io.BytesIO(b"two"), "b.wav", {})
+    assert len(os.listdir(tmp_path / "audio")) == 1
+
+
+def test_queued_jobs_survive_a_restart(tmp_path):
+    job_id = make_queue(tmp_path).submit(io.BytesIO(b"hello"), "a.wav", {})
+    jobs = make_queue(tmp_path)
+    jobs.start()
+    assert jobs.get(job_id, wait=5)["result"]["text"] == "hello"
+
+
+def test_jobs_queued_as_blobs_still_run(tmp_path):
+    # A database from before uploads were kept in files
+    db = sqlite3.connect(tmp_path / "jobs.db")
+    db.execute("CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, filename TEXT, "
+               "options TEXT NOT NULL, audio BLOB, result TEXT, error TEXT, created REAL NOT NULL, "
+               "started REAL, finished REAL)")
+    db.execute("INSERT INTO jobs (id, status, filename, options, audio, created) "
+               "VALUES ('old', 'queued', 'a.wav', '{}', ?, 0)", (b"hello",))
+    db.commit()
+    db.close()
+
+    jobs = make_queue(tmp_path)
+    jobs.start()
+    assert jobs.get("old", wait=5)["result"]["text"] == "hello"
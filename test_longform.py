@@ -0,0 +1,145 @@
+"""
+Long-form transcription keeps one worker pool, shut down once it's idle,
+whose workers each run on their own cores; and stitches the chunks back
+together with every word once, in order.
+"""
+
+import os
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+import config
+import longform
+import model_registry
+
+new_pool = longform._new_pool
+
+
+class FakePool:
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.shut_down = False
+
+    def shutdown(self, wait=True):
+        self.shut_down = True
+
+
+@pytest.fixture(autouse=True)
+def fake_pools(monkeypatch):
+    monkeypatch.setattr(longform, "_new_pool", FakePool)
+    monkeypatch.setattr(longform, "_pool", None)
+    monkeypatch.setattr(longform, "_pool_users", {})
+    monkeypatch.setattr(longform, "_idle_timer", None)
+    monkeypatch.setattr(config, "LONGFORM_IDLE_SECONDS", 0)
+
+
+def test_one_pool_at_a_time():
+    small = longform._acquire_pool("small")
+    longform._release_pool(small)
+    assert longform._acquire_pool("small") is small
+    longform._release_pool(small)
+
+    medium = longform._acquire_pool("medium")
+    assert small.shut_down
+    assert not medium.shut_down
+
+
+def test_replaced_pool_finishes_its_requests_first():
+    small = longform._acquire_pool("small")
+    medium = longform._acquire_pool("medium")
+    assert not small.shut_down
+    longform._release_pool(small)
+    assert small.shut_down
+    longform._release_pool(medium)
+    assert not medium.shut_down
+
+
+def test_idle_pool_is_shut_down(monkeypatch):
+    monkeypatch.setattr(config, "LONGFORM_IDLE_SECONDS", 0.05)
+    pool = longform._acquire_pool("small")
+    longform._release_pool(pool)
+    # Used again before the timeout: kept
+    assert longform._acquire_pool("small") is pool
+    time.sleep(0.1)
+    assert not pool.shut_down
+    longform._release_pool(pool)
+    time.sleep(0.2)
+    assert pool.shut_down
+    assert longform._acquire_pool("small") is not pool
+
+
+def test_broken_pool_is_replaced():
+    pool = longform._acquire_pool("small")
+    longform._release_pool(pool, broken=True)
+    assert pool.shut_down
+    assert longform._acquire_pool("small") is not pool
+
+
+def test_workers_get_their_own_cores(monkeypatch):
+    initargs = []
+    monkeypatch.setattr(longform, "ProcessPoolExecutor", lambda **kwargs: initargs.append(kwargs["initargs"]))
+    monkeypatch.setattr(longform, "available_cores", lambda: [0, 1, 2, 3, 4])
+    monkeypatch.setattr(config, "LONGFORM_WORKERS", 2)
+    new_pool("small")
+
+    pinned = []
+    monkeypatch.setattr(os, "sched_setaffinity", lambda pid, cores: pinned.append(cores), raising=False)
+    monkeypatch.setattr(model_registry, "get_model", lambda name: None)
+    monkeypatch.setattr(config, "INTRA_OP_THREADS", 0)
+    monkeypatch.setattr(longform, "_worker_model_name", None)
+    threads = []
+    for _ in range(2):
+        longform._init_worker(*initargs[0])
+        threads.append(config.INTRA_OP_THREADS)
+    assert pinned == [[0, 1, 2], [3, 4]]
+    assert threads == [3, 2]
+
+
+SR = 100
+# (start, end) of each word in seconds, a few of them across the cuts at
+# 10 s and 20 s or with their midpoint right on one
+WORD_TIMES = [(t, t + 0.4) for t in np.arange(0, 9.5, 0.7)] + [
+    (9.6, 10.4), (10.5, 11.0), (11.9, 12.3), (19.8, 20.1), (20.0, 20.3),
+] + [(t, t + 0.5) for t in np.arange(12.5, 19.5, 0.9)] + [(t, t + 0.3) for t in np.arange(20.5, 26.5, 0.6)]
+WORD_TIMES = sorted((round(float(start), 2), round(float(end), 2)) for start, end in WORD_TIMES)
+WORDS = [f" w{i}" for i in range(len(WORD_TIMES))]
+
+
+def fake_chunk(audio, options, profile):
+    """What Whisper would hear in a chunk: every word that overlaps it,
+    cut off at its edges, in segments of three words on its own timeline"""
+    chunk_start, chunk_end = audio[0], audio[-1] + 1 / SR
+    words = [{"word": word, "start": max(start, chunk_start) - chunk_start,
+              "end": min(end, chunk_end) - chunk_start}
+             for word, (start, end) in zip(WORDS, WORD_TIMES) if start < chunk_end and end > chunk_start]
+    segments = [{"text": "".join(w["word"] for w in words[i:i + 3]), "start": words[i]["start"],
+                 "end": words[i:i + 3][-1]["end"], "words": words[i:i + 3]} for i in range(0, len(words), 3)]
+    return {"segments": segments, "language": "hi"}, 0.0
+
+
+class InlinePool:
+    def submit(self, fn, audio, options, profile):
+        future = Future()
+        future.set_result(fake_chunk(audio, options, profile))
+        return future
+
+
+def test_overlap_stitching_keeps_every_word_once(monkeypatch):
+    monkeypatch.setattr(longform, "_acquire_pool", lambda model_name: InlinePool())
+    monkeypatch.setattr(longform, "_release_pool", lambda pool, broken=False: None)
+    monkeypatch.setattr(longform, "split_on_silence", lambda audio, sr: [(0, 10 * SR), (10 * SR, 20 * SR),
+                                                                          (20 * SR, len(audio))])
+    monkeypatch.setattr(config, "LONGFORM_OVERLAP_SECONDS", 2)
+    # Each sample holds its own time, so a chunk knows where it starts
+    audio = np.arange(27 * SR) / SR
+
+    result = longform.transcribe_long(audio, "small", {}, "fast", sr=SR)
+
+    words = [word for segment in result["segments"] for word in segment["words"]]
+    assert result["text"] == "".join(WORDS)
+    assert [word["word"] for word in words] == WORDS
+    assert [(word["start"], word["end"]) for word in words] == pytest.approx(WORD_TIMES)
+    assert [segment["id"] for segment in result["segments"]] == list(range(len(result["segments"])))
@@ -0,0 +1,59 @@
+"""
+Metrics render in the Prometheus text format: histogram buckets are
+cumulative, labels are escaped, and a gauge that fails is left out of the
+scrape instead of breaking it.
+"""
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(metrics, "_metrics", [])
+
+
+def lines(metric):
+    return metric.render().splitlines()[2:]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram("stage_seconds", "Time per stage", (0.1, 1), ("stage",))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, stage="decode")
+    assert lines(histogram) == [
+        'stage_seconds_bucket{stage="decode",le="0.1"} 2',
+        'stage_seconds_bucket{stage="decode",le="1.0"} 3',
+        'stage_seconds_bucket{stage="decode",le="+Inf"} 4',
+        'stage_seconds_count{stage="decode"} 4',
+        'stage_seconds_sum{stage="decode"} 3.65',
+    ]
+
+
+def test_counter_labels_are_escaped():
+    counter = metrics.Counter("requests_total", "Requests", ("route",))
+    counter.inc(route='a"b\\c')
+    counter.inc(2, route='a"b\\c')
+    assert lines(counter) == ['requests_total{route="a\\"b\\\\c"} 3']
+
+
+def test_span_records_its_stage(monkeypatch):
+    histogram = metrics.Histogram("stage_seconds", "Time per stage", (1,), ("stage",))
+    monkeypatch.setattr(metrics, "stage_seconds", histogram)
+    with pytest.raises(ValueError):
+        with metrics.span("cleanup"):
+            raise ValueError
+    metrics.observe_stage("vad", 2)
+    assert 'stage_seconds_count{stage="cleanup"} 1' in lines(histogram)
+    assert 'stage_seconds_bucket{stage="vad",le="1.0"} 0' in lines(histogram)
+
+
+def test_broken_gauge_is_left_out():
+    metrics.Gauge("queue_depth", "Jobs waiting", lambda: 3)
+    metrics.Gauge("model_mb", "Model memory", lambda: {"small": 500}, ("model",))
+    metrics.Gauge("gpu_mb", "GPU memory", lambda: 1 / 0)
+    text = metrics.render_metrics()
+    assert "queue_depth 3\n" in text
+    assert 'model_mb{model="small"} 500\n' in text
+    assert "gpu_mb" not in text
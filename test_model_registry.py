@@ -0,0 +1,65 @@
+"""
+The default and warm-up models are never unloaded to make room for a model
+a request asks for; a model that can't fit next to them is refused.
+"""
+
+import pytest
+
+import config
+import model_registry
+from model_registry import ModelRegistry, ModelUnavailable
+
+SIZES = {"tiny": 150, "base": 290, "small": 970, "medium": 3100, "large-v3": 6200}
+
+
+class FakeBackend:
+    def __init__(self, name):
+        self.model_name = name
+
+    def memory_mb(self):
+        return SIZES[self.model_name]
+
+    def batching_stats(self):
+        return None
+
+
+@pytest.fixture(autouse=True)
+def fake_models(monkeypatch):
+    monkeypatch.setattr(model_registry, "load_backend", lambda name, device=None: FakeBackend(name))
+    monkeypatch.setattr(model_registry, "estimate_memory_mb", lambda name: SIZES.get(name, 0))
+    monkeypatch.setattr(config, "DEFAULT_MODEL", "large-v3")
+    monkeypatch.setattr(config, "WARMUP_MODELS", ("large-v3",))
+
+
+def test_least_recently_used_goes_but_never_the_default():
+    registry = ModelRegistry(max_models=2, memory_budget_mb=0)
+    registry.get("large-v3")
+    registry.get("small")
+    registry.get("base")
+    assert list(registry.status()["loaded"]) == ["large-v3", "base"]
+
+
+def test_model_over_the_budget_is_refused():
+    registry = ModelRegistry(max_models=3, memory_budget_mb=8192)
+    registry.get("large-v3")
+    assert registry.can_load("small")
+    assert not registry.can_load("medium")
+    with pytest.raises(ModelUnavailable):
+        registry.get("medium")
+    assert registry.is_ready("large-v3")
+
+
+def test_default_counts_before_it_has_loaded():
+    registry = ModelRegistry(max_models=3, memory_budget_mb=8192)
+    with pytest.raises(ModelUnavailable):
+        registry.get("medium")
+    assert registry.status()["loaded"] == {}
+
+
+def test_warm_up_models_are_pinned_too(monkeypatch):
+    monkeypatch.setattr(config, "WARMUP_MODELS", ("large-v3", "tiny"))
+    registry = ModelRegistry(max_models=2, memory_budget_mb=0)
+    registry.get("tiny")
+    assert not registry.can_load("base")
+    registry.get("large-v3")
+    assert list(registry.status()["loaded"]) == ["tiny", "large-v3"]
@@ -0,0 +1,60 @@
+"""
+Silence trimming: times in the trimmed audio map back to the original
+recording, and an end time on a cut stays with the speech before it.
+"""
+
+import numpy as np
+import pytest
+
+import config
+from vad import TimestampMap, transcribe_speech
+
+SR = 100
+# Speech from 1-2 s and 4-6 s of a 7 s recording
+REGIONS = [(1 * SR, 2 * SR), (4 * SR, 6 * SR)]
+
+
+@pytest.mark.parametrize("t, is_end, original", [
+    (0.0, False, 1.0),
+    (0.5, False, 1.5),
+    (1.0, False, 4.0),   # a start on the cut belongs to the region after it
+    (1.0, True, 2.0),    # an end on the cut to the region before it
+    (2.5, False, 5.5),
+    (3.0, True, 6.0),
+])
+def test_to_original(t, is_end, original):
+    assert TimestampMap(REGIONS, SR).to_original(t, is_end) == pytest.approx(original)
+
+
+def test_restore_rewrites_segments_and_words():
+    result = {"segments": [{"start": 0.5, "end": 1.5, "words": [
+        {"word": " एक", "start": 0.5, "end": 1.0}, {"word": " दो", "start": 1.0, "end": 1.5}]}]}
+    TimestampMap(REGIONS, SR).restore(result)
+    segment = result["segments"][0]
+    assert (segment["start"], segment["end"]) == (1.5, 4.5)
+    assert [(w["start"], w["end"]) for w in segment["words"]] == [(1.5, 2.0), (4.0, 4.5)]
+
+
+def test_transcribe_speech_skips_silence(monkeypatch):
+    monkeypatch.setattr(config, "VAD_MODE", "energy")
+    sr = 16000
+    rng = np.random.default_rng(0)
+    audio = np.zeros(6 * sr, dtype=np.float32)
+    audio[2 * sr:4 * sr] = rng.normal(0, 0.3, 2 * sr)
+    heard = []
+
+    def transcribe(speech):
+        heard.append(len(speech) / sr)
+        return {"text": " हाँ", "segments": [{"start": 0.0, "end": 0.5, "text": " हाँ"}]}
+
+    result = transcribe_speech(transcribe, audio, sr)
+    assert heard[0] < 4
+    assert 1.5 <= result["segments"][0]["start"] <= 2.0
+    assert result["vad"]["audio_seconds"] == 6.0
+    assert result["vad"]["speech_seconds"] == heard[0]
+
+
+def test_no_speech_is_not_transcribed(monkeypatch):
+    monkeypatch.setattr(config, "VAD_MODE", "energy")
+    result = transcribe_speech(lambda speech: pytest.fail("transcribed silence"), np.zeros(16000 * 3, np.float32))
+    assert result["text"] == "" and result["segments"] == []
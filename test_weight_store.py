@@ -0,0 +1,39 @@
+"""
+A model loaded from the weight store must decode exactly like the model
+it was converted from (needs torch and openai-whisper).
+"""
+
+import dataclasses
+
+import pytest
+
+torch = pytest.importorskip("torch")
+whisper = pytest.importorskip("whisper")
+
+from weight_store import WeightStore, _state_arrays  # noqa: E402
+
+# Small random model, with the real vocabulary and 30 s audio context so
+# whisper.decode() takes it
+DIMS = whisper.model.ModelDimensions(
+    n_mels=80, n_audio_ctx=1500, n_audio_state=64, n_audio_head=2, n_audio_layer=1,
+    n_vocab=51865, n_text_ctx=448, n_text_state=64, n_text_head=2, n_text_layer=2,
+)
+
+
+def decoded_tokens(model):
+    mel = whisper.log_mel_spectrogram(torch.zeros(whisper.audio.N_SAMPLES))
+    options = whisper.DecodingOptions(language="en", without_timestamps=True, sample_len=8, fp16=False)
+    return whisper.decode(model, mel, options).tokens
+
+
+def test_store_loaded_model_decodes(tmp_path):
+    torch.manual_seed(0)
+    original = whisper.model.Whisper(DIMS).eval()
+    store = WeightStore(root=str(tmp_path), shard_mb=1)
+    store.write("small-random", _state_arrays(original), dataclasses.asdict(DIMS))
+
+    loaded = store.load_model("small-random")
+
+    assert not any(t.is_meta for t in list(loaded.parameters()) + list(loaded.buffers()))
+    assert torch.equal(loaded.decoder.mask, original.decoder.mask)
+    assert decoded_tokens(loaded) == decoded_tokens(original)
@@ -0,0 +1,275 @@
+"""
+Uploads read as they arrive, in bounded memory.
+
+IngestRequest hands every uploaded file to an UploadSink instead of
+Werkzeug's temp file. While the body is still coming in, the sink
+
+* hashes it, so the result cache key needs no second pass over the file,
+* spools it: in memory up to UPLOAD_SPOOL_MB, on disk beyond that,
+* and for /transcribe pipes it into ffmpeg, so the audio is decoded about
+  as soon as the last byte arrives. For /jobs, which decodes later, the
+  samples coming out of ffmpeg are only counted, to check the length.
+
+A route can set ``request.before_upload`` before it touches the form: it
+is called with the form fields sent ahead of the file as the file starts
+arriving, and raises (e.g. ``abort()``) to turn the request away before
+any of the upload is spooled or decoded.
+
+MAX_UPLOAD_MB caps the request body (a Content-Length over it is refused
+before anything is read) and MAX_AUDIO_SECONDS the decoded audio, checked
+as samples come out of ffmpeg so a recording that is too long is turned
+away mid-upload. Both are answered with 413.
+"""
+
+import hashlib
+import tempfile
+
+import numpy as np
+from flask import Request
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.formparser import FormDataParser, MultiPartParser
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+import config
+from audio_ingest import SAMPLE_RATE, StreamDecoder, decode_audio, decode_file
+from result_cache import stream_digest
+
+
+class AudioTooLong(RequestEntityTooLarge):
+    def __init__(self):
+        super().__init__(f"Audio is longer than the limit of {config.MAX_AUDIO_SECONDS:g} seconds")
+
+
+def check_duration(audio, sr=SAMPLE_RATE):
+    if config.MAX_AUDIO_SECONDS and len(audio) > config.MAX_AUDIO_SECONDS * sr:
+        raise AudioTooLong()
+
+
+class UploadSink:
+    """Writable, seekable file that hashes, spools and (optionally) decodes
+    what is written to it; with ``keep_samples=False`` the decoded samples
+    are only counted"""
+
+    def __init__(self, decode=False, sr=SAMPLE_RATE, keep_samples=True):
+        self._file = tempfile.SpooledTemporaryFile(max_size=config.UPLOAD_SPOOL_MB * 1024 * 1024)
+        self._hash = hashlib.sha256()
+        self.size = 0
+        self.sr = sr
+        self.keep_samples = keep_samples
+        self._decoder = None
+        self._samples = []
+        self._sample_count = 0
+        if decode:
+            try:
+                self._decoder = StreamDecoder(sr)
+            except OSError as e:
+                # No ffmpeg: decode() reports it if the audio is needed
+                print(f"⚠️  Can't decode while uploading: {e}")
+
+    def write(self, data):
+        self._file.write(data)
+        self._hash.update(data)
+        self.size += len(data)
+        if self._decoder is not None:
+            self._decoder.write(data)
+            self._collect()
+        return len(data)
+
+    def _collect(self):
+        samples = self._decoder.read()
+        if not len(samples):
+            return
+        if self.keep_samples:
+            self._samples.append(samples)
+        self._sample_count += len(samples)
+        if config.MAX_AUDIO_SECONDS and self._sample_count > config.MAX_AUDIO_SECONDS * self.sr:
+            self._decoder.abort()
+            self._decoder = None
+            self._samples = []
+            raise AudioTooLong()
+
+    @property
+    def digest(self):
+        """sha256 of everything written"""
+        return self._hash.hexdigest()
+
+    def decode(self):
+        """The upload as PCM: the decode that ran during the upload, finished,
+        or a decode of the spooled file if that couldn't work"""
+        audio = None
+        decoder, self._decoder = self._decoder, None
+        if decoder is not None:
+            try:
+                self._samples.append(decoder.close())
+                audio = np.concatenate(self._samples)
+            except RuntimeError:
+                pass
+            if audio is not None and not len(audio) and self.size:
+                # e.g. MP4 with its index at the end: ffmpeg has to seek
+                audio = None
+            self._samples = []
+        self._file.seek(0)
+        if audio is None:
+            audio = decode_file(self._file, self.sr) if decoder is not None else decode_audio(self._file, self.sr)
+        check_duration(audio, self.sr)
+        return audio
+
+    def check_duration(self):
+        """Finish a count-only decode and check the audio's length against
+        MAX_AUDIO_SECONDS. Leaves the file at the start."""
+        decoder, self._decoder = self._decoder, None
+        counted = False
+        if decoder is not None:
+            try:
+                self._sample_count += len(decoder.close())
+                # Nothing decoded: e.g. MP4 with its index at the end
+                counted = self._sample_count > 0 or not self.size
+            except RuntimeError:
+                pass
+        self._file.seek(0)
+        if counted:
+            if config.MAX_AUDIO_SECONDS and self._sample_count > config.MAX_AUDIO_SECONDS * self.sr:
+                raise AudioTooLong()
+        else:
+            check_duration(decode_file(self._file, self.sr) if decoder is not None
+                           else decode_audio(self._file, self.sr), self.sr)
+            self._file.seek(0)
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def readline(self, size=-1):
+        return self._file.readline(size)
+
+    def seek(self, offset, whence=0):
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def seekable(self):
+        return True
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def close(self):
+        if self._decoder is not None:
+            self._decoder.abort()
+            self._decoder = None
+        self._file.close()
+
+
+def upload_digest(stream):
+    """sha256 of an uploaded file (free for an UploadSink)"""
+    if isinstance(stream, UploadSink):
+        return stream.digest
+    return stream_digest(stream)
+
+
+def check_upload_duration(stream, sr=SAMPLE_RATE):
+    """Refuse an uploaded file longer than MAX_AUDIO_SECONDS, without
+    keeping its audio (for an UploadSink that only counted samples)"""
+    if isinstance(stream, UploadSink):
+        return stream.check_duration()
+    check_duration(decode_audio(stream, sr), sr)
+    stream.seek(0)
+
+
+def decode_upload(stream, sr=SAMPLE_RATE):
+    """An uploaded file as PCM, within MAX_AUDIO_SECONDS"""
+    if isinstance(stream, UploadSink):
+        return stream.decode()
+    audio = decode_audio(stream, sr)
+    check_duration(audio, sr)
+    return audio
+
+
+class IngestParser(MultiPartParser):
+    """Werkzeug's multipart parser, calling ``before_upload(fields)`` as the
+    first file part starts"""
+
+    def __init__(self, before_upload=None, **kwargs):
+        super().__init__(**kwargs)
+        self.before_upload = before_upload
+
+    def parse(self, stream, boundary, content_length):
+        parser = MultipartDecoder(boundary, max_form_memory_size=self.max_form_memory_size,
+                                  max_parts=self.max_form_parts)
+        fields = []
+        files = []
+        part = container = None
+        field_size = 0
+        while True:
+            data = stream.read(self.buffer_size)
+            parser.receive_data(data or None)
+            event = parser.next_event()
+            while not isinstance(event, (Epilogue, NeedData)):
+                if isinstance(event, Field):
+                    part, container, field_size = event, [], 0
+                elif isinstance(event, File):
+                    if not files and self.before_upload is not None:
+                        self.before_upload(self.cls(fields))
+                    part, container = event, self.start_file_streaming(event, content_length)
+                elif isinstance(event, Data):
+                    if isinstance(part, Field):
+                        field_size += len(event.data)
+                        if self.max_form_memory_size is not None and field_size > self.max_form_memory_size:
+                            raise RequestEntityTooLarge()
+                        container.append(event.data)
+                    else:
+                        container.write(event.data)
+                    if not event.more_data:
+                        if isinstance(part, Field):
+                            value = b"".join(container).decode(self.get_part_charset(part.headers), "replace")
+                            fields.append((part.name, value))
+                        else:
+                            container.seek(0)
+                            files.append((part.name, FileStorage(container, part.filename, part.name,
+                                                                 headers=part.headers)))
+                event = parser.next_event()
+            if not data:
+                return self.cls(fields), self.cls(files)
+
+
+class IngestFormParser(FormDataParser):
+    before_upload = None
+
+    def _parse_multipart(self, stream, mimetype, content_length, options):
+        parser = IngestParser(
+            before_upload=self.before_upload,
+            stream_factory=self.stream_factory,
+            max_form_memory_size=self.max_form_memory_size,
+            max_form_parts=self.max_form_parts,
+            cls=self.cls,
+        )
+        boundary = options.get("boundary", "").encode("ascii")
+        if not boundary:
+            raise ValueError("Missing boundary")
+        form, files = parser.parse(stream, boundary, content_length)
+        return stream, form, files
+
+
+class IngestRequest(Request):
+    # Endpoints whose uploads are decoded while they arrive
+    decode_endpoints = {"transcribe"}
+    # Endpoints whose uploads are decoded while they arrive only to be
+    # measured, keeping none of the audio
+    count_endpoints = {"submit_job"}
+    form_data_parser_class = IngestFormParser
+    # Called with the form fields sent ahead of the file (see above)
+    before_upload = None
+
+    def make_form_data_parser(self):
+        parser = super().make_form_data_parser()
+        parser.before_upload = self.before_upload
+        return parser
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.endpoint in self.count_endpoints:
+            return UploadSink(decode=True, keep_samples=False)
+        return UploadSink(decode=self.endpoint in self.decode_endpoints)
@@ -0,0 +1,181 @@
+"""
+Silence trimming in front of Whisper.
+
+Finds the speech regions of decoded audio - with a NumPy frame-energy
+detector by default, or the Silero VAD model that ships with faster-whisper
+(small, CPU, no download) - and hands only those regions to the model. A
+TimestampMap puts segment and word times back on the original timeline.
+"""
+
+import numpy as np
+
+import config
+from audio_ingest import SAMPLE_RATE
+from metrics import span
+
+FRAME_SECONDS = 0.02
+
+
+def frame_energy(audio, sr=SAMPLE_RATE):
+    """RMS energy of consecutive FRAME_SECONDS frames"""
+    size = max(1, int(sr * FRAME_SECONDS))
+    count = len(audio) // size
+    frames = audio[:count * size].reshape(count, size)
+    return np.sqrt(np.mean(np.square(frames), axis=1) + 1e-12)
+
+
+def split_on_silence(audio, sr=SAMPLE_RATE, chunk_seconds=None, search_seconds=None):
+    """(start, end) sample ranges of about ``chunk_seconds`` each.
+
+    Each cut goes to the quietest frame in the last ``search_seconds`` of
+    its chunk.
+    """
+    chunk = int((chunk_seconds or config.LONGFORM_CHUNK_SECONDS) * sr)
+    search = int((search_seconds or min(10.0, chunk / sr / 4)) * sr)
+    frame = max(1, int(sr * FRAME_SECONDS))
+    energy = frame_energy(audio, sr)
+
+    cuts = [0]
+    while len(audio) - cuts[-1] > chunk:
+        first = (cuts[-1] + chunk - search) // frame + 1
+        last = min((cuts[-1] + chunk) // frame, len(energy))
+        quietest = first + int(np.argmin(energy[first:last])) if last > first else last
+        cuts.append(quietest * frame + frame // 2)
+    cuts.append(len(audio))
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+def _tidy(regions, total, sr):
+    """Bridge short pauses, drop blips, pad what's left"""
+    min_silence = int(config.VAD_MIN_SILENCE_SECONDS * sr)
+    min_speech = int(config.VAD_MIN_SPEECH_SECONDS * sr)
+    pad = int(config.VAD_PAD_SECONDS * sr)
+
+    merged = []
+    for start, end in regions:
+        if merged and start - merged[-1][1] < min_silence:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    tidy = []
+    for start, end in merged:
+        if end - start < min_speech:
+            continue
+        start, end = max(0, start - pad), min(total, end + pad)
+        if tidy and start <= tidy[-1][1]:
+            tidy[-1][1] = end
+        else:
+            tidy.append([start, end])
+    return [(start, end) for start, end in tidy]
+
+
+def energy_regions(audio, sr=SAMPLE_RATE):
+    """Speech (start, end) sample ranges from frame energy.
+
+    The threshold sits VAD_MARGIN_DB above the noise floor (but at least
+    that far below typical speech level, so audio without pauses stays
+    whole) and never below VAD_MIN_DB.
+    """
+    energy = frame_energy(audio, sr)
+    if not len(energy):
+        return []
+    db = 20 * np.log10(energy)
+    floor, level = np.percentile(db, [10, 90])
+    margin = config.VAD_MARGIN_DB
+    threshold = max(min(floor + margin, level - margin), config.VAD_MIN_DB)
+
+    speech = np.concatenate(([False], db > threshold, [False]))
+    edges = np.flatnonzero(speech[1:] != speech[:-1])
+    frame = max(1, int(sr * FRAME_SECONDS))
+    regions = [(int(start) * frame, int(end) * frame) for start, end in zip(edges[::2], edges[1::2])]
+    return _tidy(regions, len(audio), sr)
+
+
+def silero_regions(audio, sr=SAMPLE_RATE):
+    """Speech (start, end) sample ranges from faster-whisper's Silero VAD"""
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    options = VadOptions(
+        min_speech_duration_ms=int(config.VAD_MIN_SPEECH_SECONDS * 1000),
+        min_silence_duration_ms=int(config.VAD_MIN_SILENCE_SECONDS * 1000),
+        speech_pad_ms=int(config.VAD_PAD_SECONDS * 1000),
+    )
+    return [(span["start"], span["end"]) for span in get_speech_timestamps(audio, options)]
+
+
+DETECTORS = {
+    "energy": energy_regions,
+    "silero": silero_regions,
+}
+
+
+class TimestampMap:
+    """Maps times in the trimmed audio back to the original recording"""
+
+    def __init__(self, regions, sr=SAMPLE_RATE):
+        lengths = [end - start for start, end in regions]
+        self.trimmed_starts = np.cumsum([0] + lengths[:-1]) / sr
+        self.original_starts = np.array([start for start, _ in regions]) / sr
+
+    def to_original(self, t, is_end=False):
+        # An end time on a region boundary belongs to the region before it
+        side = "left" if is_end else "right"
+        i = max(0, int(np.searchsorted(self.trimmed_starts, t, side=side)) - 1)
+        return float(self.original_starts[i] + (t - self.trimmed_starts[i]))
+
+    def restore_segment(self, segment):
+        """Rewrite the times of one segment and its words in place"""
+        for item in [segment] + list(segment.get("words") or []):
+            start, end = item["start"], item["end"]
+            item["start"] = round(self.to_original(start), 3)
+            item["end"] = round(self.to_original(end, is_end=True), 3)
+        return segment
+
+    def restore(self, result):
+        """Rewrite segment and word times of a transcribe() result in place"""
+        for segment in result.get("segments", []):
+            self.restore_segment(segment)
+        return result
+
+
+def trim_silence(audio, sr=SAMPLE_RATE, mode=None):
+    """Speech-only audio plus the map back to the original timeline.
+
+    Returns ``(audio, None)`` unchanged when VAD is off or there's nothing
+    worth cutting, and ``(empty array, None)`` when there is no speech.
+    """
+    mode = mode or config.VAD_MODE
+    if mode == "off" or not len(audio):
+        return audio, None
+    if mode not in DETECTORS:
+        raise ValueError(f"Unknown VAD mode '{mode}' (choose from: off, {', '.join(DETECTORS)})")
+
+    with span("vad"):
+        regions = DETECTORS[mode](audio, sr)
+    if not regions:
+        return audio[:0], None
+    kept = sum(end - start for start, end in regions)
+    if len(audio) - kept < sr:
+        return audio, None
+    speech = np.concatenate([audio[start:end] for start, end in regions])
+    return speech, TimestampMap(regions, sr)
+
+
+def transcribe_speech(transcribe, audio, sr=SAMPLE_RATE):
+    """Run ``transcribe(audio)`` on the speech regions only.
+
+    The result gets a ``vad`` entry with how much audio was skipped.
+    """
+    speech, timestamps = trim_silence(audio, sr)
+    if not len(speech):
+        result = {"text": "", "segments": [], "language": None}
+    else:
+        result = transcribe(speech)
+        if timestamps is not None:
+            timestamps.restore(result)
+    result["vad"] = {
+        "audio_seconds": round(len(audio) / sr, 2),
+        "speech_seconds": round(len(speech) / sr, 2),
+    }
+    return result
@@ -0,0 +1,384 @@
+"""
+Converted, memory-mapped model weights (openai-whisper backend).
+
+whisper.load_model() unpickles the whole checkpoint into private memory,
+so every process that loads large-v3 pays for ~3 GB of reads and keeps
+its own ~6 GB copy. The weight store converts each checkpoint once into
+raw shards under WEIGHT_STORE_DIR/<model>/:
+
+    manifest.json       model dimensions, and where every tensor lives
+    shard-00000.bin     tensors back to back, WEIGHT_SHARD_MB at most each
+    verified.json       size and mtime of the shards last checked
+
+Loading maps the shards copy-on-write and builds the model around them
+without copying, so every worker on the machine shares the same pages of
+the page cache. Each shard's sha256 is recorded in the manifest and
+checked the first time a process sees the file (again only when it
+changes); repair() re-checks everything and rebuilds just the shards that
+don't match, from the checkpoint whisper already has on disk.
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+import config
+
+# Bump when the layout changes: older stores are converted again
+STORE_VERSION = 1
+# Tensors start on a multiple of this many bytes
+ALIGNMENT = 64
+CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stamp(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _write_json(path, data):
+    # Write then rename, so readers never see half a file
+    fd, temp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+        os.replace(temp, path)
+    except OSError:
+        os.remove(temp)
+        raise
+
+
+def layout(arrays, shard_bytes):
+    """Place named arrays in shards: {name: (shard, offset)} and each shard's size"""
+    places = {}
+    sizes = [0]
+    for name, array in arrays.items():
+        offset = (sizes[-1] + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+        if offset > 0 and offset + array.nbytes > shard_bytes:
+            sizes.append(0)
+            offset = 0
+        places[name] = (len(sizes) - 1, offset)
+        sizes[-1] = offset + array.nbytes
+    return places, sizes
+
+
+def _source_checksum(model_name):
+    """sha256 of the checkpoint whisper downloads for ``model_name`` (part of its URL)"""
+    import whisper
+
+    url = whisper._MODELS.get(model_name)
+    return url.split("/")[-2] if url else None
+
+
+def _state_arrays(model):
+    return {name: tensor.detach().cpu().numpy() for name, tensor in model.state_dict().items()}
+
+
+def _empty_whisper(dims):
+    """Whisper(dims) with its parameters on the meta device: nothing is
+    allocated or initialized, load_state_dict(assign=True) brings the
+    weights.
+
+    Built part by part because Whisper.__init__ makes its sparse
+    alignment_heads, and sparse tensors can't be made on meta.
+    """
+    import torch
+    from whisper.model import AudioEncoder, TextDecoder, Whisper
+
+    model = Whisper.__new__(Whisper)
+    torch.nn.Module.__init__(model)
+    model.dims = dims
+    with torch.device("meta"):
+        model.encoder = AudioEncoder(dims.n_mels, dims.n_audio_ctx, dims.n_audio_state,
+                                     dims.n_audio_head, dims.n_audio_layer)
+        model.decoder = TextDecoder(dims.n_vocab, dims.n_text_ctx, dims.n_text_state,
+                                    dims.n_text_head, dims.n_text_layer)
+    return model
+
+
+class CorruptStoreError(Exception):
+    """A shard doesn't match the checksum in its manifest"""
+
+
+class WeightStore:
+    def __init__(self, root=config.WEIGHT_STORE_DIR, shard_mb=config.WEIGHT_SHARD_MB):
+        self.root = root
+        self.shard_bytes = shard_mb * 1024 * 1024
+        self._lock = threading.Lock()
+
+    def _dir(self, model_name):
+        return os.path.join(self.root, model_name)
+
+    def manifest(self, model_name):
+        """The model's manifest, or None if it hasn't been converted (or is outdated)"""
+        try:
+            with open(os.path.join(self._dir(model_name), "manifest.json"), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("version") != STORE_VERSION:
+            return None
+        return manifest
+
+    # --- writing ----------------------------------------------------------
+
+    def _write_shard(self, path, arrays, places, shard, size):
+        """Write one shard's tensors, returning the file's sha256"""
+        digest = hashlib.sha256()
+        with open(path, "wb") as f:
+            position = 0
+            for name, array in arrays.items():
+                index, offset = places[name]
+                if index != shard:
+                    continue
+                data = np.ascontiguousarray(array).tobytes()
+                padding = b"\0" * (offset - position)
+                for piece in (padding, data):
+                    f.write(piece)
+                    digest.update(piece)
+                position = offset + len(data)
+            f.truncate(size)
+            f.flush()
+            os.fsync(f.fileno())
+        return digest.hexdigest()
+
+    def write(self, model_name, arrays, dims, alignment_heads=None, source=None):
+        """Store ``arrays`` (name -> NumPy array) as ``model_name``'s weights"""
+        places, sizes = layout(arrays, self.shard_bytes)
+        os.makedirs(self.root, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(dir=self.root, prefix=f".{model_name}-")
+        try:
+            shards = []
+            for shard, size in enumerate(sizes):
+                name = f"shard-{shard:05d}.bin"
+                digest = self._write_shard(os.path.join(temp_dir, name), arrays, places, shard, size)
+                shards.append({"file": name, "bytes": size, "sha256": digest})
+            manifest = {
+                "version": STORE_VERSION,
+                "model": model_name,
+                "source": source,
+                "dims": dims,
+                "alignment_heads": alignment_heads,
+                "shards": shards,
+                "tensors": {
+                    name: {
+                        "shard": places[name][0],
+                        "offset": places[name][1],
+                        "dtype": array.dtype.str,
+                        "shape": list(array.shape),
+                    }
+                    for name, array in arrays.items()
+                },
+            }
+            _write_json(os.path.join(temp_dir, "manifest.json"), manifest)
+            _write_json(os.path.join(temp_dir, "verified.json"),
+                        {s["file"]: _stamp(os.path.join(temp_dir, s["file"])) for s in shards})
+
+            # Swap the finished directory in; a process still mapping the
+            # old shards keeps reading them until it lets go
+            final_dir = self._dir(model_name)
+            old_dir = None
+            if os.path.exists(final_dir):
+                old_dir = tempfile.mkdtemp(dir=self.root, prefix=f".{model_name}-old-")
+                os.rmdir(old_dir)
+                os.rename(final_dir, old_dir)
+            os.rename(temp_dir, final_dir)
+            if old_dir:
+                shutil.rmtree(old_dir, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+        return manifest
+
+    def convert(self, model_name):
+        """Convert whisper's checkpoint for ``model_name`` (downloading it if needed)"""
+        import whisper
+
+        print(f"📦 Converting Whisper {model_name} weights for memory mapping (one-time)...")
+        model = whisper.load_model(model_name, device="cpu")
+        heads = whisper._ALIGNMENT_HEADS.get(model_name)
+        manifest = self.write(
+            model_name,
+            _state_arrays(model),
+            dataclasses.asdict(model.dims),
+            alignment_heads=heads.decode("ascii") if heads else None,
+            source=_source_checksum(model_name),
+        )
+        total = sum(shard["bytes"] for shard in manifest["shards"]) / (1024 * 1024)
+        print(f"✅ {len(manifest['shards'])} shards, {total:,.0f} MB in {self._dir(model_name)}")
+        return manifest
+
+    # --- checking ---------------------------------------------------------
+
+    def bad_shards(self, model_name, manifest, force=False):
+        """Indexes of shards that are missing or fail their checksum.
+
+        Shards that were verified before and haven't changed since are
+        skipped unless ``force``.
+        """
+        model_dir = self._dir(model_name)
+        stamps_path = os.path.join(model_dir, "verified.json")
+        try:
+            with open(stamps_path, encoding="utf-8") as f:
+                stamps = json.load(f)
+        except (OSError, ValueError):
+            stamps = {}
+
+        bad = []
+        changed = False
+        for index, shard in enumerate(manifest["shards"]):
+            path = os.path.join(model_dir, shard["file"])
+            try:
+                stamp = _stamp(path)
+            except OSError:
+                bad.append(index)
+                continue
+            if not force and stamps.get(shard["file"]) == stamp:
+                continue
+            if stamp[0] != shard["bytes"] or file_digest(path) != shard["sha256"]:
+                stamps.pop(shard["file"], None)
+                bad.append(index)
+            else:
+                stamps[shard["file"]] = stamp
+            changed = True
+        if changed:
+            try:
+                _write_json(stamps_path, stamps)
+            except OSError as e:
+                print(f"⚠️  Couldn't record verified shards: {e}")
+        return bad
+
+    def repair(self, model_name):
+        """Check every shard again and rebuild the bad ones; returns how many were rebuilt"""
+        import whisper
+
+        manifest = self.manifest(model_name)
+        if manifest is None or manifest.get("source") != _source_checksum(model_name):
+            self.convert(model_name)
+            return None
+        bad = self.bad_shards(model_name, manifest, force=True)
+        if not bad:
+            return 0
+
+        print(f"🔧 Rebuilding {len(bad)} of {len(manifest['shards'])} shards of {model_name}...")
+        # whisper checks the checkpoint's own sha256, and downloads it again only if that fails
+        arrays = _state_arrays(whisper.load_model(model_name, device="cpu"))
+        if list(arrays) != list(manifest["tensors"]):
+            self.convert(model_name)
+            return None
+        places = {name: (t["shard"], t["offset"]) for name, t in manifest["tensors"].items()}
+        model_dir = self._dir(model_name)
+        for index in bad:
+            shard = manifest["shards"][index]
+            fd, temp = tempfile.mkstemp(dir=model_dir, suffix=".tmp")
+            os.close(fd)
+            try:
+                digest = self._write_shard(temp, arrays, places, index, shard["bytes"])
+                if digest != shard["sha256"]:
+                    raise CorruptStoreError(f"{shard['file']} comes out different from when it was converted")
+                os.replace(temp, os.path.join(model_dir, shard["file"]))
+            except CorruptStoreError:
+                os.remove(temp)
+                # The checkpoint isn't the one that was converted: start over
+                self.convert(model_name)
+                return None
+            except BaseException:
+                os.remove(temp)
+                raise
+        self.bad_shards(model_name, manifest)
+        print(f"✅ Rebuilt {', '.join(manifest['shards'][i]['file'] for i in bad)}")
+        return len(bad)
+
+    # --- reading ----------------------------------------------------------
+
+    def map_arrays(self, model_name, manifest):
+        """NumPy views of every tensor, backed by the shard files.
+
+        The mapping is copy-on-write: pages stay shared between processes
+        (and with the page cache) unless somebody writes to them.
+        """
+        model_dir = self._dir(model_name)
+        shards = [np.memmap(os.path.join(model_dir, shard["file"]), dtype=np.uint8, mode="c")
+                  if shard["bytes"] else np.zeros(0, dtype=np.uint8)
+                  for shard in manifest["shards"]]
+        arrays = {}
+        for name, tensor in manifest["tensors"].items():
+            dtype = np.dtype(tensor["dtype"])
+            count = int(np.prod(tensor["shape"], dtype=np.int64))
+            start = tensor["offset"]
+            data = shards[tensor["shard"]][start:start + count * dtype.itemsize]
+            arrays[name] = data.view(dtype).reshape(tensor["shape"])
+        return arrays
+
+    def prepare(self, model_name):
+        """The manifest of a converted, verified copy of ``model_name``"""
+        with self._lock:
+            manifest = self.manifest(model_name)
+            if manifest is None:
+                return self.convert(model_name)
+            if self.bad_shards(model_name, manifest):
+                print(f"⚠️  Weight store for {model_name} failed its checksum - repairing")
+                self.repair(model_name)
+                manifest = self.manifest(model_name)
+            return manifest
+
+    def load_model(self, model_name, device="cpu"):
+        """A whisper model whose weights are mapped from the store"""
+        import torch
+        from whisper.model import ModelDimensions
+
+        manifest = self.prepare(model_name)
+        dims = ModelDimensions(**manifest["dims"])
+        model = _empty_whisper(dims)
+        tensors = {name: torch.from_numpy(array) for name, array in self.map_arrays(model_name, manifest).items()}
+        model.load_state_dict(tensors, assign=True)
+
+        # Buffers that aren't part of the state dict are made again, for
+        # real: the causal mask (as TextDecoder makes it) and the alignment heads
+        n_ctx = dims.n_text_ctx
+        mask = torch.empty(n_ctx, n_ctx).fill_(-np.inf).triu_(1)
+        model.decoder.register_buffer("mask", mask, persistent=False)
+        if manifest["alignment_heads"]:
+            model.set_alignment_heads(manifest["alignment_heads"].encode("ascii"))
+        else:
+            heads = torch.zeros(dims.n_text_layer, dims.n_text_head, dtype=torch.bool)
+            heads[dims.n_text_layer // 2:] = True
+            model.register_buffer("alignment_heads", heads.to_sparse(), persistent=False)
+
+        left = [name for name, tensor in list(model.named_parameters()) + list(model.named_buffers())
+                if tensor.is_meta]
+        if left:
+            raise CorruptStoreError(f"No weights for {', '.join(left)}")
+        return model.to(device)
+
+
+def load_model(model_name, device="cpu"):
+    """whisper.load_model(), through the weight store when WEIGHT_STORE is on"""
+    import whisper
+
+    if config.WEIGHT_STORE and model_name in whisper._MODELS:
+        try:
+            return weight_store.load_model(model_name, device)
+        except (OSError, CorruptStoreError) as e:
+            print(f"⚠️  Weight store unavailable ({e}) - loading the checkpoint directly")
+    return whisper.load_model(model_name, device=device)
+
+
+weight_store = WeightStore()